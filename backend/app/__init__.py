@@ -3,8 +3,12 @@ from flask_cors import CORS
 from flask_mail import Mail
 import os
 
+from .utils.spooled_upload import SpooledUploadRequest
+
 # 创建Flask应用实例
 app = Flask(__name__)
+# 上传的音频等文件在配置的大小以内时保存在内存中
+app.request_class = SpooledUploadRequest
 
 # 配置CORS
 CORS(app, origins=["https://interview.ailongdev.com", "http://localhost:5173"])
@@ -50,7 +54,7 @@ db.init_app(app)
 
 
 # 导入路由
-from .routes import resume, self_intro, question_bank, mock_interview, strategy, auth
+from .routes import resume, self_intro, question_bank, mock_interview, strategy, auth, usage
 
 # 注册蓝图
 app.register_blueprint(resume)
@@ -59,11 +63,30 @@ app.register_blueprint(question_bank)
 app.register_blueprint(mock_interview)
 app.register_blueprint(strategy)
 app.register_blueprint(auth)
+app.register_blueprint(usage)
 
 # 初始化数据库
 with app.app_context():
     db.create_all()
 
+# 启动大模型用量记录的后台写入线程
+from .services.usage_recorder import usage_recorder
+usage_recorder.init_app(app)
+
+# 启动面试会话的过期清理线程
+from .services.session_store import session_store
+session_store.start_sweeper()
+
+# 面试报告任务在应用上下文中执行
+from .services.report_jobs import report_jobs
+report_jobs.init_app(app)
+
+# 按配置在后台预加载本地语音识别模型
+from config import WHISPER_CONFIG
+if WHISPER_CONFIG["preload"]:
+    from .services.whisper_asr_service import whisper_asr_service
+    whisper_asr_service.preload()
+
 # 添加调试路由，用于列出所有注册的路由
 @app.route('/api/routes', methods=['GET'])
 def list_routes():
@@ -75,4 +98,39 @@ def list_routes():
             'methods': list(rule.methods),
             'rule': rule.rule
         })
-    return jsonify({'routes': routes}), 200
\ No newline at end of file
+    return jsonify({'routes': routes}), 200
+
+# 添加调试路由，用于查看运行时指标（仅管理员可查看）
+from flask import request
+from config import ADMIN_CONFIG
+from .utils.jwt_utils import auth_required
+
+@app.route('/api/metrics', methods=['GET'])
+@auth_required
+def metrics():
+    """查看大模型网关等运行时指标"""
+    if request.user_id not in ADMIN_CONFIG['user_ids']:
+        return jsonify({"error": "Permission denied"}), 403
+    from .services.llm_gateway import llm_gateway
+    from .services.llm_cache import llm_cache
+    from .services.resume_cache import resume_cache
+    from .routes.mock_interview import get_asr_stats
+    from .services.whisper_asr_service import whisper_asr_service
+    from .utils.audio_vad import voice_activity_filter
+    from .utils.audio_decode import audio_decoder
+    from .services.asr_session import asr_sessions
+    from .services.asr_race import asr_racer
+    return jsonify({
+        'llm': llm_gateway.get_stats(),
+        'llm_cache': llm_cache.get_stats(),
+        'llm_usage': usage_recorder.get_stats(),
+        'sessions': session_store.get_stats(),
+        'resume_cache': resume_cache.get_stats(),
+        'report_jobs': report_jobs.get_stats(),
+        'asr': get_asr_stats(),
+        'whisper': whisper_asr_service.get_stats(),
+        'audio_decode': audio_decoder.get_stats(),
+        'vad': voice_activity_filter.get_stats(),
+        'asr_sessions': asr_sessions.get_stats(),
+        'asr_race': asr_racer.get_stats()
+    }), 200
\ No newline at end of file
@@ -0,0 +1,231 @@
+"""
+ASGI入口
+
+使用@llm_view编写的大模型接口在这里异步驱动：数据库查询、文件解析等同步步骤放到
+有限大小的线程池执行，等待DeepSeek的过程通过AsyncOpenAI挂在事件循环上，
+单个进程即可同时保持数百个进行中的生成而不需要数百个线程。
+模拟面试的WebSocket通道（interview_socket）也在这里接入。
+其余接口通过asgiref的WsgiToAsgi交给Flask按原方式处理。
+
+启动方式（在backend目录下）：
+    uvicorn asgi:application --host 0.0.0.0 --port 5000
+"""
+import io
+import sys
+import asyncio
+import inspect
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from asgiref.wsgi import WsgiToAsgi
+from flask import request
+from werkzeug.exceptions import HTTPException
+from config import ASGI_CONFIG
+from .services.llm_gateway import llm_gateway
+from .utils.llm_view import advance_llm_view
+from .interview_socket import InterviewSocket, match_interview_socket
+
+
+def _build_environ(scope, body):
+    """根据ASGI scope和请求体构建WSGI environ"""
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf8").decode("latin1"),
+        "PATH_INFO": scope["path"].encode("utf8").decode("latin1"),
+        "QUERY_STRING": scope["query_string"].decode("ascii"),
+        "SERVER_PROTOCOL": f"HTTP/{scope['http_version']}",
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False
+    }
+
+    server = scope.get("server") or ("localhost", 80)
+    environ["SERVER_NAME"] = server[0]
+    environ["SERVER_PORT"] = str(server[1] or 80)
+
+    client = scope.get("client")
+    if client:
+        environ["REMOTE_ADDR"] = client[0]
+        environ["REMOTE_PORT"] = str(client[1])
+
+    for name, value in scope["headers"]:
+        name = name.decode("latin1")
+        if name == "content-length":
+            key = "CONTENT_LENGTH"
+        elif name == "content-type":
+            key = "CONTENT_TYPE"
+        else:
+            key = "HTTP_" + name.upper().replace("-", "_")
+        value = value.decode("latin1")
+        if key in environ:
+            value = environ[key] + "," + value
+        environ[key] = value
+
+    # 请求体已完整读取（可能是分块传输），以实际长度为准
+    environ["CONTENT_LENGTH"] = str(len(body))
+
+    return environ
+
+
+async def _read_body(receive):
+    """读取完整的HTTP请求体"""
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            break
+    return b"".join(chunks)
+
+
+def _isolated_send(send):
+    """
+    在空的contextvars上下文中执行send
+
+    WsgiToAsgi在同步线程中通过AsyncToSync调用send，此时上下文中带有该请求的线程执行器；
+    uvicorn在send中完成响应后恢复读取keep-alive连接，读回调（以及同一连接上的下一个请求）会继承这个上下文，
+    之后的WSGI请求会误用已退出的执行器而失败（CurrentThreadExecutor already quit or is broken）
+    """
+    async def wrapper(message):
+        await contextvars.Context().run(asyncio.ensure_future, send(message))
+    return wrapper
+
+
+class LLMAsgiApp:
+    """
+    包装Flask应用的ASGI应用
+
+    示例用法：
+    >>> from app import app
+    >>> application = LLMAsgiApp(app)
+    """
+
+    def __init__(self, flask_app, config=None):
+        self.flask_app = flask_app
+        self.config = config or ASGI_CONFIG
+        self.wsgi = WsgiToAsgi(flask_app)
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.config["sync_workers"],
+            thread_name_prefix="asgi-sync"
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+        elif scope["type"] == "http" and self._is_llm_view(scope):
+            await self._handle_llm_view(scope, receive, send)
+        elif scope["type"] == "websocket":
+            await self._handle_websocket(scope, receive, send)
+        else:
+            await self.wsgi(scope, receive, _isolated_send(send))
+
+    async def _lifespan(self, receive, send):
+        """处理ASGI生命周期事件，关闭时释放异步连接池和线程池"""
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await llm_gateway.aclose()
+                self.executor.shutdown(wait=False)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _handle_websocket(self, scope, receive, send):
+        """WebSocket连接：目前只有模拟面试通道，其余路径直接拒绝"""
+        interview_id = match_interview_socket(scope)
+        if interview_id is None:
+            await receive()
+            await send({"type": "websocket.close", "code": 1008})
+            return
+        environ = _build_environ({**scope, "method": "GET"}, b"")
+        await InterviewSocket(self, scope, environ, receive, send, interview_id).handle()
+
+    def _is_llm_view(self, scope):
+        """判断请求是否命中使用@llm_view编写的视图"""
+        adapter = self.flask_app.url_map.bind("localhost", script_name=scope.get("root_path") or None)
+        try:
+            endpoint, _ = adapter.match(scope["path"], method=scope["method"])
+        except HTTPException:
+            return False
+        view = self.flask_app.view_functions.get(endpoint)
+        return hasattr(view, "llm_view_func")
+
+    def _begin(self):
+        """在请求上下文中执行before_request钩子并调用视图，返回生成器或最终返回值"""
+        try:
+            rv = self.flask_app.preprocess_request()
+            if rv is None:
+                if request.routing_exception is not None:
+                    raise request.routing_exception
+                view = self.flask_app.view_functions[request.url_rule.endpoint]
+                rv = view.llm_view_func(**request.view_args)
+            return rv
+        except Exception as e:
+            return self.flask_app.handle_user_exception(e)
+
+    def _advance(self, gen, value, error):
+        """在请求上下文中推进视图一步，视图内未处理的异常按Flask的方式转换为响应"""
+        try:
+            return advance_llm_view(gen, value, error)
+        except Exception as e:
+            return True, self.flask_app.handle_user_exception(e)
+
+    def _finalize(self, rv):
+        """生成最终响应并执行after_request钩子（如CORS）"""
+        response = self.flask_app.finalize_request(rv)
+        return response.status_code, response.headers.to_wsgi_list(), response.get_data()
+
+    async def _handle_llm_view(self, scope, receive, send):
+        """异步驱动一个@llm_view视图"""
+        loop = asyncio.get_running_loop()
+        environ = _build_environ(scope, await _read_body(receive))
+
+        # 请求上下文保存在独立的contextvars上下文中，视图的每个同步步骤都在其中执行
+        context = contextvars.Context()
+        request_ctx = self.flask_app.request_context(environ)
+
+        def run(func, *args):
+            return loop.run_in_executor(self.executor, context.run, func, *args)
+
+        await run(request_ctx.push)
+        try:
+            try:
+                rv = await run(self._begin)
+                if inspect.isgenerator(rv):
+                    value, error = None, None
+                    while True:
+                        done, item = await run(self._advance, rv, value, error)
+                        if done:
+                            rv = item
+                            break
+                        try:
+                            if isinstance(item, list):
+                                value, error = await llm_gateway.aexecute_all(item), None
+                            else:
+                                value, error = await llm_gateway.aexecute(item), None
+                        except Exception as e:
+                            value, error = None, e
+                status, headers, body = await run(self._finalize, rv)
+            except Exception as e:
+                response = await run(self.flask_app.handle_exception, e)
+                status, headers, body = response.status_code, response.headers.to_wsgi_list(), response.get_data()
+        finally:
+            await run(request_ctx.pop)
+
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(key.lower().encode("latin1"), value.encode("latin1")) for key, value in headers]
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+def create_asgi_app(flask_app):
+    """创建ASGI应用"""
+    return LLMAsgiApp(flask_app)
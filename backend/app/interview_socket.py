@@ -0,0 +1,268 @@
+"""
+模拟面试的WebSocket通道
+
+每场面试一个连接（/api/mock-interview/ws/<interviewId>），替代语音面试中逐段上传音频分片、
+提交回答再轮询的多次HTTP请求：JWT只在建立连接时校验一次，之后在同一个连接上双向传输。
+
+客户端发送：
+- 二进制帧：16位单声道PCM音频（采样率由start消息指定）
+- {"type": "start", "questionId": 1, "sampleRate": 16000, "engine": "aliyun"}：开始录制一个回答
+- {"type": "stop", "submit": false}：结束录制，推送完整识别文本；submit为true时直接以识别文本提交回答
+- {"type": "answer", "questionId": 1, "answer": "..."}：提交文字回答
+- {"type": "ping"}
+
+服务端推送（与SSE接口的事件一致）：{"event": 事件名, "data": {...}}
+- ready、pong、partial（录制中的识别文本）、transcript（完整识别文本）
+- question、feedback（反馈分段）、nextQuestion（本轮完整结果）、error
+
+录制中的音频按ws_partial_interval分段送入识别会话（app/services/asr_session.py），
+每次只识别上次确认点之后的音频，结束录制时复用已确认的识别文本，只识别剩余部分。
+
+仅在ASGI入口下可用，JWT通过查询参数token或Authorization请求头传递。
+"""
+import re
+import json
+import asyncio
+import contextvars
+from urllib.parse import parse_qs
+from flask import request
+from config import ASGI_CONFIG
+from .utils.jwt_utils import JWTUtil
+
+WS_PATH_PATTERN = re.compile(r"^/api/mock-interview/ws/(?P<interview_id>[\w-]+)$")
+
+# 关闭连接时使用的状态码（4000-4999为应用自定义）
+CLOSE_UNAUTHORIZED = 4401
+CLOSE_NOT_FOUND = 4404
+
+
+def match_interview_socket(scope):
+    """WebSocket请求路径匹配面试通道时返回面试ID，否则返回None"""
+    match = WS_PATH_PATTERN.match(scope["path"])
+    return match.group("interview_id") if match else None
+
+
+def _token_from_scope(scope):
+    """从查询参数或Authorization请求头取出JWT（浏览器的WebSocket无法设置请求头，使用查询参数）"""
+    query = parse_qs(scope.get("query_string", b"").decode("latin1"))
+    if query.get("token"):
+        return query["token"][0]
+    for name, value in scope.get("headers", []):
+        if name.decode("latin1").lower() == "authorization":
+            value = value.decode("latin1")
+            if value.startswith("Bearer "):
+                return value.split(" ", 1)[1]
+    return None
+
+
+class InterviewSocket:
+    """
+    一个面试WebSocket连接
+
+    识别、保存回答和生成反馈等同步步骤放到ASGI应用的线程池中，在同一个请求上下文（已设置user_id）中执行；
+    一轮问答进行时仍可以接收下一段音频，同时只进行一轮问答和一次录制中识别。
+    """
+
+    def __init__(self, asgi_app, scope, environ, receive, send, interview_id, config=None):
+        self.asgi_app = asgi_app
+        self.flask_app = asgi_app.flask_app
+        self.scope = scope
+        self.environ = environ
+        self.receive = receive
+        self.send = send
+        self.interview_id = interview_id
+        self.config = config or ASGI_CONFIG
+        self.loop = None
+        self.context = contextvars.Context()
+        self._send_lock = asyncio.Lock()
+        self.closed = False
+
+        # 当前录制的回答
+        self.recording = False
+        self.question_id = None
+        self.sample_rate = 16000
+        self.engine = "aliyun"
+        self.pcm = bytearray()
+        self._fed_at = 0  # 已送入识别会话的音频字节数
+        self._chunk_index = 0  # 下一段送入识别会话的音频序号
+        self._partial_task = None
+        self._turn_task = None
+        self._turn_busy = False
+        self._turn_seq = 0
+
+    def _run(self, func, *args):
+        """在线程池中执行同步步骤（每次复制请求上下文，允许多个步骤并发）"""
+        return self.loop.run_in_executor(self.asgi_app.executor, self.context.copy().run, func, *args)
+
+    async def emit(self, event, data):
+        """推送一个事件"""
+        async with self._send_lock:
+            await self.send({"type": "websocket.send", "text": json.dumps({"event": event, "data": data}, ensure_ascii=False)})
+
+    def _emit_threadsafe(self, event, data):
+        """在线程池中推送事件，等待发送完成（慢客户端会减慢生成端）；连接已断开时丢弃"""
+        if self.closed:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self.emit(event, data), self.loop).result()
+        except Exception as e:
+            print(f"WebSocket推送失败: {e}")
+            self.closed = True
+
+    async def close(self, code):
+        await self.send({"type": "websocket.close", "code": code})
+
+    async def handle(self):
+        """处理连接的完整生命周期"""
+        self.loop = asyncio.get_running_loop()
+        message = await self.receive()
+        if message["type"] != "websocket.connect":
+            return
+
+        user_id = JWTUtil.verify_token(_token_from_scope(self.scope) or "")
+        if not user_id:
+            await self.close(CLOSE_UNAUTHORIZED)
+            return
+
+        request_ctx = self.flask_app.request_context(self.environ)
+
+        def push():
+            request_ctx.push()
+            request.user_id = user_id
+
+        await self.loop.run_in_executor(self.asgi_app.executor, self.context.run, push)
+        try:
+            from .routes.mock_interview import realtime_session_exists
+            if not await self._run(realtime_session_exists, self.interview_id):
+                await self.close(CLOSE_NOT_FOUND)
+                return
+
+            await self.send({"type": "websocket.accept"})
+            print(f"[API LOG] /api/mock-interview/ws - Connected: interviewId={self.interview_id}, userId={user_id}")
+            await self.emit("ready", {"interviewId": self.interview_id})
+
+            while True:
+                message = await self.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                if message.get("bytes") is not None:
+                    self._on_audio(message["bytes"])
+                elif message.get("text") is not None:
+                    await self._on_text(message["text"])
+        finally:
+            # 进行中的问答继续完成并保存到会话（客户端重连后可继续面试），只是不再推送事件
+            self.closed = True
+            tasks = [task for task in (self._partial_task, self._turn_task) if task is not None]
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await self.loop.run_in_executor(self.asgi_app.executor, self.context.run, request_ctx.pop)
+            print(f"[API LOG] /api/mock-interview/ws - Disconnected: interviewId={self.interview_id}")
+
+    def _on_audio(self, chunk):
+        """接收一段PCM音频，累计足够的新音频后在后台把新音频送入识别会话"""
+        if not self.recording:
+            return
+        max_bytes = int(self.config["ws_max_answer_seconds"] * self.sample_rate * 2)
+        self.pcm.extend(chunk[:max(max_bytes - len(self.pcm), 0)])
+        interval_bytes = int(self.config["ws_partial_interval"] * self.sample_rate * 2)
+        if len(self.pcm) - self._fed_at >= interval_bytes and (self._partial_task is None or self._partial_task.done()):
+            self._partial_task = asyncio.ensure_future(self._transcribe("partial"))
+
+    async def _transcribe(self, event, final=False):
+        """
+        把上次之后录制的新音频送入识别会话并推送识别文本
+
+        识别会话只识别未确认的音频，录制中不会反复识别整段录音；final时识别剩余音频并推送完整识别文本
+        """
+        from .routes.mock_interview import transcribe_pcm_chunk
+        pcm = bytes(self.pcm[self._fed_at:])
+        chunk_index = self._chunk_index
+        self._fed_at = len(self.pcm)
+        self._chunk_index += 1
+        try:
+            text = await self._run(transcribe_pcm_chunk, self.interview_id, self.question_id, chunk_index,
+                                   pcm, self.sample_rate, self.engine, final)
+        except Exception as e:
+            print(f"WebSocket语音识别失败: {e}")
+            if not self.closed:
+                await self.emit("error", {"error": "语音识别失败"})
+            return None
+        if not self.closed:
+            await self.emit(event, {"questionId": self.question_id, "transcribedText": text})
+        return text
+
+    async def _on_text(self, text):
+        """处理控制消息"""
+        try:
+            message = json.loads(text)
+        except ValueError:
+            await self.emit("error", {"error": "消息格式错误"})
+            return
+
+        kind = message.get("type")
+        if kind == "ping":
+            await self.emit("pong", {})
+        elif kind == "start":
+            from .routes.mock_interview import discard_pcm_transcript
+            # 等待上一次录制中的识别完成，再丢弃它的识别会话
+            if self._partial_task is not None:
+                await asyncio.gather(self._partial_task, return_exceptions=True)
+            self.recording = True
+            self.question_id = message.get("questionId")
+            self.sample_rate = int(message.get("sampleRate") or 16000)
+            self.engine = message.get("engine") or "aliyun"
+            self.pcm = bytearray()
+            self._fed_at = 0
+            self._chunk_index = 0
+            await self._run(discard_pcm_transcript, self.interview_id, self.question_id)
+        elif kind == "stop":
+            self.recording = False
+            # 等待进行中的识别完成，保证完整识别文本在最后推送
+            if self._partial_task is not None:
+                await asyncio.gather(self._partial_task, return_exceptions=True)
+            # 只识别剩余的新音频，复用录制中已确认的识别文本
+            transcript = await self._transcribe("transcript", final=True) if self.pcm else ""
+            if message.get("submit"):
+                if transcript:
+                    self._start_turn(self.question_id, transcript, {"transcribedText": transcript})
+                elif transcript is not None:
+                    await self.emit("error", {"error": "未识别到语音内容"})
+        elif kind == "answer":
+            answer = (message.get("answer") or "").strip()
+            if not answer:
+                await self.emit("error", {"error": "回答内容为空"})
+                return
+            self._start_turn(message.get("questionId"), answer)
+        else:
+            await self.emit("error", {"error": f"未知的消息类型: {kind}"})
+
+    def _start_turn(self, question_id, answer, extra=None):
+        """在后台执行一轮问答，同一连接同时只进行一轮"""
+        if self._turn_busy:
+            asyncio.ensure_future(self.emit("error", {"error": "上一轮回答仍在处理中"}))
+            return
+        print(f"[API LOG] /api/mock-interview/ws - Answer received: interviewId={self.interview_id}, questionId={question_id}")
+        self._turn_busy = True
+        self._turn_seq += 1
+        self._turn_task = asyncio.ensure_future(self._run(self._run_turn, self._turn_seq, question_id, answer, extra))
+
+    def _run_turn(self, seq, question_id, answer, extra):
+        """在线程池中执行一轮问答，逐个推送事件"""
+        from .routes.mock_interview import realtime_turn_events
+
+        def release():
+            # 只解除本轮的占用（客户端收到最后一个事件后可能已开始下一轮）
+            if self._turn_seq == seq:
+                self._turn_busy = False
+
+        try:
+            for event, data in realtime_turn_events(self.interview_id, question_id, answer, extra):
+                # 本轮的最后一个事件发出前解除占用，客户端收到后可以立即提交下一轮
+                if event in ("nextQuestion", "error"):
+                    release()
+                self._emit_threadsafe(event, data)
+        except Exception as e:
+            print(f"WebSocket问答处理失败: {e}")
+            release()
+            self._emit_threadsafe("error", {"error": "生成反馈和下一个问题失败"})
+        finally:
+            release()
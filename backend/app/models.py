@@ -105,4 +105,21 @@ class InterviewStrategy(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.datetime.now)
     updated_at = db.Column(db.DateTime, default=datetime.datetime.now, onupdate=datetime.datetime.now)
 
-
+# 大模型调用用量表（每次上游调用一行，由后台线程批量写入）
+class LLMUsage(db.Model):
+    __tablename__ = 'llm_usages'
+    __table_args__ = (
+        db.Index('ix_llm_usages_created_route', 'created_at', 'route'),
+        db.Index('ix_llm_usages_user_created', 'user_id', 'created_at'),
+    )
+    
+    id = db.Column(db.BigInteger().with_variant(db.Integer, 'sqlite'), primary_key=True, autoincrement=True)
+    user_id = db.Column(db.String(36), nullable=True)  # 发起调用的用户，后台任务等无用户时为空
+    route = db.Column(db.String(64), nullable=False)  # 调用来源路由标识
+    model = db.Column(db.String(50), nullable=False)
+    prompt_tokens = db.Column(db.Integer, nullable=False, default=0)
+    completion_tokens = db.Column(db.Integer, nullable=False, default=0)
+    cached_tokens = db.Column(db.Integer, nullable=False, default=0)  # 命中上游前缀缓存的prompt token数
+    latency_ms = db.Column(db.Integer, nullable=False, default=0)
+    success = db.Column(db.Boolean, nullable=False, default=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.datetime.now)
@@ -5,6 +5,7 @@ from .question_bank import bp as question_bank_bp
 from .mock_interview import bp as mock_interview_bp
 from .strategy import bp as strategy_bp
 from .auth import bp as auth_bp
+from .usage import bp as usage_bp
 
 # 重命名蓝图，便于在__init__.py中导入
 resume = resume_bp
@@ -13,3 +14,4 @@ question_bank = question_bank_bp
 mock_interview = mock_interview_bp
 strategy = strategy_bp
 auth = auth_bp
+usage = usage_bp
@@ -1,19 +1,417 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, stream_with_context
 import random
 import uuid
 import json
-from ..services.deepseek_service import client
+import math
+from ..services.llm_gateway import llm_gateway, LLMCall
 from ..services.file_service import get_resume_content
+from ..services.conversation_compactor import conversation_compactor, estimate_tokens
+from ..services.session_store import session_store, SessionNotFoundError
+from ..services.resume_cache import resume_cache
+from ..services.report_jobs import report_jobs, ReportQueueFullError
+from ..services.answer_evaluator import answer_evaluator
 from ..models import db, User, MockInterview
 from ..utils.jwt_utils import auth_required
+from ..utils.llm_view import llm_view
+from config import MOCK_INTERVIEW_CONFIG
 
 # 创建蓝图
 bp = Blueprint('mock_interview', __name__, url_prefix='/api/mock-interview')
 
-# 保存面试会话的字典（生产环境中应使用数据库）
-interview_sessions = {}
+def _interviewer_system_message(style, resume_content):
+    """
+    面试官人设和简历组成的系统消息，放在每次调用的最前面
+
+    同一场面试的开始、逐题提问和报告调用使用逐字相同的前缀，上游可以复用前缀缓存；
+    随调用变化的要求放在消息末尾的系统指令中。
+    """
+    resume_content = conversation_compactor.fit_resume(resume_content)
+    return {"role": "system", "content": "你是一位" + style + "风格的专业面试官，正在为候选人进行模拟面试。对话中assistant消息是你提出的问题，user消息是候选人的回答。\n\n候选人简历：\n" + resume_content}
+
+def _session_resume(session):
+    """取出会话引用的简历内容（会话中只保存简历摘要）"""
+    return resume_cache.get(session['resume_key'], session['resume_id'])
+
+def _build_next_question_messages(session):
+    """构建生成下一个问题的消息：稳定前缀 + 按token预算压缩的问答消息（含本轮回答） + 生成要求"""
+    instruction = "请根据以上对话生成下一个面试问题，要求：\n   - 问题类型多样（简历深挖题、专业技能题、行为/情景题等）\n   - 与候选人的简历和对话历史相关\n   - 难度适中，符合面试流程\n\n输出格式要求：\n{\"content\": \"下一个问题内容\", \"type\": \"问题类型\"}\n\n只输出JSON格式，不要包含任何额外的文字或解释。"
+    return [
+        _interviewer_system_message(session['style'], _session_resume(session)),
+        *conversation_compactor.history_messages(session),
+        {"role": "system", "content": instruction}
+    ]
+
+def _build_first_question_messages(style, resume_content):
+    """构建生成第一个问题的消息"""
+    instruction = "面试即将开始，请生成第一个面试问题，要求：\n\n1. 问题类型：高频必问题（如自我介绍、求职动机等）\n2. 问题要与候选人的简历背景相关\n3. 语言风格符合" + style + "特点\n4. 仅输出JSON格式，包含id、content、type字段\n5. 不要包含任何额外的文字或解释"
+    return [
+        _interviewer_system_message(style, resume_content),
+        {"role": "system", "content": instruction}
+    ]
+
+def _build_plan_messages(style, resume_content, total_questions):
+    """构建一次性生成整场面试问题计划的消息"""
+    instruction = "面试即将开始，请基于候选人的简历一次性规划本场面试的全部" + str(total_questions) + "个问题，要求：\n\n1. 第1个问题为高频必问题（如自我介绍、求职动机等）\n2. 其余问题类型多样（简历深挖题、专业技能题、行为/情景题等），由浅入深\n3. 问题要与候选人的简历背景相关\n4. 语言风格符合" + style + "特点\n\n输出格式要求：\n{\"questions\": [{\"content\": \"问题内容\", \"type\": \"问题类型\"}]}\n\n只输出JSON格式，不要包含任何额外的文字或解释。"
+    return [
+        _interviewer_system_message(style, resume_content),
+        {"role": "system", "content": instruction}
+    ]
+
+def _build_report_messages(session):
+    """构建生成面试报告的消息：稳定前缀 + 完整问答消息 + 报告要求"""
+    resume_content = _session_resume(session)
+    budget = MOCK_INTERVIEW_CONFIG['report_token_budget'] - estimate_tokens(conversation_compactor.fit_resume(resume_content))
+    instruction = "面试已结束（面试时长：" + str(session['duration']) + "分钟）。请以专业面试评估专家的身份，根据候选人的简历和以上全部问答生成一份详细的面试报告，要求：\n\n1. 包含以下评分项（0-100分）：\n   - professionalScore：专业能力评分\n   - logicScore：逻辑表达评分\n   - confidenceScore：自信程度评分\n   - matchScore：岗位匹配度评分\n\n2. 逐题诊断，每个问题包含：\n   - question：问题内容\n   - answer：候选人回答\n   - feedback：对该回答的评价\n   - suggestion：改进建议\n\n3. 优化建议，包含至少4条针对性建议\n\n输出格式要求：\n{\"professionalScore\": 数字, \"logicScore\": 数字, \"confidenceScore\": 数字, \"matchScore\": 数字, \"questionAnalysis\": [{\"question\": \"问题内容\", \"answer\": \"候选人回答\", \"feedback\": \"评价\", \"suggestion\": \"改进建议\"}], \"optimizationSuggestions\": [\"建议1\", \"建议2\"]}\n\n只输出JSON格式，不要包含任何额外的文字或解释。"
+    return [
+        _interviewer_system_message(session['style'], resume_content),
+        *conversation_compactor.transcript_messages(session, budget),
+        {"role": "system", "content": instruction}
+    ]
+
+def _parse_question_plan(api_result, total_questions):
+    """从模型输出中解析问题计划，无法解析时返回None"""
+    start_idx = api_result.find('{')
+    end_idx = api_result.rfind('}') + 1
+    if start_idx == -1 or end_idx <= start_idx:
+        return None
+    questions = json.loads(api_result[start_idx:end_idx]).get("questions") or []
+    plan = [
+        {"id": index + 1, "content": question["content"], "type": question.get("type", "")}
+        for index, question in enumerate(q for q in questions if q.get("content"))
+    ]
+    return plan[:total_questions] or None
+
+def _has_planned_question(session):
+    """预生成模式下，计划中是否还有下一个问题"""
+    plan = session.get("question_plan")
+    return bool(plan) and session["current_question_id"] < len(plan)
+
+def _build_feedback_messages(session, current_question, answer):
+    """构建生成本轮回答反馈的消息，反馈只依赖当前问题和回答，不携带简历和对话历史"""
+    prompt = "你是一位" + session['style'] + "风格的面试官，正在为候选人进行面试。\n\n当前问题：" + current_question + "\n候选人回答：" + answer + "\n\n请对当前回答给出反馈，要求：\n- 评价回答的质量、逻辑、深度\n- 指出优点和不足\n- 语言风格符合" + session['style'] + "\n\n直接输出反馈内容，不要输出JSON或任何额外的文字。"
+    return [
+        {"role": "system", "content": "你是一位" + session['style'] + "风格的专业面试官"},
+        {"role": "user", "content": prompt}
+    ]
+
+def _build_follow_up_messages(session, planned_question, answer):
+    """构建把计划中的下一个问题改写为追问的消息"""
+    prompt = "下一个计划问题：" + planned_question + "\n候选人刚才的回答：" + answer + "\n\n如果回答中有值得追问的内容，请把下一个问题改写为自然衔接该回答的追问，保持原问题的考察点不变；否则原样输出下一个问题。\n\n只输出问题内容，不要包含任何额外的文字或解释。"
+    return [
+        {"role": "system", "content": "你是一位" + session['style'] + "风格的专业面试官"},
+        {"role": "user", "content": prompt}
+    ]
+
+def _next_question_call(session, current_question, answer):
+    """
+    生成下一个问题的调用，只依赖简历、对话历史和本轮回答（本轮回答已记录在会话中）
+
+    预生成模式下下一个问题取自计划，开启追问时返回改写调用，否则返回None
+    """
+    if _has_planned_question(session):
+        if not session.get("follow_up"):
+            return None
+        planned = session["question_plan"][session["current_question_id"]]
+        return LLMCall(
+            messages=_build_follow_up_messages(session, planned["content"], answer),
+            route="mock_interview.follow_up",
+            temperature=0.7,
+            max_tokens=200,
+            timeout=20
+        )
+    return LLMCall(
+        messages=_build_next_question_messages(session),
+        route="mock_interview.next_question",
+        temperature=0.7,
+        max_tokens=256,
+        timeout=60
+    )
+
+def _parse_next_question(api_result, session):
+    """解析下一个问题，预生成模式下使用计划中的问题（改写结果非空时替换其内容）"""
+    next_id = session["current_question_id"] + 1
+    if _has_planned_question(session):
+        planned = session["question_plan"][session["current_question_id"]]
+        content = api_result.strip() if api_result else ""
+        return {"id": next_id, "content": content or planned["content"], "type": planned["type"]}
+    
+    start_idx = api_result.find('{')
+    end_idx = api_result.rfind('}') + 1
+    if start_idx == -1 or end_idx <= start_idx:
+        raise ValueError("未找到有效的JSON结构")
+    next_question = json.loads(api_result[start_idx:end_idx])
+    return {"id": next_id, "content": next_question["content"], "type": next_question.get("type", "")}
+
+def _feedback_call(session, current_question, answer, route="mock_interview.feedback"):
+    """生成本轮回答反馈的调用"""
+    return LLMCall(
+        messages=_build_feedback_messages(session, current_question, answer),
+        route=route,
+        temperature=0.7,
+        max_tokens=512,
+        timeout=60
+    )
+
+def _save_answer(session, question_id, question, answer):
+    """
+    记录本轮问题和回答，反馈和逐题评估生成后保存在同一条记录上
+
+    开启逐题评估时在后台提交本轮回答的评估，候选人继续答题不需要等待
+
+    Returns:
+        int: 该记录在会话问答记录中的序号
+    """
+    entry = {
+        "question_id": question_id,
+        "question": question,
+        "answer": answer,
+        "feedback": None,
+        "feedback_status": "pending",
+        "evaluation": None,
+        "evaluation_status": "pending" if answer_evaluator.enabled else None
+    }
+    index = session_store.append_turn(session["interview_id"], entry)
+    session["question_answers"].append(entry)
+    if answer_evaluator.enabled:
+        answer_evaluator.submit(session["interview_id"], index, entry,
+                                _interviewer_system_message(session['style'], _session_resume(session)))
+    return index
+
+def _set_feedback(session, index, feedback):
+    """保存本轮反馈，返回保存的反馈内容"""
+    def apply(entry):
+        entry["feedback"] = feedback.strip()
+        entry["feedback_status"] = "done"
+        return entry["feedback"]
+    return session_store.update_turn(session["interview_id"], index, apply)
+
+def _set_feedback_error(session, index):
+    """反馈尚未生成时标记为失败，返回已有的反馈内容"""
+    def apply(entry):
+        if entry["feedback_status"] == "pending":
+            entry["feedback_status"] = "error"
+        return entry["feedback"]
+    return session_store.update_turn(session["interview_id"], index, apply)
+
+def _submit_feedback(session, index, call):
+    """在后台生成反馈，完成后写回回答记录，供/feedback接口查询"""
+    def on_done(future):
+        try:
+            _set_feedback(session, index, future.result())
+        except Exception as e:
+            print(f"后台生成反馈失败: {e}")
+            try:
+                _set_feedback_error(session, index)
+            except Exception as store_error:
+                print(f"保存反馈状态失败: {store_error}")
+    llm_gateway.submit(call).add_done_callback(on_done)
+
+def _run_turn(session, index, current_question, answer, defer_feedback=False):
+    """
+    执行一轮问答：反馈和下一个问题由两个互不依赖的调用并发生成
+
+    defer_feedback为True时只等待下一个问题，反馈在后台生成，客户端通过/feedback接口获取
+    """
+    next_call = _next_question_call(session, current_question, answer)
+    feedback_call = _feedback_call(session, current_question, answer)
+    
+    if defer_feedback:
+        _submit_feedback(session, index, feedback_call)
+        api_result = (yield next_call) if next_call else None
+        return {"feedback": None, "feedbackPending": True, "nextQuestion": _parse_next_question(api_result, session)}
+    
+    if next_call:
+        api_result, feedback = yield [next_call, feedback_call]
+    else:
+        api_result, feedback = None, (yield feedback_call)
+    feedback = _set_feedback(session, index, feedback)
+    return {"feedback": feedback, "nextQuestion": _parse_next_question(api_result, session)}
+
+# 大模型不可用时使用的通用问题
+FALLBACK_QUESTIONS = [
+    {"content": "请介绍一个你最有成就感的项目，以及你在其中承担的角色", "type": "简历深挖题"},
+    {"content": "你在工作或项目中遇到的最大挑战是什么？你是如何解决的？", "type": "行为/情景题"},
+    {"content": "你为什么选择应聘这个岗位？", "type": "高频必问题"},
+    {"content": "请谈谈你最擅长的一项专业技能，以及你是如何提升它的", "type": "专业技能题"},
+    {"content": "当你和团队成员意见不一致时，你通常会怎么处理？", "type": "行为/情景题"},
+    {"content": "请谈谈你未来三到五年的职业规划", "type": "高频必问题"}
+]
+
+def _fallback_turn_result(session, index):
+    """上游调用失败时的降级结果：下一个问题取自计划或通用问题，反馈留空"""
+    feedback = _set_feedback_error(session, index)
+    
+    if _has_planned_question(session):
+        next_question = _parse_next_question(None, session)
+    else:
+        asked = set(session["conversation_history"])
+        candidates = [q for q in FALLBACK_QUESTIONS if q["content"] not in asked] or FALLBACK_QUESTIONS
+        next_question = {"id": session["current_question_id"] + 1, **random.choice(candidates)}
+    return {"feedback": feedback or "", "nextQuestion": next_question, "degraded": True}
+
+def _fallback_report(session):
+    """上游调用失败时的降级报告：不给出评分，逐题诊断使用面试过程中已生成的反馈"""
+    return {
+        "professionalScore": None,
+        "logicScore": None,
+        "confidenceScore": None,
+        "matchScore": None,
+        "questionAnalysis": [
+            {
+                "question": qa["question"],
+                "answer": qa["answer"],
+                "feedback": qa.get("feedback") or "",
+                "suggestion": ""
+            }
+            for qa in session["question_answers"]
+        ],
+        "optimizationSuggestions": ["面试报告生成服务暂时不可用，以上为面试过程中的逐题反馈"],
+        "degraded": True
+    }
+
+def _advance_session(session, result):
+    """更新会话信息：问题序号加一并记录下一个问题，必要时在后台压缩较早的对话"""
+    def apply(meta):
+        meta["current_question_id"] += 1
+        meta["conversation_history"].append(result["nextQuestion"]["content"])
+    session_store.update(session["interview_id"], apply)
+    conversation_compactor.maybe_compact(session)
+
+def _load_session(interview_id):
+    """读取面试会话，不存在、已过期或已结束时返回None"""
+    session = session_store.get(interview_id) if interview_id else None
+    if session is None or session.get("ended"):
+        return None
+    return session
+
+def _sse_event(event, data):
+    """格式化一条Server-Sent Events消息"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def _turn_events(session, index, current_question, answer, extra=None):
+    """
+    流式执行一轮问答，逐个产出(事件名, 数据)，由SSE接口和WebSocket通道分别发送
+
+    下一个问题在后台生成，就绪后立即以question事件发送；反馈随模型输出逐段以feedback事件推送。
+    全部完成后按与阻塞接口相同的方式更新会话，并以nextQuestion事件发送完整结果；
+    上游调用失败时与阻塞接口一样使用降级结果（已发送过下一个问题时沿用该问题），保证这一轮正常结束；
+    会话在这一轮进行中结束或过期时以error事件结束。
+    """
+    next_question = None
+    try:
+        try:
+            next_call = _next_question_call(session, current_question, answer)
+            next_future = llm_gateway.submit(next_call) if next_call else None
+            if next_future is None:
+                next_question = _parse_next_question(None, session)
+                yield "question", {"nextQuestion": next_question}
+            
+            feedback = []
+            for delta in llm_gateway.stream(
+                messages=_build_feedback_messages(session, current_question, answer),
+                route="mock_interview.feedback_stream",
+                temperature=0.7,
+                max_tokens=512,
+                timeout=60
+            ):
+                if next_question is None and next_future.done():
+                    next_question = _parse_next_question(next_future.result(), session)
+                    yield "question", {"nextQuestion": next_question}
+                feedback.append(delta)
+                yield "feedback", {"delta": delta}
+            
+            if next_question is None:
+                next_question = _parse_next_question(next_future.result(), session)
+                yield "question", {"nextQuestion": next_question}
+            
+            result = {"feedback": _set_feedback(session, index, "".join(feedback)), "nextQuestion": next_question}
+        except Exception as e:
+            print(f"流式生成反馈和下一个问题失败: {e}")
+            # 使用降级结果作为备选，保证面试可以继续
+            result = _fallback_turn_result(session, index)
+            if next_question is not None:
+                result["nextQuestion"] = next_question
+        if extra:
+            result.update(extra)
+        
+        # 更新会话信息
+        _advance_session(session, result)
+    except SessionNotFoundError:
+        # 这一轮进行中会话已结束或过期
+        yield "error", {"error": "面试会话不存在"}
+        return
+    
+    yield "nextQuestion", result
+
+def _stream_turn(session, index, current_question, answer, extra=None):
+    """流式执行一轮问答，产出SSE消息"""
+    for event, data in _turn_events(session, index, current_question, answer, extra):
+        yield _sse_event(event, data)
+
+def realtime_turn_events(interview_id, question_id, answer, extra=None):
+    """
+    WebSocket通道提交一轮回答：记录回答后流式执行一轮问答，逐个产出(事件名, 数据)
+
+    需要在设置了user_id的请求上下文中调用
+    """
+    session = _load_session(interview_id)
+    if session is None:
+        yield "error", {"error": "面试会话不存在"}
+        return
+    
+    # 保存当前问题和回答
+    current_question = session["conversation_history"][-1] if session["conversation_history"] else "请介绍一下你自己"
+    index = _save_answer(session, question_id, current_question, answer)
+    yield from _turn_events(session, index, current_question, answer, extra)
+
+def realtime_session_exists(interview_id):
+    """面试会话是否存在且未结束（WebSocket通道建立连接时检查）"""
+    return _load_session(interview_id) is not None
+
+def _event_stream_response(events):
+    """包装SSE响应，关闭代理缓冲以便逐条推送"""
+    return Response(stream_with_context(events), mimetype='text/event-stream', headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+
+def _new_session(interview_id, style, mode, duration, resume_id, resume_content, first_question, question_plan=None, follow_up=False):
+    """创建面试会话信息"""
+    return {
+        "interview_id": interview_id,
+        "style": style,
+        "mode": mode,
+        "duration": duration,
+        "resume_id": resume_id,
+        "resume_key": resume_cache.put(resume_content),
+        "current_question_id": 1,
+        "total_questions": len(question_plan) if question_plan else MOCK_INTERVIEW_CONFIG['total_questions'],
+        "question_plan": question_plan,
+        "follow_up": follow_up,
+        "conversation_history": [first_question['content']],
+        "question_answers": [],
+        "summary": "",
+        "summarized_turns": 0,
+        "summary_pending_since": None
+    }
+
+def _start_response(interview_id, style, mode, duration, first_question):
+    """开始面试API的响应"""
+    return jsonify({
+        "interviewId": interview_id,
+        "style": style,
+        "mode": mode,
+        "duration": duration,
+        "currentQuestion": {
+            "id": first_question['id'],
+            "content": first_question['content'],
+            "type": first_question['type']
+        },
+        "tips": ["保持微笑，展现自信", "回答问题时保持逻辑清晰", "注意控制语速，避免过快或过慢"]
+    }), 200
 
 @bp.route('/start', methods=['POST'])
+@llm_view
 @auth_required
 def start():
     """开始模拟面试API"""
@@ -21,11 +419,14 @@ def start():
     style = data.get('style', '温柔HR')
     mode = data.get('mode', '文字模式')
     duration = data.get('duration', 15)
+    plan_ahead = data.get('planAhead', MOCK_INTERVIEW_CONFIG['plan_ahead'])
+    follow_up = data.get('followUp', MOCK_INTERVIEW_CONFIG['follow_up'])
+    total_questions = MOCK_INTERVIEW_CONFIG['total_questions']
     # 从request对象中获取用户ID，这是auth_required装饰器设置的
     user_id = request.user_id
     
     # 打印请求参数
-    print(f"[API LOG] /api/mock-interview/start - Request received: style={style}, mode={mode}, duration={duration}, userId={user_id}")
+    print(f"[API LOG] /api/mock-interview/start - Request received: style={style}, mode={mode}, duration={duration}, planAhead={plan_ahead}, userId={user_id}")
     
     # 根据userId获取最新的resumeId
     resume_id = '1'  # 默认值
@@ -47,26 +448,35 @@ def start():
     # 生成interviewId
     interview_id = f"interview_{uuid.uuid4().hex[:8]}"
     
-    # 构建prompt生成第一个问题（使用字符串连接避免格式说明符问题）
-    prompt = "你是一位" + style + "风格的面试官，正在为候选人进行面试。请基于以下简历内容，生成第一个面试问题，要求：\n\n1. 问题类型：高频必问题（如自我介绍、求职动机等）\n2. 问题要与候选人的简历背景相关\n3. 语言风格符合" + style + "特点\n4. 仅输出JSON格式，包含id、content、type字段\n5. 不要包含任何额外的文字或解释\n\n简历内容：\n" + resume_content
+    # 预生成模式：一次调用生成整场面试的问题计划，之后每轮只需生成反馈
+    if plan_ahead:
+        try:
+            api_result = yield LLMCall(
+                messages=_build_plan_messages(style, resume_content, total_questions),
+                route="mock_interview.plan",
+                temperature=0.7,
+                max_tokens=2048,
+                timeout=60
+            )
+            question_plan = _parse_question_plan(api_result, total_questions)
+            if question_plan:
+                first_question = question_plan[0]
+                session_store.create(interview_id, _new_session(interview_id, style, mode, duration, resume_id, resume_content, first_question,
+                                                                question_plan=question_plan, follow_up=follow_up))
+                return _start_response(interview_id, style, mode, duration, first_question)
+            print("生成面试问题计划失败: 未找到有效的问题列表，改为逐题生成")
+        except Exception as e:
+            print(f"生成面试问题计划失败，改为逐题生成: {e}")
     
     try:
-        response = client.chat.completions.create(
-            model="deepseek-chat",
-            messages=[
-                {"role": "system", "content": "你是一位" + style + "风格的专业面试官"},
-                {"role": "user", "content": prompt}
-            ],
+        api_result = yield LLMCall(
+            messages=_build_first_question_messages(style, resume_content),
+            route="mock_interview.start",
             temperature=0.7,
-            max_tokens=512
+            max_tokens=512,
+            timeout=30
         )
         
-        import json
-        import re
-        
-        # 解析API返回结果
-        api_result = response.choices[0].message.content
-        
         # 清理可能的额外内容，只保留JSON部分
         start_idx = api_result.find('{')
         end_idx = api_result.rfind('}') + 1
@@ -78,30 +488,9 @@ def start():
             first_question = json.loads(json_content)
         
         # 保存会话信息
-        interview_sessions[interview_id] = {
-            "style": style,
-            "mode": mode,
-            "duration": duration,
-            "resume_id": resume_id,
-            "resume_content": resume_content,
-            "current_question_id": 1,
-            "total_questions": 10,
-            "conversation_history": [first_question['content']],
-            "question_answers": []
-        }
+        session_store.create(interview_id, _new_session(interview_id, style, mode, duration, resume_id, resume_content, first_question))
         
-        return jsonify({
-            "interviewId": interview_id,
-            "style": style,
-            "mode": mode,
-            "duration": duration,
-            "currentQuestion": {
-                "id": first_question['id'],
-                "content": first_question['content'],
-                "type": first_question['type']
-            },
-            "tips": ["保持微笑，展现自信", "回答问题时保持逻辑清晰", "注意控制语速，避免过快或过慢"]
-        }), 200
+        return _start_response(interview_id, style, mode, duration, first_question)
         
     except Exception as e:
         print(f"生成第一个问题失败: {e}")
@@ -109,32 +498,12 @@ def start():
         first_question = {"id": 1, "content": "请介绍一下你自己", "type": "高频必问题"}
         
         # 保存会话信息
-        interview_sessions[interview_id] = {
-            "style": style,
-            "mode": mode,
-            "duration": duration,
-            "resume_id": resume_id,
-            "resume_content": resume_content,
-            "current_question_id": 1,
-            "total_questions": 10,
-            "conversation_history": [first_question['content']],
-            "question_answers": []
-        }
+        session_store.create(interview_id, _new_session(interview_id, style, mode, duration, resume_id, resume_content, first_question))
         
-        return jsonify({
-            "interviewId": interview_id,
-            "style": style,
-            "mode": mode,
-            "duration": duration,
-            "currentQuestion": {
-                "id": first_question['id'],
-                "content": first_question['content'],
-                "type": first_question['type']
-            },
-            "tips": ["保持微笑，展现自信", "回答问题时保持逻辑清晰", "注意控制语速，避免过快或过慢"]
-        }), 200
+        return _start_response(interview_id, style, mode, duration, first_question)
 
 @bp.route('/answer', methods=['POST'])
+@llm_view
 @auth_required
 def answer():
     """回答问题API"""
@@ -142,67 +511,119 @@ def answer():
     interview_id = data.get('interviewId')
     question_id = data.get('questionId')
     answer = data.get('answer')
+    defer_feedback = data.get('deferFeedback', False)  # 为True时先返回下一个问题，反馈通过/feedback接口获取
     
     # 打印请求参数
     print(f"[API LOG] /api/mock-interview/answer - Request received: interviewId={interview_id}, questionId={question_id}, answer={answer[:50]}...")
     
     # 检查会话是否存在
-    if interview_id not in interview_sessions:
+    session = _load_session(interview_id)
+    if session is None:
         return jsonify({"error": "面试会话不存在"}), 404
     
-    session = interview_sessions[interview_id]
+    try:
+        # 保存当前问题和回答
+        current_question = session["conversation_history"][-1] if session["conversation_history"] else "请介绍一下你自己"
+        index = _save_answer(session, question_id, current_question, answer)
+        
+        try:
+            # 并发生成反馈和下一个问题
+            result = yield from _run_turn(session, index, current_question, answer, defer_feedback)
+            
+            # 更新会话信息
+            _advance_session(session, result)
+            
+            return jsonify(result), 200
+            
+        except Exception as e:
+            print(f"生成反馈和下一个问题失败: {e}")
+            # 使用降级结果作为备选，保证面试可以继续
+            result = _fallback_turn_result(session, index)
+            _advance_session(session, result)
+            
+            return jsonify(result), 200
+    except SessionNotFoundError:
+        # 这一轮进行中会话已结束或过期
+        return jsonify({"error": "面试会话不存在"}), 404
+
+def _generate_full_report(session, user_id):
+    """把全部问答放进一次调用生成面试报告（未开启逐题评估时使用）"""
+    # 与逐题提问使用相同的前缀和问答消息，问答记录按token预算压缩
+    api_result = llm_gateway.execute(LLMCall(
+        messages=_build_report_messages(session),
+        route="mock_interview.end",
+        user_id=user_id,
+        temperature=0.7,
+        max_tokens=2048,
+        timeout=90
+    ))
     
-    # 保存当前问题和回答
-    session["question_answers"].append({
-        "question_id": question_id,
-        "question": session["conversation_history"][-1] if session["conversation_history"] else "请介绍一下你自己",
-        "answer": answer
-    })
+    # 清理可能的额外内容，只保留JSON部分
+    start_idx = api_result.find('{')
+    end_idx = api_result.rfind('}') + 1
+    if start_idx == -1 or end_idx <= start_idx:
+        raise ValueError("未找到有效的JSON结构")
+    json_content = api_result[start_idx:end_idx]
+    return json.loads(json_content)
+
+def _generate_report(interview_id, user_id):
+    """
+    生成面试报告并保存到数据库，完成后删除会话（在报告任务线程中执行）
     
-    # 构建prompt生成反馈和下一个问题（使用字符串连接避免格式说明符问题）
-    current_question = session["conversation_history"][-1] if session["conversation_history"] else "请介绍一下你自己"
-    prompt = "你是一位" + session['style'] + "风格的面试官，正在为候选人进行面试。请基于以下信息：\n\n1. 简历内容：" + session['resume_content'] + "\n2. 对话历史：" + str(session['conversation_history']) + "\n3. 当前问题：" + current_question + "\n4. 候选人回答：" + answer + "\n\n请完成以下任务：\n\n1. 生成对当前回答的反馈，要求：\n   - 评价回答的质量、逻辑、深度\n   - 指出优点和不足\n   - 语言风格符合" + session['style'] + "\n\n2. 生成下一个面试问题，要求：\n   - 问题类型多样（简历深挖题、专业技能题、行为/情景题等）\n   - 与候选人的简历和对话历史相关\n   - 难度适中，符合面试流程\n\n输出格式要求：\n{\"feedback\": \"对当前回答的反馈\", \"nextQuestion\": {\"id\": 数字id, \"content\": \"下一个问题内容\", \"type\": \"问题类型\"}}\n\n只输出JSON格式，不要包含任何额外的文字或解释。"
+    开启逐题评估时汇总各题的评估结果，只对缺失评估的回答补充调用；上游调用失败时返回降级报告
+    """
+    session = session_store.get(interview_id)
+    if session is None:
+        raise ValueError("面试会话不存在或已过期")
     
     try:
-        response = client.chat.completions.create(
-            model="deepseek-chat",
-            messages=[
-                {"role": "system", "content": "你是一位" + session['style'] + "风格的专业面试官"},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7,
-            max_tokens=1024
-        )
-        
-        import json
-        import re
-        
-        # 解析API返回结果
-        api_result = response.choices[0].message.content
-        
-        # 清理可能的额外内容，只保留JSON部分
-        start_idx = api_result.find('{')
-        end_idx = api_result.rfind('}') + 1
-        if not (start_idx == -1 or end_idx <= start_idx):
-            json_content = api_result[start_idx:end_idx]
-            result = json.loads(json_content)
-            result["nextQuestion"]["id"] = session["current_question_id"] + 1
-        
-        # 更新会话信息
-        session["current_question_id"] += 1
-        session["conversation_history"].append(result["nextQuestion"]["content"])
-        
-        return jsonify(result), 200
+        if answer_evaluator.enabled:
+            prefix = _interviewer_system_message(session['style'], _session_resume(session))
+            session = answer_evaluator.collect(interview_id, prefix, user_id)
+            report = answer_evaluator.aggregate(session)
+            if report is None:
+                raise ValueError("没有可用的逐题评估")
+        else:
+            report = _generate_full_report(session, user_id)
         
     except Exception as e:
-        print(f"生成反馈和下一个问题失败: {e}")
-        
-        return jsonify(result), 200
+        print(f"生成面试报告失败: {e}")
+        # 使用逐题反馈组成的降级报告作为备选
+        session_store.delete(interview_id)
+        return _fallback_report(session)
+    
+    # 保存到数据库
+    try:      
+        # 创建MockInterview记录
+        mock_interview = MockInterview(
+            user_id=user_id,
+            resume_id=session['resume_id'],
+            style=session['style'],
+            mode=session['mode'],
+            duration=session['duration'],
+            conversation_history=json.dumps(session['conversation_history']),
+            question_answers=json.dumps(session['question_answers']),
+            report=json.dumps(report)
+        )
+        db.session.add(mock_interview)
+        db.session.commit()
+    except Exception as db_error:
+        db.session.rollback()
+        print(f"保存模拟面试到数据库失败: {db_error}")
+    
+    # 删除会话信息
+    session_store.delete(interview_id)
+    
+    return report
 
 @bp.route('/end', methods=['POST'])
 @auth_required
 def end():
-    """结束模拟面试API"""
+    """
+    结束模拟面试API，报告在后台生成，立即返回任务ID供轮询
+    
+    会话标记为已结束后不再接受回答，重复结束时返回同一个任务ID
+    """
     data = request.get_json()
     interview_id = data.get('interviewId')
     # 从request对象中获取用户ID，这是auth_required装饰器设置的
@@ -211,68 +632,62 @@ def end():
     # 打印请求参数
     print(f"[API LOG] /api/mock-interview/end - Request received: interviewId={interview_id}, userId={user_id}")
     
-    # 检查会话是否存在
-    if interview_id not in interview_sessions:
+    def claim(meta):
+        if meta.get("ended"):
+            return False, meta.get("report_job_id")
+        meta["ended"] = True
+        return True, None
+    
+    try:
+        claimed, job_id = session_store.update(interview_id, claim) if interview_id else (None, None)
+    except SessionNotFoundError:
+        claimed, job_id = None, None
+    if claimed is None:
         return jsonify({"error": "面试会话不存在"}), 404
+    if not claimed:
+        if job_id is None:
+            return jsonify({"error": "面试正在结束，请稍后重试"}), 409
+        return jsonify({"jobId": job_id, "status": "pending"}), 202
+    
+    try:
+        job_id = report_jobs.submit(user_id, _generate_report, interview_id, user_id)
+    except ReportQueueFullError as e:
+        session_store.update(interview_id, lambda meta: meta.update(ended=False))
+        return jsonify({"error": str(e)}), 503
     
-    session = interview_sessions[interview_id]
+    def set_job(meta):
+        meta["report_job_id"] = job_id
+    try:
+        session_store.update(interview_id, set_job)
+    except SessionNotFoundError:
+        # 报告任务已完成并删除了会话
+        pass
     
-    # 构建prompt生成面试报告（使用字符串连接避免格式说明符问题）
-    prompt = "你是一位专业的面试评估专家，正在为候选人生成面试报告。请基于以下信息：\n\n1. 简历内容：" + session['resume_content'] + "\n2. 面试风格：" + session['style'] + "\n3. 面试时长：" + str(session['duration']) + "分钟\n4. 问答记录：" + str(session['question_answers']) + "\n5. 对话历史：" + str(session['conversation_history']) + "\n\n请生成一份详细的面试报告，要求：\n\n1. 包含以下评分项（0-100分）：\n   - professionalScore：专业能力评分\n   - logicScore：逻辑表达评分\n   - confidenceScore：自信程度评分\n   - matchScore：岗位匹配度评分\n\n2. 逐题诊断，每个问题包含：\n   - question：问题内容\n   - answer：候选人回答\n   - feedback：对该回答的评价\n   - suggestion：改进建议\n\n3. 优化建议，包含至少4条针对性建议\n\n输出格式要求：\n{\"professionalScore\": 数字, \"logicScore\": 数字, \"confidenceScore\": 数字, \"matchScore\": 数字, \"questionAnalysis\": [{\"question\": \"问题内容\", \"answer\": \"候选人回答\", \"feedback\": \"评价\", \"suggestion\": \"改进建议\"}], \"optimizationSuggestions\": [\"建议1\", \"建议2\"]}\n\n只输出JSON格式，不要包含任何额外的文字或解释。"
+    return jsonify({"jobId": job_id, "status": "pending"}), 202
+
+@bp.route('/report/<job_id>', methods=['GET'])
+@auth_required
+def report(job_id):
+    """
+    查询面试报告任务API
     
+    可选参数wait（秒）：任务未完成时最多等待的时间（长轮询，不超过REPORT_JOB_MAX_WAIT秒），默认不等待
+    """
     try:
-        response = client.chat.completions.create(
-            model="deepseek-chat",
-            messages=[
-                {"role": "system", "content": "你是一位专业的面试评估专家"},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7,
-            max_tokens=2048
-        )
-        
-        # 解析API返回结果
-        api_result = response.choices[0].message.content
-        
-        # 清理可能的额外内容，只保留JSON部分
-        start_idx = api_result.find('{')
-        end_idx = api_result.rfind('}') + 1
-        if not (start_idx == -1 or end_idx <= start_idx):
-            json_content = api_result[start_idx:end_idx]
-            report = json.loads(json_content)
-        
-        # 保存到数据库
-        try:      
-            # 创建MockInterview记录
-            mock_interview = MockInterview(
-                user_id=user_id,
-                resume_id=session['resume_id'],
-                style=session['style'],
-                mode=session['mode'],
-                duration=session['duration'],
-                conversation_history=json.dumps(session['conversation_history']),
-                question_answers=json.dumps(session['question_answers']),
-                report=json.dumps(report)
-            )
-            db.session.add(mock_interview)
-            db.session.commit()
-        except Exception as db_error:
-            print(f"保存模拟面试到数据库失败: {db_error}")
-        
-        # 删除会话信息
-        del interview_sessions[interview_id]
-        
-        return jsonify(report), 200
-        
-    except Exception as e:
-        print(f"生成面试报告失败: {e}")
-        
-        # 删除会话信息
-        del interview_sessions[interview_id]
-        
-        return jsonify(report), 200
+        wait = float(request.args.get('wait', 0))
+    except ValueError:
+        wait = 0
+    if not math.isfinite(wait):
+        wait = 0
+    
+    job = report_jobs.get(job_id, request.user_id, wait=wait)
+    if job is None:
+        return jsonify({"error": "面试报告任务不存在"}), 404
+    
+    return jsonify(job), 200
 
 @bp.route('/voice-answer', methods=['POST'])
+@llm_view
 @auth_required
 def voice_answer():
     """语音回答API，处理用户语音输入"""
@@ -281,91 +696,194 @@ def voice_answer():
         interview_id = request.form.get('interviewId')
         question_id = request.form.get('questionId')
         audio_file = request.files.get('audio')
+        defer_feedback = request.form.get('deferFeedback', 'false').lower() == 'true'
         
         # 打印请求参数
         print(f"[API LOG] /api/mock-interview/voice-answer - Request received: interviewId={interview_id}, questionId={question_id}")
         
         # 检查会话是否存在
-        if interview_id not in interview_sessions:
+        session = _load_session(interview_id)
+        if session is None:
             return jsonify({"error": "面试会话不存在"}), 404
         
-        # 保存音频文件到临时目录
-        import os
-        import tempfile
-        from datetime import datetime
-        
-        # 创建临时目录
-        temp_dir = os.path.join(os.getcwd(), 'temp_audio')
-        if not os.path.exists(temp_dir):
-            os.makedirs(temp_dir)
-        
-        # 生成唯一的文件名
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        audio_path = os.path.join(temp_dir, f'{interview_id}_{timestamp}.webm')
-        audio_file.save(audio_path)
-        
         # 获取语音识别引擎参数，默认使用whisper
         engine = request.form.get('engine', 'whisper')
         
         # 语音识别处理
-        transcribed_text = transcribe_audio(audio_path, engine=engine)
-        
-        # 删除临时文件
-        if os.path.exists(audio_path):
-            os.remove(audio_path)
-        
-        # 使用现有的answer处理逻辑
-        session = interview_sessions[interview_id]
+        transcribed_text = _transcribe_upload(interview_id, question_id, audio_file, engine,
+                                              request.form.get('recordingId'))
         
         # 保存当前问题和回答
         current_question = session["conversation_history"][-1] if session["conversation_history"] else "请介绍一下你自己"
-        session["question_answers"].append({
-            "question_id": question_id,
-            "question": current_question,
-            "answer": transcribed_text
-        })
-        
-        # 构建prompt生成反馈和下一个问题（使用字符串连接避免格式说明符问题）
-        prompt = "你是一位" + session['style'] + "风格的面试官，正在为候选人进行面试。请基于以下信息：\n\n1. 简历内容：" + session['resume_content'] + "\n2. 对话历史：" + str(session['conversation_history']) + "\n3. 当前问题：" + current_question + "\n4. 候选人回答：" + transcribed_text + "\n\n请完成以下任务：\n\n1. 生成对当前回答的反馈，要求：\n   - 评价回答的质量、逻辑、深度\n   - 指出优点和不足\n   - 语言风格符合" + session['style'] + "\n\n2. 生成下一个面试问题，要求：\n   - 问题类型多样（简历深挖题、专业技能题、行为/情景题等）\n   - 与候选人的简历和对话历史相关\n   - 难度适中，符合面试流程\n\n输出格式要求：\n{\"feedback\": \"对当前回答的反馈\", \"nextQuestion\": {\"id\": 数字id, \"content\": \"下一个问题内容\", \"type\": \"问题类型\"}}\n\n只输出JSON格式，不要包含任何额外的文字或解释。"
+        index = _save_answer(session, question_id, current_question, transcribed_text)
         
         try:
-            response = client.chat.completions.create(
-                model="deepseek-chat",
-                messages=[
-                    {"role": "system", "content": "你是一位" + session['style'] + "风格的专业面试官"},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.7,
-                max_tokens=1024
-            )
-            
-            # 解析API返回结果
-            api_result = response.choices[0].message.content
-            
-            # 清理可能的额外内容，只保留JSON部分
-            start_idx = api_result.find('{')
-            end_idx = api_result.rfind('}') + 1
-            if not (start_idx == -1 or end_idx <= start_idx):
-                json_content = api_result[start_idx:end_idx]
-                result = json.loads(json_content)
-                result["nextQuestion"]["id"] = session["current_question_id"] + 1
-                result["transcribedText"] = transcribed_text
+            # 并发生成反馈和下一个问题
+            result = yield from _run_turn(session, index, current_question, transcribed_text, defer_feedback)
+            result["transcribedText"] = transcribed_text
             
             # 更新会话信息
-            session["current_question_id"] += 1
-            session["conversation_history"].append(result["nextQuestion"]["content"])
+            _advance_session(session, result)
             
             return jsonify(result), 200
             
         except Exception as e:
             print(f"生成反馈和下一个问题失败: {e}")
+            # 使用降级结果作为备选，保证面试可以继续
+            result = _fallback_turn_result(session, index)
+            result["transcribedText"] = transcribed_text
+            _advance_session(session, result)
             
             return jsonify(result), 200
             
+    except SessionNotFoundError:
+        # 这一轮进行中会话已结束或过期
+        return jsonify({"error": "面试会话不存在"}), 404
+    except Exception as e:
+        print(f"语音回答处理失败: {e}")
+        return jsonify({"error": "语音回答处理失败"}), 500
+
+@bp.route('/answer/stream', methods=['POST'])
+@auth_required
+def answer_stream():
+    """回答问题API（流式），以Server-Sent Events推送反馈和下一个问题"""
+    data = request.get_json()
+    interview_id = data.get('interviewId')
+    question_id = data.get('questionId')
+    answer = data.get('answer')
+    
+    # 打印请求参数
+    print(f"[API LOG] /api/mock-interview/answer/stream - Request received: interviewId={interview_id}, questionId={question_id}, answer={answer[:50]}...")
+    
+    # 检查会话是否存在
+    session = _load_session(interview_id)
+    if session is None:
+        return jsonify({"error": "面试会话不存在"}), 404
+    
+    # 保存当前问题和回答
+    current_question = session["conversation_history"][-1] if session["conversation_history"] else "请介绍一下你自己"
+    index = _save_answer(session, question_id, current_question, answer)
+    
+    return _event_stream_response(_stream_turn(session, index, current_question, answer))
+
+@bp.route('/voice-answer/stream', methods=['POST'])
+@auth_required
+def voice_answer_stream():
+    """语音回答API（流式），先推送识别文本，再推送反馈和下一个问题"""
+    try:
+        interview_id = request.form.get('interviewId')
+        question_id = request.form.get('questionId')
+        audio_file = request.files.get('audio')
+        
+        # 打印请求参数
+        print(f"[API LOG] /api/mock-interview/voice-answer/stream - Request received: interviewId={interview_id}, questionId={question_id}")
+        
+        # 检查会话是否存在
+        session = _load_session(interview_id)
+        if session is None:
+            return jsonify({"error": "面试会话不存在"}), 404
+        
+        # 获取语音识别引擎参数，默认使用whisper
+        engine = request.form.get('engine', 'whisper')
+        
+        # 语音识别处理
+        transcribed_text = _transcribe_upload(interview_id, question_id, audio_file, engine,
+                                              request.form.get('recordingId')) or ""
+        
+        # 保存当前问题和回答
+        current_question = session["conversation_history"][-1] if session["conversation_history"] else "请介绍一下你自己"
+        index = _save_answer(session, question_id, current_question, transcribed_text)
+        
+        def events():
+            yield _sse_event("transcript", {"transcribedText": transcribed_text})
+            yield from _stream_turn(session, index, current_question, transcribed_text,
+                                    extra={"transcribedText": transcribed_text})
+        
+        return _event_stream_response(events())
+        
     except Exception as e:
         print(f"语音回答处理失败: {e}")
         return jsonify({"error": "语音回答处理失败"}), 500
 
+@bp.route('/feedback', methods=['GET'])
+@auth_required
+def get_feedback():
+    """获取后台生成的回答反馈API（配合answer接口的deferFeedback参数使用）"""
+    interview_id = request.args.get('interviewId')
+    question_id = request.args.get('questionId')
+    
+    # 打印请求参数
+    print(f"[API LOG] /api/mock-interview/feedback - Request received: interviewId={interview_id}, questionId={question_id}")
+    
+    # 检查会话是否存在
+    session = _load_session(interview_id)
+    if session is None:
+        return jsonify({"error": "面试会话不存在"}), 404
+    
+    # 同一问题可能被重复回答，取最近一次的记录
+    for entry in reversed(session["question_answers"]):
+        if str(entry["question_id"]) == str(question_id):
+            return jsonify({
+                "questionId": entry["question_id"],
+                "status": entry["feedback_status"],
+                "feedback": entry["feedback"]
+            }), 200
+    
+    return jsonify({"error": "回答记录不存在"}), 404
+
+def _transcribe_upload(interview_id, question_id, audio_file, engine, recording_id=None):
+    """
+    识别上传的音频，直接读取上传文件的内存缓冲，不写入临时文件
+    
+    录音过程中已通过/realtime-voice分片识别时，直接使用识别会话的完整文本，不再重复识别整段录音；
+    只复用同一次录音的识别会话（recordingId一致，客户端未提供时按录音时长判断），否则识别上传的录音
+    """
+    # 先解码为16kHz单声道PCM WAV，用于判断是否为同一次录音，识别时不再重复解码
+    audio_data = audio_decoder.normalize(audio_file.stream.read())
+    transcript = asr_sessions.take_transcript(interview_id, question_id, lambda audio: transcribe_audio(audio, engine=engine),
+                                              recording_id=recording_id, audio=audio_data)
+    if transcript:
+        print(f"[API LOG] 复用实时识别文本: interviewId={interview_id}, questionId={question_id}")
+        return transcript
+    return transcribe_audio(audio_data, engine=engine)
+
+def _socket_session_key(question_id):
+    """WebSocket通道的识别会话使用独立的键，不与/realtime-voice的分片会话混用"""
+    return f"ws:{question_id}"
+
+def transcribe_pcm_chunk(interview_id, question_id, chunk_index, pcm, sample_rate, engine, final=False):
+    """
+    识别WebSocket通道上传的一段新的16位单声道PCM音频
+
+    音频封装为WAV后进入识别会话：只识别上次确认点之后的音频，录制时长增加时识别量不会随之成倍增长；
+    final为True时识别剩余音频，返回完整识别文本后丢弃会话。
+
+    Returns:
+        str: 录制中为当前识别文本（含未确认部分），final时为完整识别文本
+    """
+    import io
+    import wave
+    
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(pcm)
+    
+    session_key = _socket_session_key(question_id)
+    result = asr_sessions.feed(interview_id, session_key, chunk_index, buffer.getvalue(),
+                               lambda audio: transcribe_audio(audio, engine=engine), final=final)
+    if final:
+        asr_sessions.discard(interview_id, session_key)
+    if result is None:
+        return ""
+    return result["stableText"] if final else result["partialText"]
+
+def discard_pcm_transcript(interview_id, question_id):
+    """丢弃WebSocket通道上一次录制留下的识别会话"""
+    asr_sessions.discard(interview_id, _socket_session_key(question_id))
+
 @bp.route('/history', methods=['GET'])
 @auth_required
 def get_history():
@@ -480,39 +998,43 @@ def realtime_voice():
         if not interview_id or not audio_file:
             return jsonify({"error": "缺少必要参数"}), 400
         
-        # 保存音频文件到临时目录
-        import os
-        from datetime import datetime
-        import tempfile
-        
-        temp_dir = os.path.join(os.getcwd(), 'temp_audio')
-        if not os.path.exists(temp_dir):
-            os.makedirs(temp_dir)
-        
-        # 获取原始文件名和扩展名
+        # 直接读取上传文件的内存缓冲，不写入临时文件
+        audio_data = audio_file.stream.read()
         original_filename = audio_file.filename
-        file_extension = original_filename.split('.')[-1] if original_filename else 'webm'
-        
-        # 根据实际文件类型保存，不强制使用wav扩展名
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
-        audio_path = os.path.join(temp_dir, f'realtime_{interview_id}_{timestamp}_{chunk_index}.{file_extension}')
-        audio_file.save(audio_path)
         
-        # 打印保存路径和文件信息
-        print(f"[API LOG] /api/mock-interview/realtime-voice - Audio saved to {audio_path}")
-        print(f"[API LOG] /api/mock-interview/realtime-voice - File size: {os.path.getsize(audio_path)} bytes")
+        # 打印文件信息
+        print(f"[API LOG] /api/mock-interview/realtime-voice - File size: {len(audio_data)} bytes")
         print(f"[API LOG] /api/mock-interview/realtime-voice - Original filename: {original_filename}")
         
         # 获取语音识别引擎参数，默认使用whisper
         engine = request.form.get('engine', 'whisper')
-        transcribed_text = ""
+        # 最后一个分片：识别剩余音频并结束识别会话
+        final = request.form.get('final', 'false').lower() == 'true'
+        # 每次开始录音时客户端生成的ID，重新录制同一个问题时丢弃上一次录音的识别会话
+        recording_id = request.form.get('recordingId')
         
         try:
-
-            # 使用阿里云ASR
-            asr_service = get_aliyun_asr_service()
-            transcribed_text = asr_service.transcribe_audio(audio_path)
-            print(f"[API LOG] /api/mock-interview/realtime-voice - 阿里云ASR识别结果: {transcribed_text}")
+            # 按engine参数选择阿里云ASR、本地Faster Whisper或两者竞速
+            transcribe = _get_transcriber(engine)
+            
+            # 统一解码为16kHz单声道PCM WAV，webm等格式的分片也能进入识别会话
+            audio_data = audio_decoder.normalize(audio_data)
+            # WAV分片进入识别会话：按序拼接、合并为更大的窗口识别，返回新增的稳定文本
+            result = asr_sessions.feed(interview_id, question_id, int(chunk_index), audio_data,
+                                       transcribe, final=final, recording_id=recording_id)
+            if result is None:
+                # 其他格式逐片识别，静音分片直接返回空文本，不调用识别引擎
+                audio_data, vad = voice_activity_filter.process(audio_data)
+                if vad is not None and not vad.has_speech:
+                    print(f"[API LOG] /api/mock-interview/realtime-voice - Chunk {chunk_index} is silent, skipped ASR")
+                    return jsonify({
+                        'chunkIndex': chunk_index,
+                        'transcribedText': '',
+                        'silent': True,
+                        'status': 'success'
+                    }), 200
+                result = {'transcribedText': transcribe(audio_data)}
+            print(f"[API LOG] /api/mock-interview/realtime-voice - {engine}识别结果: {result['transcribedText']}")
                 
         except Exception as transcribe_error:
             print(f"[ERROR] 音频转录失败: {transcribe_error}")
@@ -523,13 +1045,9 @@ def realtime_voice():
                 'status': 'error'
             }), 500
         
-        # 删除临时文件
-        if os.path.exists(audio_path):
-            os.remove(audio_path)
-        
         return jsonify({
             'chunkIndex': chunk_index,
-            'transcribedText': transcribed_text,
+            **result,
             'status': 'success'
         }), 200
         
@@ -541,41 +1059,106 @@ def realtime_voice():
             'status': 'error'
         }), 500
 
-# 导入阿里云ASR服务
+# 导入阿里云ASR服务和本地Faster Whisper服务
+import threading
 from ..services.aliyun_asr_service import AliyunASRService
+from ..services.whisper_asr_service import whisper_asr_service
+from ..utils.audio_vad import voice_activity_filter
+from ..utils.audio_decode import audio_decoder
+from ..services.asr_session import asr_sessions
+from ..services.asr_race import asr_racer
+from config import ASR_ENGINE, ASR_RACE_CONFIG
 
 # 初始化阿里云ASR服务实例
 # 注意：这里使用了懒加载模式，只有在需要时才初始化，避免配置缺失时影响其他功能
+# 所有请求线程共享同一个实例（及其Token缓存），加锁避免并发请求各自创建实例
 _aliyun_asr_service = None
+_aliyun_asr_lock = threading.Lock()
 
 def get_aliyun_asr_service():
     """获取阿里云ASR服务实例（单例模式）"""
     global _aliyun_asr_service
     if _aliyun_asr_service is None:
-        try:
-            _aliyun_asr_service = AliyunASRService()
-        except Exception as e:
-            print(f"初始化阿里云ASR服务失败: {e}")
-            _aliyun_asr_service = None
+        with _aliyun_asr_lock:
+            if _aliyun_asr_service is None:
+                try:
+                    _aliyun_asr_service = AliyunASRService()
+                except Exception as e:
+                    print(f"初始化阿里云ASR服务失败: {e}")
+                    _aliyun_asr_service = None
     return _aliyun_asr_service
 
+def get_asr_stats():
+    """阿里云ASR服务的运行时统计，服务尚未初始化时返回None"""
+    return _aliyun_asr_service.get_stats() if _aliyun_asr_service is not None else None
+
+def _race_engines():
+    """参与竞速的识别引擎，阿里云ASR未配置时只使用本地Faster Whisper"""
+    engines = {}
+    for name in ASR_RACE_CONFIG["engines"]:
+        if name == "aliyun":
+            asr_service = get_aliyun_asr_service()
+            if asr_service is not None:
+                engines["aliyun"] = asr_service.transcribe_audio_bytes
+        elif name == "whisper":
+            engines["whisper"] = whisper_asr_service.transcribe_audio_bytes
+    return engines
+
+def _get_transcriber(engine):
+    """按引擎获取识别函数（接收WAV字节数据，返回识别文本），服务端配置了ASR_ENGINE时以其为准"""
+    engine = ASR_ENGINE or engine
+    if engine == "race":
+        return lambda audio_data: asr_racer.race(audio_data, _race_engines())
+    if engine == "aliyun":
+        asr_service = get_aliyun_asr_service()
+        if asr_service is not None:
+            def transcribe(audio_data):
+                try:
+                    return asr_service.transcribe_audio_bytes(audio_data)
+                except Exception as aliyun_error:
+                    print(f"阿里云ASR语音识别失败: {aliyun_error}")
+                    print("降级使用Faster Whisper")
+                    return whisper_asr_service.transcribe_audio_bytes(audio_data)
+            return transcribe
+        # 未配置阿里云ASR时与transcribe_audio一样降级使用Faster Whisper
+        print("阿里云ASR不可用，降级使用Faster Whisper")
+    return whisper_asr_service.transcribe_audio_bytes
+
 # 语音识别函数
-def transcribe_audio(audio_path, engine="whisper"):
+def transcribe_audio(audio, engine="whisper"):
     """语音识别函数，支持多种引擎
     
     Args:
-        audio_path: 音频文件路径
-        engine: 识别引擎，可选值: whisper, aliyun
+        audio: 音频字节数据，或可读取的文件对象（如上传文件的内存缓冲）
+        engine: 识别引擎，可选值: whisper, aliyun, race（同时调用两个引擎，采用最先返回的非空结果）；
+                服务端配置了ASR_ENGINE时以其为准
         
     Returns:
         str: 转录后的文本
     """
+    engine = ASR_ENGINE or engine
+    # 只读取一次，降级到其他引擎时复用同一份数据
+    audio_data = audio.read() if hasattr(audio, "read") else audio
+    # webm、mp3等格式在内存中解码为16kHz单声道PCM WAV，与识别引擎配置的格式一致
+    audio_data = audio_decoder.normalize(audio_data)
+    
+    # 静音直接返回空文本，不调用识别引擎；有人声时裁掉首尾静音
+    audio_data, vad = voice_activity_filter.process(audio_data)
+    if vad is not None and not vad.has_speech:
+        return ""
+    
     try:
+        if engine == "race":
+            # 同时调用阿里云ASR和本地Faster Whisper，采用最先返回的非空结果
+            result = asr_racer.race(audio_data, _race_engines())
+            print(f"语音识别引擎竞速结果: {result}")
+            return result
+        
         if engine == "aliyun":
             # 使用阿里云ASR
             asr_service = get_aliyun_asr_service()
             try:
-                result = asr_service.transcribe_audio(audio_path)
+                result = asr_service.transcribe_audio_bytes(audio_data)
                 print(f"阿里云ASR语音识别结果: {result}")
                 return result
             except Exception as aliyun_error:
@@ -583,5 +1166,13 @@ def transcribe_audio(audio_path, engine="whisper"):
                 print("降级使用Faster Whisper")
                 # 降级使用Faster Whisper
                 engine = "whisper"       
+        
+        if engine == "whisper":
+            # 使用本地Faster Whisper
+            result = whisper_asr_service.transcribe_audio_bytes(audio_data)
+            print(f"Faster Whisper语音识别结果: {result}")
+            return result
+        
+        print(f"不支持的语音识别引擎: {engine}")
     except Exception as e:
         print(f"语音识别失败: {e}")
\ No newline at end of file
@@ -1,21 +1,24 @@
 from flask import Blueprint, request, jsonify
 import os
-from ..services.deepseek_service import client
+from ..services.llm_gateway import LLMCall
 from ..services.file_service import get_resume_content
 from ..models import db, User, QuestionBank
 from ..utils.jwt_utils import auth_required
+from ..utils.llm_view import llm_view
 import uuid
 
 # 创建蓝图
 bp = Blueprint('question_bank', __name__, url_prefix='/api/question-bank')
 
 @bp.route('/generate', methods=['POST'])
+@llm_view
 @auth_required
 def generate():
     """"基于简历内容生成智能题库API"""""
     data = request.get_json()
     count = data.get('count', 10)  # 默认生成10个问题
     topic = data.get('topic', '')
+    refresh = data.get('refresh', False)  # 为True时跳过缓存重新生成
     user_id = data.get('userId') or str(uuid.uuid4())
     
     # 根据userId获取最新的resumeId
@@ -104,19 +107,18 @@ def generate():
         """
     
     try:
-        response = client.chat.completions.create(
-            model="deepseek-chat",
+        api_result = yield LLMCall(
             messages=[
                 {"role": "system", "content": "你是一位专业的面试问题生成专家，擅长根据候选人的简历内容生成相关的面试问题"},
                 {"role": "user", "content": prompt}
             ],
+            route="question_bank.generate",
+            bypass_cache=refresh,
             temperature=0.7,
-            max_tokens=8192
+            max_tokens=8192,
+            timeout=180
         )
         
-        # 解析API返回结果
-        api_result = response.choices[0].message.content
-        
         # 保存原始响应到文件，便于调试
         with open('question_bank_response.txt', 'w', encoding='utf-8') as f:
             f.write(api_result)
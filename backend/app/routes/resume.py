@@ -1,16 +1,18 @@
 from flask import Blueprint, request, jsonify
 import os
 from ..services.file_service import read_file_content, save_resume
-from ..services.deepseek_service import analyze_resume
+from ..services.deepseek_service import build_resume_analysis_call
 from ..utils.json_parser import parse_resume_result
 from ..models import db, User, Resume
 from ..utils.jwt_utils import auth_required
+from ..utils.llm_view import llm_view
 import uuid
 
 # 创建蓝图
 bp = Blueprint('resume', __name__, url_prefix='/api/resume')
 
 @bp.route('/analyze', methods=['POST'])
+@llm_view
 @auth_required
 def analyze():
     """简历分析API"""
@@ -56,7 +58,7 @@ def analyze():
     #     return jsonify({"error": "无法读取文件内容"}), 400
     
     # 调用DeepSeek API进行简历分析
-    api_result = analyze_resume(file_content)
+    api_result = yield build_resume_analysis_call(file_content)
     
     # 解析API返回结果
     parsed_result = parse_resume_result(api_result)
@@ -1,13 +1,15 @@
 from flask import Blueprint, request, jsonify
-from ..services.deepseek_service import generate_self_intro
+from ..services.deepseek_service import build_self_intro_call
 from ..services.file_service import get_resume_content
 from ..models import db, User, SelfIntro
 from ..utils.jwt_utils import auth_required
+from ..utils.llm_view import llm_view
 
 # 创建蓝图
 bp = Blueprint('self_intro', __name__, url_prefix='/api/self-intro')
 
 @bp.route('/generate', methods=['POST'])
+@llm_view
 @auth_required
 def generate():
     """根据优化后的简历生成自我介绍API"""
@@ -15,6 +17,7 @@ def generate():
     version = data.get('version', '30秒电梯演讲版')
     style = data.get('style', '正式')
     user_info = data.get('userInfo', '')
+    refresh = data.get('refresh', False)  # 为True时跳过缓存重新生成
     # 从request对象中获取用户ID，这是auth_required装饰器设置的
     user_id = request.user_id
     
@@ -52,7 +55,7 @@ def generate():
     
     # 调用DeepSeek API生成自我介绍
     try:
-        intro = generate_self_intro(resume_content, version, style)
+        intro = (yield build_self_intro_call(resume_content, version, style, bypass_cache=refresh)).strip()
         
         # 保存到数据库
         try:
@@ -1,20 +1,31 @@
 from flask import Blueprint, request, jsonify
 import json
-from ..services.deepseek_service import client
+from ..services.llm_gateway import LLMCall
 from ..services.file_service import get_resume_content
 from ..models import db, User, InterviewStrategy
 from ..utils.jwt_utils import auth_required
+from ..utils.llm_view import llm_view
 
 # 创建蓝图
 bp = Blueprint('strategy', __name__, url_prefix='/api/strategy')
 
+def _strategy_system_message(resume_content):
+    """
+    策略顾问人设和简历组成的系统消息
+
+    画像分析和反问问题两个接口使用逐字相同的系统消息，同一份简历的后续调用可以命中上游前缀缓存
+    """
+    return {"role": "system", "content": "你是一位专业的面试策略顾问，擅长为候选人提供个性化的面试策略建议和高质量的反问问题。\n\n候选人简历：\n" + resume_content}
+
 @bp.route('/analysis', methods=['POST'])
+@llm_view
 @auth_required
 def analysis():
     """生成画像分析API"""
     data = request.get_json()
     background_info = data.get('backgroundInfo', '')
     directions = data.get('directions', [])
+    refresh = data.get('refresh', False)  # 为True时跳过缓存重新生成
     user_id = request.user_id
     
     # 根据userId获取最新的resumeId
@@ -37,23 +48,22 @@ def analysis():
     # 获取简历内容
     resume_content = get_resume_content(resume_id, 'optimized')
     
-    # 构建prompt生成画像分析（使用字符串连接避免格式说明符问题）
-    prompt = "你是一位专业的面试策略分析师，正在为候选人生成面试策略。请基于以下信息：\n\n1. 简历内容：" + resume_content + "\n2. 用户背景信息：" + background_info + "\n3. 优化方向：" + str(directions) + "\n\n请生成一份详细的画像分析报告，要求：\n\n1. 报告结构清晰，包含多个章节\n2. 每个章节包含：标题、内容描述和实用建议\n3. 针对用户的优化方向提供具体的策略建议\n4. 语言通俗易懂，具有可操作性\n\n输出格式要求：\n{\"sections\": [{\"title\": \"章节标题\", \"content\": \"章节内容\", \"tips\": [\"建议1\", \"建议2\"]}]}\n\n只输出JSON格式，不要包含任何额外的文字或解释。"
+    # 构建prompt生成画像分析（使用字符串连接避免格式说明符问题），简历在系统消息中
+    prompt = "请基于候选人的简历和以下信息生成面试策略：\n\n1. 用户背景信息：" + background_info + "\n2. 优化方向：" + ("、".join(str(direction) for direction in directions) or "无") + "\n\n请生成一份详细的画像分析报告，要求：\n\n1. 报告结构清晰，包含多个章节\n2. 每个章节包含：标题、内容描述和实用建议\n3. 针对用户的优化方向提供具体的策略建议\n4. 语言通俗易懂，具有可操作性\n\n输出格式要求：\n{\"sections\": [{\"title\": \"章节标题\", \"content\": \"章节内容\", \"tips\": [\"建议1\", \"建议2\"]}]}\n\n只输出JSON格式，不要包含任何额外的文字或解释。"
     
     try:
-        response = client.chat.completions.create(
-            model="deepseek-chat",
+        api_result = yield LLMCall(
             messages=[
-                {"role": "system", "content": "你是一位专业的面试策略分析师，擅长为候选人提供个性化的面试策略建议"},
+                _strategy_system_message(resume_content),
                 {"role": "user", "content": prompt}
             ],
+            route="strategy.analysis",
+            bypass_cache=refresh,
             temperature=0.7,
-            max_tokens=8124
+            max_tokens=8124,
+            timeout=180
         )
         
-        # 解析API返回结果
-        api_result = response.choices[0].message.content
-        
         try:
             # 清理可能的额外内容，只保留JSON部分
             start_idx = api_result.find('{')
@@ -177,6 +187,8 @@ def analysis():
                 }
             ]
         }
+        # 标记为降级结果，便于前端提示用户稍后重试
+        result["degraded"] = True
         
         return jsonify(result), 200
 
@@ -219,6 +231,7 @@ def get_analysis_history():
         return jsonify({"error": "Failed to get analysis history"}), 500
 
 @bp.route('/questions', methods=['POST'])
+@llm_view
 @auth_required
 def questions():
     """生成反问环节问题API"""
@@ -226,6 +239,7 @@ def questions():
     company_name = data.get('companyName', '')
     position = data.get('position', '')
     question_types = data.get('questionTypes', [])
+    refresh = data.get('refresh', False)  # 为True时跳过缓存重新生成
     # 从request对象中获取用户ID，这是auth_required装饰器设置的
     user_id = request.user_id
     
@@ -249,23 +263,22 @@ def questions():
     # 获取简历内容
     resume_content = get_resume_content(resume_id, 'optimized')
     
-    # 构建prompt生成反问问题（使用字符串连接避免格式说明符问题）
-    prompt = "你是一位专业的面试策略顾问，正在为候选人生成高质量的反问问题。请基于以下信息：\n\n1. 简历内容：" + resume_content + "\n2. 目标公司：" + company_name + "\n3. 目标岗位：" + position + "\n4. 问题类型：" + str(question_types) + "\n\n请生成5-8个高质量的反问问题，要求：\n\n1. 问题要有深度，能体现候选人对公司和岗位的了解\n2. 问题类型多样，涵盖公司发展、团队文化、岗位发展、工作内容等\n3. 每个问题要包含提问意图，说明为什么要问这个问题\n4. 问题要适合在面试的反问环节提出\n\n输出格式要求：\n{\"questions\": [{\"content\": \"问题内容\", \"type\": \"问题类型\", \"explanation\": \"提问意图\"}]}\n\n只输出JSON格式，不要包含任何额外的文字或解释。"
+    # 构建prompt生成反问问题（使用字符串连接避免格式说明符问题），简历在系统消息中
+    prompt = "请基于候选人的简历和以下信息生成高质量的反问问题：\n\n1. 目标公司：" + company_name + "\n2. 目标岗位：" + position + "\n3. 问题类型：" + ("、".join(str(question_type) for question_type in question_types) or "不限") + "\n\n请生成5-8个高质量的反问问题，要求：\n\n1. 问题要有深度，能体现候选人对公司和岗位的了解\n2. 问题类型多样，涵盖公司发展、团队文化、岗位发展、工作内容等\n3. 每个问题要包含提问意图，说明为什么要问这个问题\n4. 问题要适合在面试的反问环节提出\n\n输出格式要求：\n{\"questions\": [{\"content\": \"问题内容\", \"type\": \"问题类型\", \"explanation\": \"提问意图\"}]}\n\n只输出JSON格式，不要包含任何额外的文字或解释。"
     
     try:
-        response = client.chat.completions.create(
-            model="deepseek-chat",
+        api_result = yield LLMCall(
             messages=[
-                {"role": "system", "content": "你是一位专业的面试策略顾问，擅长为候选人生成高质量的反问问题"},
+                _strategy_system_message(resume_content),
                 {"role": "user", "content": prompt}
             ],
+            route="strategy.questions",
+            bypass_cache=refresh,
             temperature=0.7,
-            max_tokens=8124
+            max_tokens=8124,
+            timeout=180
         )
         
-        # 解析API返回结果
-        api_result = response.choices[0].message.content
-        
         try:
             # 清理可能的额外内容，只保留JSON部分
             start_idx = api_result.find('{')
@@ -411,6 +424,8 @@ def questions():
                 }
             ]
         }
+        # 标记为降级结果，便于前端提示用户稍后重试
+        result["degraded"] = True
         
         return jsonify(result), 200
 
@@ -0,0 +1,92 @@
+from flask import Blueprint, request, jsonify
+import datetime
+from sqlalchemy import func, case
+from ..models import db, LLMUsage
+from ..utils.jwt_utils import auth_required
+from config import ADMIN_CONFIG
+
+# 创建蓝图
+bp = Blueprint('usage', __name__, url_prefix='/api/usage')
+
+@bp.route('/daily', methods=['GET'])
+@auth_required
+def daily():
+    """
+    按天汇总大模型用量API
+
+    查询参数：
+    - days: 统计最近多少天（含今天），默认7
+    - groupBy: route（按路由，默认）或user（按用户，仅管理员）
+    - route: 只统计指定路由
+    - userId: 只统计指定用户（仅管理员，普通用户只能查询自己的用量）
+    """
+    # 从request对象中获取用户ID，这是auth_required装饰器设置的
+    user_id = request.user_id
+    days = request.args.get('days', 7, type=int)
+    group_by = request.args.get('groupBy', 'route')
+    route = request.args.get('route')
+    target_user_id = request.args.get('userId')
+
+    # 打印请求参数
+    print(f"[API LOG] /api/usage/daily - Request received: days={days}, groupBy={group_by}, route={route}, targetUserId={target_user_id}, userId={user_id}")
+
+    if group_by not in ('route', 'user') or not days or days < 1:
+        return jsonify({"error": "Invalid parameters"}), 400
+
+    # 非管理员只能按路由查询自己的用量
+    if user_id not in ADMIN_CONFIG['user_ids']:
+        if group_by == 'user' or (target_user_id and target_user_id != user_id):
+            return jsonify({"error": "Permission denied"}), 403
+        target_user_id = user_id
+
+    try:
+        since = datetime.datetime.combine(datetime.date.today() - datetime.timedelta(days=days - 1), datetime.time.min)
+        day = func.date(LLMUsage.created_at)
+        group_key = LLMUsage.route if group_by == 'route' else LLMUsage.user_id
+        total_tokens = func.sum(LLMUsage.prompt_tokens + LLMUsage.completion_tokens)
+
+        query = db.session.query(
+            day.label('day'),
+            group_key.label('key'),
+            func.count(LLMUsage.id).label('calls'),
+            func.sum(case((LLMUsage.success.is_(False), 1), else_=0)).label('errors'),
+            func.sum(LLMUsage.prompt_tokens).label('prompt_tokens'),
+            func.sum(LLMUsage.completion_tokens).label('completion_tokens'),
+            func.sum(LLMUsage.cached_tokens).label('cached_tokens'),
+            func.avg(LLMUsage.latency_ms).label('avg_latency_ms'),
+            func.max(LLMUsage.latency_ms).label('max_latency_ms')
+        ).filter(LLMUsage.created_at >= since)
+
+        # 添加条件过滤
+        if route:
+            query = query.filter(LLMUsage.route == route)
+        if target_user_id:
+            query = query.filter(LLMUsage.user_id == target_user_id)
+
+        rows = query.group_by(day, group_key).order_by(day.desc(), total_tokens.desc()).all()
+
+        items = []
+        for row in rows:
+            prompt_tokens = int(row.prompt_tokens or 0)
+            items.append({
+                "day": str(row.day),
+                group_by: row.key,
+                "calls": row.calls,
+                "errors": int(row.errors or 0),
+                "promptTokens": prompt_tokens,
+                "completionTokens": int(row.completion_tokens or 0),
+                "cachedTokens": int(row.cached_tokens or 0),
+                "cacheHitRate": int(row.cached_tokens or 0) / prompt_tokens if prompt_tokens else 0.0,
+                "avgLatencyMs": round(float(row.avg_latency_ms or 0)),
+                "maxLatencyMs": row.max_latency_ms
+            })
+
+        return jsonify({
+            "days": days,
+            "groupBy": group_by,
+            "items": items
+        }), 200
+
+    except Exception as e:
+        print(f"查询大模型用量失败: {e}")
+        return jsonify({"error": "Failed to get usage"}), 500
@@ -4,15 +4,136 @@
 该模块封装了阿里云智能语音识别（ASR）API的调用，提供语音转文字功能。
 支持短语音识别，适用于模拟面试系统的语音输入场景。
 """
-import os
 import json
 import time
 import uuid
 import hmac
 import hashlib
 import base64
+import threading
 import requests
+from requests.adapters import HTTPAdapter
 from config import ALIYUN_ASR_CONFIG, ALIYUN_ASR_URL
+from .llm_resilience import LatencyTracker
+
+# Token无效或已过期时网关返回的状态码
+TOKEN_INVALID_STATUS = 40000001
+
+
+class AliyunTokenError(Exception):
+    """获取阿里云ASR认证Token失败"""
+
+
+class AliyunASRError(Exception):
+    """阿里云ASR识别失败（网关返回错误或响应无法解析）"""
+
+
+class AliyunTokenCache:
+    """
+    阿里云ASR认证Token缓存（线程安全，由所有请求线程共享）
+
+    Token在ExpireTime之前一直复用；进入提前刷新窗口（refresh_ahead秒）后，
+    第一个请求在后台线程中获取新Token，其余请求继续使用当前Token，不阻塞识别。
+    Token已过期或尚未获取时同步获取，同一时间只有一个线程调用CreateToken，其余线程等待结果。
+    获取失败时抛出AliyunTokenError，retry_interval秒内不再重复请求。
+
+    示例用法：
+    >>> cache = AliyunTokenCache(fetch_token)  # fetch_token返回(token, expire_time)
+    >>> token = cache.get()
+    """
+
+    def __init__(self, fetch, refresh_ahead=300, retry_interval=5):
+        self.fetch = fetch
+        self.refresh_ahead = refresh_ahead
+        self.retry_interval = retry_interval
+        self._lock = threading.Lock()
+        self._fetch_lock = threading.Lock()
+        self._token = None
+        self._expire_time = 0
+        self._refreshing = False
+        self._last_error = None
+        self._last_error_at = 0
+        self._stats = {"hits": 0, "fetches": 0, "background_refreshes": 0, "failures": 0, "invalidations": 0}
+
+    def _valid(self, now):
+        return self._token is not None and now < self._expire_time
+
+    def get(self):
+        """
+        获取有效的Token
+
+        Raises:
+            AliyunTokenError: 没有有效Token且获取失败
+        """
+        now = time.time()
+        with self._lock:
+            if self._valid(now):
+                self._stats["hits"] += 1
+                if now >= self._expire_time - self.refresh_ahead and not self._refreshing:
+                    self._refreshing = True
+                    threading.Thread(target=self._refresh_in_background, name="aliyun-token-refresh", daemon=True).start()
+                return self._token
+
+        # 同步获取：持有_fetch_lock的线程负责请求，其余线程等待后直接使用其结果
+        with self._fetch_lock:
+            now = time.time()
+            with self._lock:
+                if self._valid(now):
+                    self._stats["hits"] += 1
+                    return self._token
+                if self._last_error is not None and now - self._last_error_at < self.retry_interval:
+                    raise AliyunTokenError(f"获取阿里云ASR Token失败: {self._last_error}")
+            return self._fetch()
+
+    def _fetch(self):
+        """调用CreateToken并更新缓存，调用方需持有_fetch_lock"""
+        try:
+            token, expire_time = self.fetch()
+        except Exception as e:
+            with self._lock:
+                self._stats["failures"] += 1
+                self._last_error = e
+                self._last_error_at = time.time()
+            raise AliyunTokenError(f"获取阿里云ASR Token失败: {e}") from e
+        with self._lock:
+            self._token = token
+            self._expire_time = expire_time
+            self._last_error = None
+            self._stats["fetches"] += 1
+        print(f"[API LOG] 阿里云ASR Token已更新，{int(expire_time - time.time())}秒后过期")
+        return token
+
+    def _refresh_in_background(self):
+        """后台提前刷新，失败时保留当前Token直到过期"""
+        try:
+            with self._fetch_lock:
+                with self._lock:
+                    if self._token is not None and time.time() < self._expire_time - self.refresh_ahead:
+                        return  # 其他线程已经刷新
+                self._fetch()
+            with self._lock:
+                self._stats["background_refreshes"] += 1
+        except AliyunTokenError as e:
+            print(f"后台刷新阿里云ASR Token失败: {e}")
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def invalidate(self, token):
+        """网关报告Token无效时丢弃该Token（已被其他线程替换时忽略）"""
+        with self._lock:
+            if self._token == token:
+                self._token = None
+                self._expire_time = 0
+                self._stats["invalidations"] += 1
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["expires_in"] = max(0, int(self._expire_time - time.time())) if self._token else None
+            stats["last_error"] = str(self._last_error) if self._last_error else None
+        return stats
+
 
 class AliyunASRService:
     """
@@ -39,6 +160,25 @@ class AliyunASRService:
         
         # 检查配置完整性
         self._check_config()
+        
+        # 认证Token缓存，所有请求线程共享
+        self.token_cache = AliyunTokenCache(
+            self._generate_token,
+            refresh_ahead=self.config["token_refresh_ahead"],
+            retry_interval=self.config["token_retry_interval"]
+        )
+        
+        # 到识别网关的keep-alive连接池：所有线程共享同一个HTTPAdapter（urllib3连接池线程安全），
+        # Session本身不保证线程安全，每个线程各用一个挂载该适配器的Session
+        self._adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=self.config["pool_maxsize"],
+            pool_block=self.config["pool_block"]
+        )
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self._stats = {"requests": 0, "errors": 0, "total_latency": 0.0, "max_latency": 0.0}
+        self._latency = LatencyTracker(size=512)
     
     def _check_config(self):
         """
@@ -55,52 +195,109 @@ class AliyunASRService:
     
     def _generate_token(self):
         """
-        生成阿里云ASR认证Token
+        调用CreateToken生成阿里云ASR认证Token
         
         Returns:
             str: 生成的Token
-            int: Token过期时间（秒）
+            int: Token过期时间（Unix时间戳，秒）
+        
+        Raises:
+            AliyunTokenError: SDK未安装或接口返回错误
         """
         try:
-            # 尝试使用阿里云官方SDK生成Token
+            # 使用阿里云官方SDK生成Token
             from aliyunsdkcore.client import AcsClient
             from aliyunsdknls_cloud_meta.request.v20180518.CreateTokenRequest import CreateTokenRequest
-            
-            # 初始化AcsClient
-            client = AcsClient(
-                self.access_key_id,
-                self.access_key_secret,
-                self.region_id
-            )
-            
-            request = CreateTokenRequest()
-            request.set_accept_format('json')
-            # 为请求显式设置端点，解决端点解析错误
-            request.set_endpoint(f"nls-meta.{self.region_id}.aliyuncs.com")
-            
-            # 发送请求
-            response = client.do_action_with_exception(request)
-            
-            # 解析响应
-            result = json.loads(response.decode('utf-8'))
-            
-            # 根据实际响应格式判断，阿里云ASR API返回的是Token字段和ErrMsg字段
-            if "Token" in result and result.get("ErrMsg") == "":
-                return result["Token"]["Id"], result["Token"]["ExpireTime"]
-            else:
-                error_msg = result.get("ErrMsg", result.get("Message", "生成Token失败"))
-                print(f"阿里云ASR SDK返回错误: {error_msg}")
-                # SDK调用失败，返回模拟Token
-                return "mock_token_for_testing", int(time.time() + 3600)
-                
-        except Exception as e:
-            print(f"阿里云ASR SDK调用失败，返回模拟Token: {e}")
-            # 任何异常情况下都返回模拟Token，确保服务正常运行
-            return "mock_token_for_testing", int(time.time() + 3600)
+        except ImportError as e:
+            raise AliyunTokenError(f"未安装阿里云SDK: {e}") from e
+        
+        # 初始化AcsClient
+        client = AcsClient(
+            self.access_key_id,
+            self.access_key_secret,
+            self.region_id
+        )
+        
+        request = CreateTokenRequest()
+        request.set_accept_format('json')
+        # 为请求显式设置端点，解决端点解析错误
+        request.set_endpoint(f"nls-meta.{self.region_id}.aliyuncs.com")
+        
+        # 发送请求
+        response = client.do_action_with_exception(request)
+        
+        # 解析响应
+        result = json.loads(response.decode('utf-8'))
+        
+        # 根据实际响应格式判断，阿里云ASR API返回的是Token字段和ErrMsg字段
+        if "Token" in result and result.get("ErrMsg") == "":
+            return result["Token"]["Id"], int(result["Token"]["ExpireTime"])
+        
+        error_msg = result.get("ErrMsg", result.get("Message", "生成Token失败"))
+        print(f"阿里云ASR SDK返回错误: {error_msg}")
+        raise AliyunTokenError(error_msg)
+    
+    def _session(self):
+        """当前线程的Session（挂载共享的连接池）"""
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.mount("https://", self._adapter)
+            session.mount("http://", self._adapter)
+            self._local.session = session
+        return session
+    
+    def _post(self, url, headers, data):
+        """通过连接池发送识别请求并记录耗时"""
+        start_time = time.time()
+        try:
+            response = self._session().post(url, headers=headers, data=data, timeout=self.config["request_timeout"])
+        except Exception:
+            with self._stats_lock:
+                self._stats["requests"] += 1
+                self._stats["errors"] += 1
+            raise
+        latency = time.time() - start_time
+        with self._stats_lock:
+            self._stats["requests"] += 1
+            self._stats["total_latency"] += latency
+            self._stats["max_latency"] = max(self._stats["max_latency"], latency)
+        self._latency.add("asr", latency)
+        return response
+    
+    def _pool_stats(self):
+        """汇总连接池新建连接数和经过连接池的请求数，计算连接复用率"""
+        pools = self._adapter.poolmanager.pools
+        connections = requests_made = 0
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is not None:
+                connections += pool.num_connections
+                requests_made += pool.num_requests
+        return {
+            "pool_maxsize": self.config["pool_maxsize"],
+            "connections_created": connections,
+            "reuse_rate": 1 - connections / requests_made if requests_made else 0.0
+        }
+    
+    def get_stats(self):
+        """
+        运行时统计
+        
+        Returns:
+            dict: Token缓存、连接池（新建连接数、连接复用率）以及识别请求的次数、错误数和耗时（秒）
+        """
+        with self._stats_lock:
+            stats = dict(self._stats)
+        succeeded = stats["requests"] - stats["errors"]
+        stats["avg_latency"] = stats.pop("total_latency") / succeeded if succeeded else 0.0
+        stats["p50_latency"] = self._latency.percentile("asr", 0.5, 1)
+        stats["p95_latency"] = self._latency.percentile("asr", 0.95, 1)
+        return {"token": self.token_cache.get_stats(), "pool": self._pool_stats(), "requests": stats}
     
     def transcribe_audio(self, audio_path):
         """
-        语音转文字核心方法
+        识别音频文件
         
         Args:
             audio_path: 音频文件路径
@@ -112,11 +309,34 @@ class AliyunASRService:
             # 读取音频文件
             with open(audio_path, 'rb') as f:
                 audio_data = f.read()
+        except FileNotFoundError:
+            print(f"音频文件不存在: {audio_path}")
+            raise
+        return self.transcribe_audio_bytes(audio_data)
+    
+    def transcribe_audio_bytes(self, audio, audio_format=None):
+        """
+        语音转文字核心方法，直接处理内存中的音频数据，不经过磁盘
+        
+        Args:
+            audio: 音频字节数据，或可读取的文件对象（如上传文件的内存缓冲）
+            audio_format: 音频格式，默认使用配置中的格式
+            
+        Returns:
+            str: 转录后的文本
+            
+        Raises:
+            AliyunTokenError: 获取认证Token失败
+            AliyunASRError: 识别失败，调用方据此降级到其他引擎
+            requests.exceptions.RequestException: 请求超时或连接失败
+        """
+        try:
+            audio_data = audio.read() if hasattr(audio, "read") else bytes(audio)
             
             # 构建请求参数
             params = {
                 "appkey": self.app_key,
-                "format": self.config["format"],
+                "format": audio_format or self.config["format"],
                 "sample_rate": self.config["sample_rate"],
                 "enable_punctuation_prediction": str(self.config["enable_punctuation_prediction"]).lower(),
                 "enable_inverse_text_normalization": str(self.config["enable_inverse_text_normalization"]).lower()
@@ -125,22 +345,25 @@ class AliyunASRService:
             # 构建请求URL
             url = f"{self.service_url}/stream/v1/asr?{requests.compat.urlencode(params)}"
             
-            # 获取Token
-            token, expire_time = self._generate_token()
-            
-            # 构建请求头
-            headers = {
-                "Content-Type": "application/octet-stream",
-                "X-NLS-Token": token,
-                "Authorization": f"Bearer {token}",
-                "X-NLS-AppKey": self.app_key
-            }
-            
-            # 发送请求
-            response = requests.post(url, headers=headers, data=audio_data, timeout=30)
-            
-            # 解析响应
-            result = response.json()
+            # 发送请求，Token被网关判定无效时丢弃缓存并重试一次
+            for attempt in range(2):
+                token = self.token_cache.get()
+                
+                # 构建请求头
+                headers = {
+                    "Content-Type": "application/octet-stream",
+                    "X-NLS-Token": token,
+                    "Authorization": f"Bearer {token}",
+                    "X-NLS-AppKey": self.app_key
+                }
+                
+                response = self._post(url, headers, audio_data)
+                
+                # 解析响应
+                result = response.json()
+                if result.get("status") != TOKEN_INVALID_STATUS:
+                    break
+                self.token_cache.invalidate(token)
             
             # 处理响应结果
             if result.get("status") == 20000000:
@@ -151,10 +374,10 @@ class AliyunASRService:
                 error_code = result.get("status", 0)
                 error_msg = result.get("message", "语音识别失败")
                 print(f"阿里云ASR识别失败，错误码: {error_code}, 错误信息: {error_msg}")
-                raise Exception(f"阿里云ASR识别失败: {error_msg}")
+                raise AliyunASRError(f"阿里云ASR识别失败: {error_msg}")
                 
-        except FileNotFoundError:
-            print(f"音频文件不存在: {audio_path}")
+        except AliyunTokenError as e:
+            print(f"阿里云ASR认证失败: {e}")
             raise
         except requests.exceptions.Timeout:
             print("阿里云ASR请求超时")
@@ -162,38 +385,8 @@ class AliyunASRService:
         except requests.exceptions.ConnectionError:
             print("阿里云ASR连接失败")
             raise
+        except AliyunASRError:
+            raise
         except Exception as e:
             print(f"阿里云ASR语音转文字失败: {e}")
-    
-    def transcribe_audio_bytes(self, audio_bytes, audio_format="wav"):
-        """
-        直接处理音频字节数据
-        
-        Args:
-            audio_bytes: 音频字节数据
-            audio_format: 音频格式
-            
-        Returns:
-            str: 转录后的文本
-        """
-        try:
-            # 保存临时文件
-            temp_path = f"temp_{int(time.time())}.{audio_format}"
-            with open(temp_path, 'wb') as f:
-                f.write(audio_bytes)
-            
-            # 调用转写方法
-            result = self.transcribe_audio(temp_path)
-            
-            # 删除临时文件
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
-            
-            return result
-            
-        except Exception as e:
-            # 确保临时文件被删除
-            if 'temp_path' in locals() and os.path.exists(temp_path):
-                os.remove(temp_path)
-            print(f"阿里云ASR处理音频字节数据失败: {e}")
-            raise
+            raise AliyunASRError(f"阿里云ASR语音转文字失败: {e}") from e
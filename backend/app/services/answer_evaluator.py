@@ -0,0 +1,228 @@
+"""
+模拟面试逐题评估
+
+候选人每提交一个回答，就在后台对该回答评分和诊断，结果保存在会话的问答记录上；
+结束面试时只需汇总各题的评估结果生成报告，不再把全部问答放进一个大prompt重新评估。
+评估调用使用与提问相同的面试官前缀（人设+简历），可以命中上游前缀缓存。
+"""
+import json
+import time
+from config import MOCK_INTERVIEW_CONFIG
+from .llm_gateway import llm_gateway, LLMCall
+from .session_store import session_store, SessionNotFoundError
+
+# 报告中的四个评分项
+SCORE_FIELDS = ("professionalScore", "logicScore", "confidenceScore", "matchScore")
+
+# 逐题建议不足时，按得分最低的评分项补充的通用建议
+SCORE_TIPS = {
+    "professionalScore": "系统梳理岗位要求的核心技能，回答技术问题时结合原理、实践经验和具体数据说明",
+    "logicScore": "回答前先给出结论，再按STAR法则（情境、任务、行动、结果）分点展开，保证条理清晰",
+    "confidenceScore": "提前演练高频问题，回答时语气肯定，避免过多的犹豫词和自我否定",
+    "matchScore": "研究目标岗位的职责要求，在回答中主动把自己的经历与岗位需求关联起来"
+}
+
+# 报告中优化建议的条数
+MIN_SUGGESTIONS = 4
+MAX_SUGGESTIONS = 6
+
+
+def _parse_score(value):
+    """把评分转换为0-100之间的整数，无法转换时返回None"""
+    try:
+        return max(0, min(100, int(round(float(value)))))
+    except (TypeError, ValueError):
+        return None
+
+
+class AnswerEvaluator:
+    """
+    面试回答的逐题评估器
+
+    问答记录中使用的字段：
+    - evaluation: 评估结果（各项评分、feedback、suggestion、improvement），未完成时为None
+    - evaluation_status: pending/done/error，未开启逐题评估时为None
+
+    示例用法：
+    >>> answer_evaluator.submit(session_id, index, entry, prefix)  # 保存回答后调用
+    >>> session = answer_evaluator.collect(session_id, prefix)  # 结束面试时补齐缺失的评估
+    >>> report = answer_evaluator.aggregate(session)
+    """
+
+    # 评估调用的超时时间（秒）
+    EVALUATION_TIMEOUT = 60
+
+    def __init__(self, config=None, gateway=None, store=None):
+        self.config = config or MOCK_INTERVIEW_CONFIG
+        self.gateway = gateway or llm_gateway
+        self.store = store or session_store
+
+    @property
+    def enabled(self):
+        return self.config["evaluate_answers"]
+
+    def build_call(self, prefix, qa, user_id=None):
+        """
+        构建评估一轮回答的调用
+
+        Args:
+            prefix: 面试官前缀消息（人设+简历），与提问调用相同
+            qa: 问答记录
+            user_id: 用户ID，在请求之外执行时需要指定
+        """
+        instruction = "请以专业面试评估专家的身份，根据候选人的简历评估以上这一轮回答，要求：\n\n1. 包含以下评分项（0-100分）：\n   - professionalScore：专业能力评分\n   - logicScore：逻辑表达评分\n   - confidenceScore：自信程度评分\n   - matchScore：岗位匹配度评分\n\n2. feedback：对该回答的评价，指出优点和不足\n3. suggestion：针对该问题的改进建议\n4. improvement：从该回答中反映出的、对整场面试都适用的一条优化建议\n\n输出格式要求：\n{\"professionalScore\": 数字, \"logicScore\": 数字, \"confidenceScore\": 数字, \"matchScore\": 数字, \"feedback\": \"评价\", \"suggestion\": \"改进建议\", \"improvement\": \"优化建议\"}\n\n只输出JSON格式，不要包含任何额外的文字或解释。"
+        return LLMCall(
+            messages=[
+                prefix,
+                {"role": "assistant", "content": qa["question"]},
+                {"role": "user", "content": qa["answer"] or ""},
+                {"role": "system", "content": instruction}
+            ],
+            route="mock_interview.evaluate",
+            user_id=user_id,
+            temperature=0.3,
+            max_tokens=512,
+            timeout=self.EVALUATION_TIMEOUT
+        )
+
+    def parse(self, api_result):
+        """
+        解析评估结果
+
+        Returns:
+            dict: 各项评分（0-100整数）以及feedback、suggestion、improvement
+
+        Raises:
+            ValueError: 输出中没有有效的JSON或缺少评分
+        """
+        start_idx = api_result.find('{')
+        end_idx = api_result.rfind('}') + 1
+        if start_idx == -1 or end_idx <= start_idx:
+            raise ValueError("未找到有效的JSON结构")
+        data = json.loads(api_result[start_idx:end_idx])
+        evaluation = {field: _parse_score(data.get(field)) for field in SCORE_FIELDS}
+        if all(score is None for score in evaluation.values()):
+            raise ValueError("评估结果中没有评分")
+        for field in ("feedback", "suggestion", "improvement"):
+            evaluation[field] = str(data.get(field) or "").strip()
+        return evaluation
+
+    def _save(self, session_id, index, evaluation):
+        """把评估结果写回问答记录，evaluation为None时标记为失败"""
+        def apply(entry):
+            entry["evaluation"] = evaluation
+            entry["evaluation_status"] = "done" if evaluation else "error"
+        self.store.update_turn(session_id, index, apply)
+
+    def submit(self, session_id, index, qa, prefix):
+        """
+        在后台评估一轮回答，完成后写回问答记录
+
+        同一场面试可能并发追加回答，本地会话快照中的序号不一定与存储一致，
+        因此直接使用这一轮的问答记录构建评估调用，并按存储返回的序号写回结果。
+
+        Args:
+            session_id: 面试会话ID
+            index: append_turn返回的问答记录序号
+            qa: 这一轮的问答记录
+            prefix: 面试官前缀消息
+        """
+        def on_done(future):
+            try:
+                evaluation = self.parse(future.result())
+            except Exception as e:
+                print(f"评估回答失败: {e}")
+                evaluation = None
+            try:
+                self._save(session_id, index, evaluation)
+            except SessionNotFoundError:
+                pass
+            except Exception as e:
+                print(f"保存回答评估失败: {e}")
+
+        self.gateway.submit(self.build_call(prefix, qa)).add_done_callback(on_done)
+
+    def collect(self, session_id, prefix, user_id=None):
+        """
+        结束面试时取出会话并补齐评估：等待进行中的评估（最多evaluation_wait秒），
+        仍未完成或失败的回答并发重新评估
+
+        Returns:
+            dict: 会话，问答记录中带有评估结果（重新评估仍失败的为None）
+
+        Raises:
+            SessionNotFoundError: 会话不存在或已过期
+        """
+        deadline = time.time() + self.config["evaluation_wait"]
+        while True:
+            session = self.store.get(session_id)
+            if session is None:
+                raise SessionNotFoundError(session_id)
+            pending = any(qa.get("evaluation_status") == "pending" for qa in session["question_answers"])
+            if not pending or time.time() >= deadline:
+                break
+            time.sleep(0.2)
+
+        turns = session["question_answers"]
+        missing = [index for index, qa in enumerate(turns) if qa.get("evaluation_status") != "done"]
+        if missing:
+            print(f"[LLM LOG] 结束面试时重新评估{len(missing)}个回答")
+            futures = [(index, self.gateway.submit(self.build_call(prefix, turns[index], user_id))) for index in missing]
+            for index, future in futures:
+                try:
+                    turns[index]["evaluation"] = self.parse(future.result())
+                    turns[index]["evaluation_status"] = "done"
+                except Exception as e:
+                    print(f"评估回答失败: {e}")
+        return session
+
+    def aggregate(self, session):
+        """
+        汇总逐题评估生成面试报告
+
+        各项评分取已评估回答的平均分；优化建议优先取得分较低回答的improvement，不足时按得分最低的评分项补充
+
+        Returns:
+            dict: 与面试报告格式相同，没有任何已评估的回答时返回None
+        """
+        turns = session["question_answers"]
+        evaluations = [qa.get("evaluation") for qa in turns]
+        evaluated = [evaluation for evaluation in evaluations if evaluation]
+        if not evaluated:
+            return None
+
+        report = {}
+        for field in SCORE_FIELDS:
+            scores = [evaluation[field] for evaluation in evaluated if evaluation.get(field) is not None]
+            report[field] = round(sum(scores) / len(scores)) if scores else None
+
+        report["questionAnalysis"] = [
+            {
+                "question": qa["question"],
+                "answer": qa["answer"],
+                "feedback": (evaluation or {}).get("feedback") or qa.get("feedback") or "",
+                "suggestion": (evaluation or {}).get("suggestion") or ""
+            }
+            for qa, evaluation in zip(turns, evaluations)
+        ]
+
+        def average(evaluation):
+            scores = [evaluation[field] for field in SCORE_FIELDS if evaluation.get(field) is not None]
+            return sum(scores) / len(scores)
+
+        suggestions = []
+        for evaluation in sorted(evaluated, key=average):
+            improvement = evaluation.get("improvement")
+            if improvement and improvement not in suggestions:
+                suggestions.append(improvement)
+        weakest = sorted((field for field in SCORE_FIELDS if report[field] is not None), key=lambda field: report[field])
+        for field in weakest:
+            if len(suggestions) >= MIN_SUGGESTIONS:
+                break
+            suggestions.append(SCORE_TIPS[field])
+        report["optimizationSuggestions"] = suggestions[:MAX_SUGGESTIONS]
+        return report
+
+
+# 进程级单例
+answer_evaluator = AnswerEvaluator()
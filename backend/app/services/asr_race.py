@@ -0,0 +1,142 @@
+"""
+语音识别引擎竞速
+
+延迟敏感的回答同时把音频交给阿里云ASR和本地Faster Whisper，采用最先返回的非空结果：
+- 先完成但结果为空或失败的引擎不算胜出，继续等待其他引擎
+- 胜出后尚未开始的识别任务直接取消；已在执行的任务不再等待，完成后只记录耗时
+- 所有引擎都失败时抛出最后一个异常，都返回空文本时返回空文本
+
+按引擎记录胜出次数、胜率和平均耗时（包括落败引擎的耗时），用于按部署环境调整默认识别引擎。
+"""
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from config import ASR_RACE_CONFIG
+
+
+class AsrRacer:
+    """
+    识别引擎竞速
+
+    engines参数为{引擎名: 识别函数}，识别函数接收WAV字节数据并返回识别文本。
+
+    示例用法：
+    >>> text = asr_racer.race(wav_bytes, {"aliyun": aliyun.transcribe_audio_bytes,
+    ...                                   "whisper": whisper.transcribe_audio_bytes})
+    """
+
+    def __init__(self, config=None):
+        self.config = config or ASR_RACE_CONFIG
+        self._executor = ThreadPoolExecutor(max_workers=self.config["workers"], thread_name_prefix="asr-race")
+        self._lock = threading.Lock()
+        self._races = 0
+        self._no_winner = 0
+        self._engines = {}
+
+    def _engine_stats(self, name):
+        """获取引擎的统计项，调用方需持有_lock"""
+        stats = self._engines.get(name)
+        if stats is None:
+            stats = {"started": 0, "wins": 0, "empty": 0, "errors": 0, "cancelled": 0,
+                     "completed": 0, "total_latency": 0.0}
+            self._engines[name] = stats
+        return stats
+
+    def _run(self, name, transcribe, audio_data):
+        """在竞速线程中执行一个引擎的识别，记录耗时和结果"""
+        start_time = time.time()
+        try:
+            text = transcribe(audio_data) or ""
+        except Exception:
+            with self._lock:
+                self._engine_stats(name)["errors"] += 1
+            raise
+        with self._lock:
+            stats = self._engine_stats(name)
+            stats["completed"] += 1
+            stats["total_latency"] += time.time() - start_time
+            if not text.strip():
+                stats["empty"] += 1
+        return text
+
+    def race(self, audio_data, engines):
+        """
+        同时调用多个引擎识别同一段音频
+
+        Args:
+            audio_data: WAV字节数据
+            engines: {引擎名: 识别函数}
+
+        Returns:
+            str: 最先返回的非空识别文本
+        """
+        if not engines:
+            raise ValueError("没有可用的语音识别引擎")
+        with self._lock:
+            self._races += 1
+            for name in engines:
+                self._engine_stats(name)["started"] += 1
+        futures = {
+            self._executor.submit(self._run, name, transcribe, audio_data): name
+            for name, transcribe in engines.items()
+        }
+
+        pending = set(futures)
+        deadline = time.time() + self.config["timeout"]
+        last_error = None
+        empty_result = None
+        while pending:
+            done, pending = wait(pending, timeout=max(0.0, deadline - time.time()), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                try:
+                    text = future.result()
+                except Exception as e:
+                    print(f"语音识别引擎竞速: {futures[future]}识别失败: {e}")
+                    last_error = e
+                    continue
+                if not text.strip():
+                    empty_result = text
+                    continue
+                winner = futures[future]
+                with self._lock:
+                    self._engine_stats(winner)["wins"] += 1
+                    for loser in pending:
+                        # 尚未开始执行的任务直接取消，已在执行的任务完成后只记录耗时
+                        if loser.cancel():
+                            self._engine_stats(futures[loser])["cancelled"] += 1
+                print(f"[API LOG] 语音识别引擎竞速: {winner}胜出")
+                return text
+
+        with self._lock:
+            self._no_winner += 1
+            for future in pending:
+                if future.cancel():
+                    self._engine_stats(futures[future])["cancelled"] += 1
+        if empty_result is not None:
+            return empty_result
+        if last_error is not None:
+            raise last_error
+        raise TimeoutError(f"语音识别超时（{self.config['timeout']}秒）")
+
+    def get_stats(self):
+        """
+        获取竞速统计信息
+
+        Returns:
+            dict: 竞速次数、没有引擎返回非空结果的次数，以及各引擎的胜出次数、胜率、空结果/失败/取消次数和平均耗时（秒）
+        """
+        with self._lock:
+            races = self._races
+            no_winner = self._no_winner
+            engines = {name: dict(stats) for name, stats in self._engines.items()}
+        for stats in engines.values():
+            total_latency = stats.pop("total_latency")
+            stats["win_rate"] = stats["wins"] / stats["started"] if stats["started"] else 0.0
+            stats["avg_latency"] = total_latency / stats["completed"] if stats["completed"] else 0.0
+        return {"races": races, "no_winner": no_winner, "engines": engines}
+
+
+# 进程级单例
+asr_racer = AsrRacer()
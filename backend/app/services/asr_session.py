@@ -0,0 +1,341 @@
+"""
+实时语音识别会话
+
+/realtime-voice 按chunkIndex逐段上传录音（每段约1秒）。逐段独立识别时，词语会在分段边界被截断，
+每段都要承担一次完整的识别请求开销。这里为每个(interviewId, questionId)维护一个识别会话：
+
+- 抖动缓冲：分段按chunkIndex重新排序后拼接，缺失的分段最多等待jitter_chunks个后续分段，之后跳过
+- 自适应合并：新音频累计到识别窗口（按近期识别耗时在min_window~max_window秒之间调整）时才识别一次，
+  识别进行中到达的分段只缓存不识别，窗口随之自然变大；识别时覆盖上次确认点之后的全部音频，不在分段边界切词
+- 稳定前缀：相邻两次识别结果的公共前缀视为稳定，只把新增的稳定文本返回给客户端（客户端按原方式追加即可），
+  检测到停顿（pause_ms）或窗口达到max_window秒时确认整段结果，之后从新的确认点继续
+- 结束录音时（final）识别剩余音频，完整识别文本保留到/voice-answer提交回答时直接使用，不再重复识别整段录音
+- 重新录制同一个问题：分段带有新的recordingId（客户端未提供时为chunkIndex重新从0开始）时丢弃旧会话重新开始；
+  提交回答时只复用同一次录音的识别文本（recordingId一致，或未提供时与提交的录音时长一致），否则由调用方识别提交的录音
+
+会话保存在进程内存中，闲置超过ttl秒后清理。只处理16位PCM的WAV分段，其他格式由调用方逐段识别。
+"""
+import os
+import time
+import threading
+import numpy as np
+from config import ASR_SESSION_CONFIG, VAD_CONFIG
+from ..utils.audio_vad import decode_wav, encode_wav, detect_speech
+
+
+class AsrSession:
+    """一个回答的识别会话，所有字段由cond保护"""
+
+    __slots__ = (
+        "cond", "recording_id", "sample_rate", "chunks", "next_index", "received", "samples", "recognized",
+        "committed_text", "hypothesis", "window_stable", "emitted",
+        "window_seconds", "busy", "finished", "updated_at"
+    )
+
+    def __init__(self, recording_id, sample_rate, window_seconds):
+        self.cond = threading.Condition()
+        self.recording_id = recording_id  # 客户端每次开始录音时生成的ID，未提供时为None
+        self.sample_rate = sample_rate
+        self.chunks = {}  # 等待拼接的乱序分段：chunkIndex -> 样本
+        self.next_index = 0  # 下一个要拼接的分段序号
+        self.received = 0  # 已拼接的样本总数（含已确认部分），用于判断提交的录音是否为同一次录音
+        self.samples = np.zeros(0, dtype=np.float32)  # 上次确认点之后的音频
+        self.recognized = 0  # samples中已识别过的样本数
+        self.committed_text = ""  # 已确认的识别文本
+        self.hypothesis = ""  # 未确认音频的最近一次识别结果
+        self.window_stable = ""  # hypothesis中已作为稳定文本返回的前缀
+        self.emitted = 0  # 已返回给客户端的稳定文本长度
+        self.window_seconds = window_seconds
+        self.busy = False
+        self.finished = False
+        self.updated_at = time.time()
+
+    @property
+    def stable_text(self):
+        return self.committed_text + self.window_stable
+
+    @property
+    def partial_text(self):
+        return self.committed_text + self.hypothesis
+
+
+class AsrSessionManager:
+    """
+    实时语音识别会话管理
+
+    transcribe参数为识别函数：接收WAV字节数据，返回识别文本（异常向上抛出）。
+
+    示例用法：
+    >>> result = asr_sessions.feed(interview_id, question_id, chunk_index, wav_bytes, transcribe)
+    >>> result["transcribedText"]  # 本次新增的稳定文本
+    >>> text = asr_sessions.take_transcript(interview_id, question_id, transcribe, recording_id, wav_bytes)  # 提交回答时复用
+    """
+
+    def __init__(self, config=None, vad_config=None):
+        self.config = config or ASR_SESSION_CONFIG
+        self.vad_config = vad_config or VAD_CONFIG
+        self._lock = threading.Lock()
+        self._sessions = {}
+        self._stats = {
+            "chunks": 0, "duplicates": 0, "lost_chunks": 0, "recognitions": 0, "silent_windows": 0,
+            "recognized_seconds": 0.0, "total_latency": 0.0, "reused_transcripts": 0, "stale_transcripts": 0,
+            "restarts": 0, "expired": 0
+        }
+
+    def _count(self, name, value=1):
+        with self._lock:
+            self._stats[name] += value
+
+    @staticmethod
+    def _key(interview_id, question_id):
+        return f"{interview_id}:{question_id}"
+
+    def _sweep(self, now):
+        """清理闲置超过ttl秒的会话，调用方需持有_lock"""
+        expired = [key for key, session in self._sessions.items() if now - session.updated_at > self.config["ttl"]]
+        for key in expired:
+            del self._sessions[key]
+        self._stats["expired"] += len(expired)
+
+    @staticmethod
+    def _restarted(session, chunk_index, recording_id):
+        """分段是否属于同一问题的一次新录音：recordingId不同，或未提供recordingId时chunkIndex重新从0开始"""
+        if recording_id is not None or session.recording_id is not None:
+            return recording_id != session.recording_id
+        return chunk_index == 0 and (session.next_index > 0 or 0 in session.chunks)
+
+    def feed(self, interview_id, question_id, chunk_index, audio, transcribe, final=False, recording_id=None):
+        """
+        接收一个音频分段，需要时识别
+
+        Args:
+            interview_id: 面试ID
+            question_id: 问题ID
+            chunk_index: 分段序号（从0开始）
+            audio: 分段音频（16位PCM的WAV）
+            transcribe: 识别函数
+            final: 是否为最后一个分段，为True时识别剩余音频并结束会话
+            recording_id: 客户端每次开始录音时生成的ID，与已有会话不同时丢弃旧会话重新开始
+
+        Returns:
+            dict: transcribedText（新增的稳定文本）、stableText、partialText、final；
+                  分段不是16位PCM的WAV时返回None，由调用方逐段识别
+        """
+        decoded = decode_wav(audio)
+        if decoded is None:
+            return None
+        samples, sample_rate = decoded
+        key = self._key(interview_id, question_id)
+
+        now = time.time()
+        with self._lock:
+            self._sweep(now)
+            session = self._sessions.get(key)
+            if session is not None and not session.finished and self._restarted(session, chunk_index, recording_id):
+                # 重新录制同一个问题，旧录音的识别结果不再使用
+                self._stats["restarts"] += 1
+                session = None
+            if session is None or session.finished:
+                session = AsrSession(recording_id, sample_rate, self.config["min_window"])
+                self._sessions[key] = session
+            self._stats["chunks"] += 1
+
+        with session.cond:
+            if session.sample_rate != sample_rate:
+                return None
+            session.updated_at = now
+            if chunk_index < session.next_index or chunk_index in session.chunks:
+                self._count("duplicates")
+            else:
+                session.chunks[chunk_index] = samples
+            self._drain(session, force=final)
+
+        self._recognize(session, transcribe, final)
+
+        with session.cond:
+            stable = session.stable_text
+            result = {
+                "transcribedText": stable[session.emitted:],
+                "stableText": stable,
+                "partialText": session.partial_text,
+                "final": session.finished
+            }
+            session.emitted = len(stable)
+        return result
+
+    def _drain(self, session, force=False):
+        """把连续的分段拼接到待识别音频，缺失分段超过抖动缓冲（或force）时跳过，调用方需持有session.cond"""
+        parts = []
+        while session.chunks:
+            if session.next_index not in session.chunks:
+                if not force and max(session.chunks) - session.next_index < self.config["jitter_chunks"]:
+                    break
+                lost = min(session.chunks) - session.next_index
+                self._count("lost_chunks", lost)
+                session.next_index += lost
+            parts.append(session.chunks.pop(session.next_index))
+            session.next_index += 1
+            session.received += len(parts[-1])
+        if parts:
+            session.samples = np.concatenate([session.samples] + parts)
+
+    def _trailing_pause(self, samples, sample_rate, vad):
+        """音频末尾是否有足够长的停顿（可以在此确认识别结果而不切断词语）"""
+        if not vad.has_speech:
+            return True
+        padding = int(sample_rate * self.vad_config["padding_ms"] / 1000)
+        speech_end = vad.end - padding if vad.end < len(samples) else len(samples)
+        return len(samples) - speech_end >= sample_rate * self.config["pause_ms"] / 1000
+
+    def _recognize(self, session, transcribe, final):
+        """
+        新音频达到识别窗口、出现停顿或结束录音时，识别上次确认点之后的全部音频
+
+        同一会话同时只进行一次识别；结束录音时等待进行中的识别完成后再识别剩余音频
+        """
+        with session.cond:
+            if final:
+                session.cond.wait_for(lambda: not session.busy, timeout=self.config["final_wait"])
+            if session.busy or session.finished:
+                return
+            rate = session.sample_rate
+            count = len(session.samples)
+            new_samples = count - session.recognized
+            snapshot = session.samples[:count]
+            vad = detect_speech(snapshot, rate, self.vad_config)
+            pause = self._trailing_pause(snapshot, rate, vad)
+            if not final:
+                due = (new_samples >= session.window_seconds * rate
+                       or (pause and new_samples > 0)
+                       or count >= self.config["max_window"] * rate)
+                if not due:
+                    return
+            session.busy = True
+
+        text = None
+        latency = 0.0
+        try:
+            if vad.has_speech and (new_samples > 0 or not session.hypothesis):
+                start_time = time.time()
+                text = transcribe(encode_wav(snapshot[vad.start:vad.end], rate)) or ""
+                latency = time.time() - start_time
+                with self._lock:
+                    self._stats["recognitions"] += 1
+                    self._stats["recognized_seconds"] += (vad.end - vad.start) / rate
+                    self._stats["total_latency"] += latency
+            elif not vad.has_speech:
+                text = ""
+                self._count("silent_windows")
+        finally:
+            with session.cond:
+                commit = final or pause or count >= self.config["max_window"] * rate
+                self._apply(session, text, commit, count)
+                if latency:
+                    # 识别耗时越长，下次合并越多音频再识别（客户端每秒上传一段，窗口至少覆盖识别耗时）
+                    session.window_seconds = min(self.config["max_window"], max(
+                        self.config["min_window"], latency * self.config["window_factor"]))
+                if final:
+                    session.finished = True
+                session.busy = False
+                session.updated_at = time.time()
+                session.cond.notify_all()
+
+    def _apply(self, session, text, commit, count):
+        """用新的识别结果更新稳定前缀，需要时确认整段结果，调用方需持有session.cond"""
+        if text is None:
+            # 识别失败：保留上次结果，确认时使用上次结果
+            text = session.hypothesis
+        elif session.hypothesis and not commit:
+            common = os.path.commonprefix([session.hypothesis, text])
+            if common.startswith(session.window_stable) and len(common) > len(session.window_stable):
+                session.window_stable = common
+        if commit:
+            # 已返回的稳定文本不再改变，确认结果以它为前缀
+            if not text.startswith(session.window_stable):
+                text = session.window_stable + text[len(session.window_stable):]
+            session.committed_text += text
+            session.hypothesis = ""
+            session.window_stable = ""
+            session.samples = session.samples[count:]
+            session.recognized = 0
+        else:
+            session.hypothesis = text
+            session.recognized = count
+
+    def _same_recording(self, session, recording_id, audio):
+        """
+        提交的录音是否就是会话识别的录音，调用方需持有session.cond
+
+        双方都有recordingId时按ID判断，否则比较提交的录音与会话收到的音频时长（录音无法解码时视为不是同一次录音）；
+        调用方两者都未提供时直接复用
+        """
+        if recording_id is not None and session.recording_id is not None:
+            return recording_id == session.recording_id
+        if audio is None:
+            return True
+        decoded = decode_wav(audio)
+        if decoded is None:
+            return False
+        samples, sample_rate = decoded
+        difference = abs(len(samples) / sample_rate - session.received / session.sample_rate)
+        return difference <= self.config["reuse_tolerance"]
+
+    def take_transcript(self, interview_id, question_id, transcribe, recording_id=None, audio=None):
+        """
+        提交回答时取出会话的完整识别文本（未结束的会话先识别剩余音频），取出后删除会话
+
+        Args:
+            recording_id: 提交的录音的recordingId，客户端未提供时为None
+            audio: 提交的录音（WAV），未提供recordingId时按时长判断是否为同一次录音
+
+        Returns:
+            str: 完整识别文本；没有识别会话，或会话不是这次提交的录音时返回None（会话被丢弃），由调用方识别提交的录音
+        """
+        key = self._key(interview_id, question_id)
+        with self._lock:
+            session = self._sessions.get(key)
+        if session is None:
+            return None
+
+        with session.cond:
+            self._drain(session, force=True)
+            same_recording = self._same_recording(session, recording_id, audio)
+        if not same_recording:
+            with self._lock:
+                if self._sessions.get(key) is session:
+                    del self._sessions[key]
+                self._stats["stale_transcripts"] += 1
+            return None
+        self._recognize(session, transcribe, final=True)
+
+        with self._lock:
+            if self._sessions.get(key) is session:
+                del self._sessions[key]
+            self._stats["reused_transcripts"] += 1
+        with session.cond:
+            return session.committed_text
+
+    def discard(self, interview_id, question_id):
+        """丢弃识别会话（重新开始录制或识别文本已取走时调用）"""
+        with self._lock:
+            self._sessions.pop(self._key(interview_id, question_id), None)
+
+    def get_stats(self):
+        """
+        获取识别会话统计信息
+
+        Returns:
+            dict: 活跃会话数、接收/重复/丢失的分段数、识别次数、跳过的静音窗口数、平均识别窗口（秒）和耗时、
+                  重新录制的次数，以及提交回答时复用识别文本和因不是同一次录音而未复用的次数
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["sessions"] = len(self._sessions)
+        recognitions = stats["recognitions"]
+        stats["avg_window_seconds"] = stats["recognized_seconds"] / recognitions if recognitions else 0.0
+        stats["avg_latency"] = stats.pop("total_latency") / recognitions if recognitions else 0.0
+        return stats
+
+
+# 进程级单例
+asr_sessions = AsrSessionManager()
@@ -0,0 +1,223 @@
+"""
+模拟面试对话压缩
+
+长时间的面试中，每轮prompt都携带完整简历和全部历史会让prompt随轮数线性增长。该模块负责：
+- 最近N轮问答原样保留
+- 更早的问答由大模型增量合并进一段滚动摘要，在后台执行，不阻塞当前轮次
+- 按token预算裁剪简历、摘要和历史，保证每个prompt的大小有上限
+- 历史以聊天消息的形式输出，已发送的消息在后续轮次中保持不变，便于命中上游前缀缓存
+"""
+import re
+import time
+from config import MOCK_INTERVIEW_CONFIG
+from .llm_gateway import llm_gateway, LLMCall
+from .session_store import session_store
+
+# 中日韩文字及全角标点
+_CJK_PATTERN = re.compile(r'[\u3000-\u303f\u4e00-\u9fff\uff00-\uffef]')
+
+TRUNCATED_MARKER = "……（已截断）"
+
+
+def estimate_tokens(text):
+    """粗略估算文本的token数：中文字符按1个token计，其余字符按4个字符1个token计"""
+    if not text:
+        return 0
+    cjk = len(_CJK_PATTERN.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def truncate_to_tokens(text, max_tokens):
+    """
+    按估算的token数截断文本，截断时在末尾追加标记
+
+    Returns:
+        str: 不超过max_tokens的文本
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    budget = max_tokens - estimate_tokens(TRUNCATED_MARKER)
+    if budget <= 0:
+        return ""
+
+    # 二分查找能放进预算的最长前缀
+    low, high = 0, len(text)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if estimate_tokens(text[:mid]) <= budget:
+            low = mid
+        else:
+            high = mid - 1
+    return text[:low] + TRUNCATED_MARKER
+
+
+def format_turn(qa):
+    """格式化一轮问答"""
+    return "问题：" + qa["question"] + "\n回答：" + (qa["answer"] or "")
+
+
+class ConversationCompactor:
+    """
+    面试会话的历史压缩器
+
+    会话中使用的字段：
+    - summary: 已合并轮次的滚动摘要
+    - summarized_turns: question_answers中已合并进摘要的轮数
+    - summary_pending_since: 正在进行的摘要更新的开始时间，没有时为None
+
+    示例用法：
+    >>> messages = conversation_compactor.history_messages(session)
+    >>> conversation_compactor.maybe_compact(session)  # 每轮结束后调用
+    """
+
+    # 摘要调用的超时时间（秒），超过两倍仍未完成的摘要更新（如所在进程已退出）不再阻止新的更新
+    SUMMARY_TIMEOUT = 60
+
+    def __init__(self, config=None, gateway=None, store=None):
+        self.config = config or MOCK_INTERVIEW_CONFIG
+        self.gateway = gateway or llm_gateway
+        self.store = store or session_store
+
+    def fit_resume(self, resume_content):
+        """
+        按简历预算截断简历
+
+        截断结果只取决于简历本身，同一场面试的每次调用得到完全相同的文本，可以作为稳定的前缀命中上游缓存
+        """
+        return truncate_to_tokens(resume_content, self._resume_budget())
+
+    def _resume_budget(self):
+        return min(self.config["resume_token_budget"], self.config["prompt_token_budget"] // 2)
+
+    def history_messages(self, session, budget=None):
+        """
+        把对话历史渲染为聊天消息：滚动摘要 + 尚未合并的问答（问题为assistant消息，回答为user消息）
+
+        已发送过的消息在后续轮次中保持不变，新一轮只在末尾追加，便于上游前缀缓存命中。
+
+        Args:
+            session: 面试会话
+            budget: 历史部分的token预算，默认为prompt_token_budget减去简历预算
+
+        Returns:
+            list: 消息列表，超出预算时优先保留最近的问答
+        """
+        if budget is None:
+            budget = self.config["prompt_token_budget"] - self._resume_budget()
+        turns = session["question_answers"]
+        start = min(session.get("summarized_turns", 0), len(turns))
+
+        messages = []
+        summary = session.get("summary")
+        if summary and start:
+            summary = truncate_to_tokens(summary, min(self.config["summary_max_tokens"], budget // 2))
+            messages.append({"role": "system", "content": f"之前{start}轮问答的摘要：" + summary})
+            budget -= estimate_tokens(messages[0]["content"])
+
+        # 从最近一轮往前，能放进预算的问答原样保留（摘要尚未完成时也包括更早未合并的轮次）
+        recent = []
+        for qa in reversed(turns[start:]):
+            question, answer = qa["question"], qa["answer"] or ""
+            cost = estimate_tokens(question) + estimate_tokens(answer)
+            if cost > budget:
+                if not recent:
+                    recent.append((truncate_to_tokens(question, budget // 2), truncate_to_tokens(answer, budget // 2)))
+                break
+            recent.append((question, answer))
+            budget -= cost
+        omitted = len(turns) - start - len(recent)
+        if omitted > 0:
+            messages.append({"role": "system", "content": f"（更早的{omitted}轮问答已省略）"})
+        for question, answer in reversed(recent):
+            messages.append({"role": "assistant", "content": question})
+            messages.append({"role": "user", "content": answer})
+        return messages
+
+    def transcript_messages(self, session, budget):
+        """
+        把完整问答记录渲染为聊天消息（用于面试报告），超出预算时按轮均分预算截断每轮内容
+
+        Returns:
+            list: 消息列表
+        """
+        turns = session["question_answers"]
+        pairs = [(qa["question"], qa["answer"] or "") for qa in turns]
+        if sum(estimate_tokens(question) + estimate_tokens(answer) for question, answer in pairs) > budget:
+            per_text = max(budget // (len(pairs) * 2), 1)
+            pairs = [(truncate_to_tokens(question, per_text), truncate_to_tokens(answer, per_text)) for question, answer in pairs]
+        messages = []
+        for question, answer in pairs:
+            messages.append({"role": "assistant", "content": question})
+            messages.append({"role": "user", "content": answer})
+        return messages
+
+    def _build_summary_messages(self, summary, turns):
+        """构建增量更新摘要的消息"""
+        prompt = "以下是一场模拟面试中较早的问答，请把它们与已有摘要合并为新的对话摘要，要求：\n\n1. 保留候选人提到的关键经历、技能、项目数据和观点\n2. 记录回答中的明显亮点和不足，便于后续追问和最终评估\n3. 不超过" + str(self.config["summary_max_tokens"]) + "字\n\n已有摘要：" + (summary or "无") + "\n\n新增问答：\n" + "\n\n".join(format_turn(qa) for qa in turns) + "\n\n只输出摘要内容，不要包含任何额外的文字或解释。"
+        return [
+            {"role": "system", "content": "你是一位专业的面试记录员"},
+            {"role": "user", "content": prompt}
+        ]
+
+    def maybe_compact(self, session):
+        """
+        未合并的轮次达到保留轮数的两倍时，在后台把较早的轮次合并进摘要，只保留最近keep_turns轮
+
+        按批合并而不是每轮合并一轮，摘要和其后的问答在相邻几轮之间保持不变，上游前缀缓存可以持续命中。
+        同一会话同时只有一个摘要更新在进行（通过会话存储原子地占用，多进程部署时同样有效），
+        失败时保留原摘要，下一轮结束后重试。
+
+        Args:
+            session: 面试会话快照（包含本轮问答记录）
+        """
+        session_id = session["interview_id"]
+        total = len(session["question_answers"])
+        end = total - self.config["keep_turns"]
+        if total - session.get("summarized_turns", 0) < 2 * self.config["keep_turns"]:
+            return
+
+        def claim(meta):
+            pending_since = meta.get("summary_pending_since")
+            if pending_since and time.time() - pending_since < 2 * self.SUMMARY_TIMEOUT:
+                return None
+            if meta.get("summarized_turns", 0) >= end:
+                return None
+            meta["summary_pending_since"] = time.time()
+            return meta.get("summarized_turns", 0), meta.get("summary")
+
+        claimed = self.store.update(session_id, claim)
+        if claimed is None:
+            return
+        start, summary = claimed
+
+        call = LLMCall(
+            messages=self._build_summary_messages(summary, session["question_answers"][start:end]),
+            route="mock_interview.summary",
+            temperature=0.3,
+            max_tokens=self.config["summary_max_tokens"],
+            timeout=self.SUMMARY_TIMEOUT
+        )
+
+        def on_done(future):
+            try:
+                summary = future.result().strip()
+            except Exception as e:
+                print(f"更新对话摘要失败: {e}")
+                summary = ""
+
+            def apply(meta):
+                meta["summary_pending_since"] = None
+                if summary:
+                    meta["summary"] = summary
+                    meta["summarized_turns"] = end
+
+            try:
+                self.store.update(session_id, apply)
+            except Exception as e:
+                print(f"保存对话摘要失败: {e}")
+
+        self.gateway.submit(call).add_done_callback(on_done)
+
+
+# 进程级单例
+conversation_compactor = ConversationCompactor()
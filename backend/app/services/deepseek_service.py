@@ -1,23 +1,19 @@
-from openai import OpenAI
-from config import DEEPSEEK_CONFIG
+from .llm_gateway import llm_gateway, LLMCall
 
-# 配置DeepSeek API客户端
-client = OpenAI(
-    api_key=DEEPSEEK_CONFIG["api_key"],
-    base_url=DEEPSEEK_CONFIG["base_url"]
-)
-
-def generate_self_intro(resume_content, version, style):
+def build_self_intro_call(resume_content, version, style, bypass_cache=False):
     """
-    根据简历内容生成自我介绍
+    构建生成自我介绍的大模型调用
+    
+    相同简历、版本和风格的请求优先返回缓存结果
     
     Args:
         resume_content: 简历内容
         version: 版本（30秒电梯演讲版/3分钟标准版/5分钟深度版）
         style: 风格（正式/活泼/专业/亲切）
+        bypass_cache: 是否跳过缓存强制重新生成
         
     Returns:
-        str: 生成的自我介绍文本
+        LLMCall: 大模型调用描述
     """
     if resume_content:
         prompt = f"""
@@ -48,27 +44,43 @@ def generate_self_intro(resume_content, version, style):
         6. 适用于大多数职业场景
         """
     
-    response = client.chat.completions.create(
-        model=DEEPSEEK_CONFIG["model"],
+    return LLMCall(
         messages=[
             {"role": "system", "content": "你是一位专业的自我介绍生成专家，擅长生成自然、流畅、有吸引力的自我介绍"},
             {"role": "user", "content": prompt}
         ],
+        route="self_intro.generate",
+        bypass_cache=bypass_cache,
         temperature=0.7,
-        max_tokens=1000
+        max_tokens=1000,
+        timeout=60
     )
+
+def generate_self_intro(resume_content, version, style, bypass_cache=False):
+    """
+    根据简历内容生成自我介绍
     
-    return response.choices[0].message.content.strip()
+    Args:
+        resume_content: 简历内容
+        version: 版本（30秒电梯演讲版/3分钟标准版/5分钟深度版）
+        style: 风格（正式/活泼/专业/亲切）
+        bypass_cache: 是否跳过缓存强制重新生成
+        
+    Returns:
+        str: 生成的自我介绍文本
+    """
+    content = llm_gateway.execute(build_self_intro_call(resume_content, version, style, bypass_cache))
+    return content.strip()
 
-def analyze_resume(resume_content):
+def build_resume_analysis_call(resume_content):
     """
-    分析简历内容，生成优化建议
+    构建分析简历内容的大模型调用
     
     Args:
         resume_content: 原始简历内容
         
     Returns:
-        str: DeepSeek API返回的分析结果
+        LLMCall: 大模型调用描述
     """
     prompt = f"""
     请对以下简历内容进行全面分析和优化，并严格按照以下要求输出JSON格式结果：
@@ -107,14 +119,25 @@ def analyze_resume(resume_content):
     {resume_content}
     """
     
-    response = client.chat.completions.create(
-        model=DEEPSEEK_CONFIG["model"],
+    return LLMCall(
         messages=[
             {"role": "system", "content": "你是一位专业的简历分析专家，擅长评估技术岗位的简历"},
             {"role": "user", "content": prompt}
         ],
+        route="resume.analyze",
         temperature=0.7,
-        max_tokens=8192
+        max_tokens=8192,
+        timeout=180
     )
+
+def analyze_resume(resume_content):
+    """
+    分析简历内容，生成优化建议
     
-    return response.choices[0].message.content
+    Args:
+        resume_content: 原始简历内容
+        
+    Returns:
+        str: DeepSeek API返回的分析结果
+    """
+    return llm_gateway.execute(build_resume_analysis_call(resume_content))
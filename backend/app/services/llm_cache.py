@@ -0,0 +1,174 @@
+"""
+大模型响应缓存
+
+以 (model, messages, temperature, max_tokens) 的哈希作为键缓存生成结果：
+- 进程内LRU，超过容量时淘汰最久未使用的条目
+- 每个条目带TTL，过期后视为未命中
+- 可选的磁盘层，进程重启或多进程部署时复用已生成的结果
+"""
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from config import LLM_CACHE_CONFIG
+
+
+class LLMCache:
+    """
+    内容寻址的大模型响应缓存
+
+    示例用法：
+    >>> key = LLMCache.make_key("deepseek-chat", messages, 0.7, 1000)
+    >>> content = llm_cache.get(key)
+    >>> if content is None:
+    ...     llm_cache.set(key, generated_content, ttl=3600)
+    """
+
+    def __init__(self, config=None):
+        """
+        初始化缓存
+        """
+        self.config = config or LLM_CACHE_CONFIG
+        self.max_entries = self.config["max_entries"]
+        self.disk_path = self.config["disk_path"]
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "disk_hits": 0, "misses": 0, "bypasses": 0, "sets": 0, "evictions": 0}
+
+        if self.disk_path:
+            os.makedirs(self.disk_path, exist_ok=True)
+
+    @staticmethod
+    def make_key(model, messages, temperature, max_tokens):
+        """
+        根据请求参数生成缓存键
+
+        Returns:
+            str: 请求内容的sha256十六进制摘要
+        """
+        payload = json.dumps({
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens
+        }, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _disk_file(self, key):
+        """磁盘层文件路径，按键前两位分目录避免单目录文件过多"""
+        return os.path.join(self.disk_path, key[:2], f"{key}.json")
+
+    def _read_disk(self, key):
+        """读取磁盘层条目，不存在或已过期时返回None"""
+        file_path = self._disk_file(key)
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+        if entry["expires_at"] <= time.time():
+            try:
+                os.remove(file_path)
+            except OSError:
+                pass
+            return None
+        return entry
+
+    def _write_disk(self, key, value, expires_at):
+        """写入磁盘层条目，先写临时文件再原子替换"""
+        file_path = self._disk_file(key)
+        try:
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            temp_path = f"{file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump({"expires_at": expires_at, "value": value}, f, ensure_ascii=False)
+            os.replace(temp_path, file_path)
+        except OSError as e:
+            print(f"写入大模型磁盘缓存失败: {e}")
+
+    def _store(self, key, value, expires_at):
+        """写入进程内LRU，必要时淘汰最久未使用的条目（调用方需持有锁）"""
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def get(self, key):
+        """
+        查询缓存
+
+        Args:
+            key: make_key生成的缓存键
+
+        Returns:
+            str: 缓存的内容，未命中时返回None
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return entry[1]
+                del self._entries[key]
+
+        if self.disk_path:
+            entry = self._read_disk(key)
+            if entry is not None:
+                with self._lock:
+                    self._store(key, entry["value"], entry["expires_at"])
+                    self._stats["disk_hits"] += 1
+                return entry["value"]
+
+        with self._lock:
+            self._stats["misses"] += 1
+        return None
+
+    def set(self, key, value, ttl):
+        """
+        写入缓存
+
+        Args:
+            key: make_key生成的缓存键
+            value: 要缓存的内容
+            ttl: 过期时间（秒）
+        """
+        expires_at = time.time() + ttl
+        with self._lock:
+            self._store(key, value, expires_at)
+            self._stats["sets"] += 1
+
+        if self.disk_path:
+            self._write_disk(key, value, expires_at)
+
+    def record_bypass(self):
+        """记录一次调用方主动跳过缓存的请求"""
+        with self._lock:
+            self._stats["bypasses"] += 1
+
+    def get_stats(self):
+        """
+        获取缓存统计信息
+
+        Returns:
+            dict: 命中/未命中次数、命中率和当前条目数
+        """
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["disk_hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "hit_rate": (self._stats["hits"] + self._stats["disk_hits"]) / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "disk_enabled": bool(self.disk_path)
+            }
+
+
+# 进程级单例
+llm_cache = LLMCache()
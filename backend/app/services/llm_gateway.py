@@ -0,0 +1,474 @@
+"""
+DeepSeek大模型调用网关
+
+所有路由和服务对DeepSeek（OpenAI兼容协议）的调用都经过该模块，统一负责：
+- 复用调优过的HTTP连接池（keep-alive）
+- 每次调用的超时控制
+- 进程级并发信号量，防止上游变慢时工作线程无限堆积
+- 统一的耗时和token用量统计，并按用户、路由持久化到数据库（见usage_recorder）
+- 按路由配置TTL的响应缓存
+- 供ASGI入口使用的AsyncOpenAI异步调用
+- 多个互不依赖的调用并发执行
+- 重试、对冲请求和熔断（见llm_resilience）
+"""
+import time
+import asyncio
+import threading
+import httpx
+from concurrent.futures import ThreadPoolExecutor
+from flask import has_request_context, request
+from openai import OpenAI, AsyncOpenAI
+from config import DEEPSEEK_CONFIG, LLM_GATEWAY_CONFIG, LLM_CACHE_CONFIG
+from .llm_cache import LLMCache, llm_cache
+from .llm_resilience import LLMResilience
+from .usage_recorder import usage_recorder as default_usage_recorder, get_cached_tokens
+
+
+class LLMGatewayBusyError(Exception):
+    """并发槽位等待超时时抛出"""
+
+
+def current_user_id():
+    """当前请求的用户ID（由auth_required设置），不在请求上下文中时返回None"""
+    if has_request_context():
+        return getattr(request, "user_id", None)
+    return None
+
+
+class LLMCall:
+    """
+    一次大模型调用的描述
+
+    视图以 ``content = yield LLMCall(...)`` 的方式把调用交给驱动器执行，
+    WSGI下同步执行，ASGI入口下通过AsyncOpenAI异步执行。
+    ``a, b = yield [LLMCall(...), LLMCall(...)]`` 则并发执行多个互不依赖的调用。
+    参数同LLMGateway.complete，未指定user_id时取创建时所在请求的用户
+    """
+
+    def __init__(self, messages, route, user_id=None, **kwargs):
+        self.messages = messages
+        self.route = route
+        self.user_id = user_id or current_user_id()
+        self.kwargs = kwargs
+
+
+class LLMGateway:
+    """
+    DeepSeek调用网关
+
+    示例用法：
+    >>> content = llm_gateway.complete(
+    ...     messages=[{"role": "user", "content": "你好"}],
+    ...     route="self_intro.generate",
+    ...     max_tokens=512
+    ... )
+    """
+
+    def __init__(self, config=None, deepseek_config=None, cache=None, cache_config=None, resilience=None,
+                 usage_recorder=None):
+        """
+        初始化网关，创建连接池、OpenAI客户端和并发信号量
+        """
+        self.config = config or LLM_GATEWAY_CONFIG
+        self.deepseek_config = deepseek_config or DEEPSEEK_CONFIG
+        self.model = self.deepseek_config["model"]
+        self.cache = cache or llm_cache
+        self.cache_config = cache_config or LLM_CACHE_CONFIG
+        self.resilience = resilience or LLMResilience()
+        self.usage_recorder = usage_recorder or default_usage_recorder
+
+        # 调优过的HTTP连接池，所有请求线程共享
+        self.http_client = httpx.Client(
+            limits=httpx.Limits(
+                max_connections=self.config["max_connections"],
+                max_keepalive_connections=self.config["max_keepalive_connections"],
+                keepalive_expiry=self.config["keepalive_expiry"]
+            ),
+            timeout=self._build_timeout(self.config["read_timeout"])
+        )
+        self.client = OpenAI(
+            api_key=self.deepseek_config["api_key"],
+            base_url=self.deepseek_config["base_url"],
+            http_client=self.http_client,
+            max_retries=self.config["max_retries"]
+        )
+
+        # 进程级并发控制
+        self._semaphore = threading.BoundedSemaphore(self.config["max_concurrency"])
+        self._in_flight = 0
+
+        # 并发执行多个调用、后台调用使用的线程池，实际并发仍受上面的信号量限制
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.config["max_concurrency"],
+            thread_name_prefix="llm-call"
+        )
+
+        # 异步客户端绑定事件循环，在ASGI入口首次使用时创建
+        self._async_client = None
+        self._async_semaphore = None
+
+        # 按路由汇总的统计信息
+        self._stats_lock = threading.Lock()
+        self._stats = {}
+
+    def _build_timeout(self, read_timeout):
+        """根据读超时构建httpx超时对象，连接超时统一取配置值"""
+        return httpx.Timeout(
+            read_timeout,
+            connect=self.config["connect_timeout"]
+        )
+
+    def _acquire(self, route):
+        """获取一个并发槽位，等待超时则抛出LLMGatewayBusyError"""
+        if not self._semaphore.acquire(timeout=self.config["acquire_timeout"]):
+            print(f"[LLM LOG] route={route} - 等待并发槽位超时，当前并发: {self._in_flight}")
+            raise LLMGatewayBusyError("大模型调用繁忙，请稍后重试")
+        with self._stats_lock:
+            self._in_flight += 1
+
+    def _release(self):
+        """释放并发槽位"""
+        with self._stats_lock:
+            self._in_flight -= 1
+        self._semaphore.release()
+
+    def _report(self, route, model, latency, usage=None, error=None, first_token_latency=None, user_id=None):
+        """
+        记录一次上游调用的耗时和token用量
+
+        Args:
+            route: 调用来源路由标识
+            model: 使用的模型
+            latency: 耗时（秒）
+            usage: 响应中的usage对象，可能为None
+            error: 调用失败时的异常
+            first_token_latency: 流式调用的首token耗时（秒）
+            user_id: 发起调用的用户
+        """
+        prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+        completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+        cached_tokens = get_cached_tokens(usage)
+        self.usage_recorder.record(route, model, latency, usage=usage, error=error, user_id=user_id)
+
+        with self._stats_lock:
+            stats = self._stats.setdefault(route, {
+                "calls": 0,
+                "errors": 0,
+                "total_latency": 0.0,
+                "max_latency": 0.0,
+                "prompt_tokens": 0,
+                "completion_tokens": 0,
+                "cached_tokens": 0,
+                "streams": 0,
+                "total_first_token_latency": 0.0
+            })
+            stats["calls"] += 1
+            stats["total_latency"] += latency
+            stats["max_latency"] = max(stats["max_latency"], latency)
+            stats["prompt_tokens"] += prompt_tokens
+            stats["completion_tokens"] += completion_tokens
+            stats["cached_tokens"] += cached_tokens
+            if error is not None:
+                stats["errors"] += 1
+            if first_token_latency is not None:
+                stats["streams"] += 1
+                stats["total_first_token_latency"] += first_token_latency
+
+        ttft = f" ttft={first_token_latency * 1000:.0f}ms" if first_token_latency is not None else ""
+        if error is not None:
+            print(f"[LLM LOG] route={route} model={model} latency={latency * 1000:.0f}ms{ttft} error={error}")
+        else:
+            print(f"[LLM LOG] route={route} model={model} latency={latency * 1000:.0f}ms{ttft} "
+                  f"prompt_tokens={prompt_tokens} cached_tokens={cached_tokens} completion_tokens={completion_tokens}")
+
+    def chat_completion(self, messages, route, temperature=0.7, max_tokens=1024, timeout=None, model=None, user_id=None,
+                        **kwargs):
+        """
+        调用chat completions接口，返回原始响应对象
+
+        Args:
+            messages: 消息列表
+            route: 调用来源路由标识，用于统计
+            temperature: 采样温度
+            max_tokens: 最大输出token数
+            timeout: 本次调用的读超时（秒），默认使用配置值
+            model: 模型名称，默认使用DEEPSEEK_MODEL
+            user_id: 发起调用的用户，用于用量统计，默认取当前请求的用户
+
+        Returns:
+            ChatCompletion: OpenAI SDK响应对象
+        """
+        model = model or self.model
+        timeout = timeout or self.config["read_timeout"]
+        user_id = user_id or current_user_id()
+
+        self._acquire(route)
+        start_time = time.perf_counter()
+        try:
+            response = self.client.chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                timeout=self._build_timeout(timeout),
+                **kwargs
+            )
+        except Exception as e:
+            self._report(route, model, time.perf_counter() - start_time, error=e, user_id=user_id)
+            raise
+        finally:
+            self._release()
+
+        self._report(route, model, time.perf_counter() - start_time, response.usage, user_id=user_id)
+        return response
+
+    def _cache_lookup(self, messages, route, bypass_cache, kwargs):
+        """
+        查询响应缓存
+
+        Returns:
+            tuple: (缓存键, TTL, 缓存内容)，路由未启用缓存时返回 (None, None, None)
+        """
+        ttl = self.cache_config["route_ttl"].get(route) if self.cache_config["enabled"] else None
+        if not ttl:
+            return None, None, None
+
+        key = LLMCache.make_key(
+            kwargs.get("model") or self.model,
+            messages,
+            kwargs.get("temperature", 0.7),
+            kwargs.get("max_tokens", 1024)
+        )
+        if bypass_cache:
+            self.cache.record_bypass()
+            return key, ttl, None
+
+        content = self.cache.get(key)
+        if content is not None:
+            print(f"[LLM LOG] route={route} cache=hit")
+        return key, ttl, content
+
+    def complete(self, messages, route, bypass_cache=False, **kwargs):
+        """
+        调用chat completions接口，直接返回生成的文本内容
+
+        路由在LLM_CACHE_CONFIG["route_ttl"]中配置了TTL时，先查询响应缓存，
+        未命中再调用上游并写入缓存。上游调用带重试、对冲和熔断保护，
+        熔断期间抛出CircuitOpenError。
+
+        Args:
+            bypass_cache: 为True时跳过缓存读取，强制重新生成（结果仍会写入缓存）
+            其余参数同chat_completion
+        """
+        key, ttl, content = self._cache_lookup(messages, route, bypass_cache, kwargs)
+        if content is not None:
+            return content
+
+        response = self.resilience.call(lambda: self.chat_completion(messages, route, **kwargs), route)
+        content = response.choices[0].message.content
+        if key and content:
+            self.cache.set(key, content, ttl)
+        return content
+
+    def execute(self, call):
+        """同步执行一个LLMCall，返回生成的文本内容"""
+        return self.complete(call.messages, call.route, user_id=call.user_id, **call.kwargs)
+
+    def submit(self, call):
+        """
+        在后台线程中执行一个LLMCall
+
+        Returns:
+            Future: 结果为生成的文本内容
+        """
+        return self._executor.submit(self.execute, call)
+
+    def execute_all(self, calls):
+        """
+        并发执行多个LLMCall，按顺序返回生成的文本内容列表
+
+        第一个调用在当前线程执行，其余提交到线程池；任一调用失败时抛出异常。
+        """
+        futures = [self.submit(call) for call in calls[1:]]
+        first = self.execute(calls[0])
+        return [first] + [future.result() for future in futures]
+
+    def _get_async_client(self):
+        """获取异步客户端，首次调用时在当前事件循环中创建连接池和信号量"""
+        if self._async_client is None:
+            self._async_client = AsyncOpenAI(
+                api_key=self.deepseek_config["api_key"],
+                base_url=self.deepseek_config["base_url"],
+                http_client=httpx.AsyncClient(
+                    limits=httpx.Limits(
+                        max_connections=self.config["async_max_connections"],
+                        max_keepalive_connections=self.config["max_keepalive_connections"],
+                        keepalive_expiry=self.config["keepalive_expiry"]
+                    ),
+                    timeout=self._build_timeout(self.config["read_timeout"])
+                ),
+                max_retries=self.config["max_retries"]
+            )
+            self._async_semaphore = asyncio.Semaphore(self.config["async_max_concurrency"])
+        return self._async_client
+
+    async def achat_completion(self, messages, route, temperature=0.7, max_tokens=1024, timeout=None, model=None,
+                               user_id=None, **kwargs):
+        """
+        chat_completion的异步版本，等待上游期间不占用线程
+
+        参数同chat_completion
+        """
+        client = self._get_async_client()
+        model = model or self.model
+        timeout = timeout or self.config["read_timeout"]
+
+        try:
+            await asyncio.wait_for(self._async_semaphore.acquire(), self.config["acquire_timeout"])
+        except asyncio.TimeoutError:
+            print(f"[LLM LOG] route={route} - 等待异步并发槽位超时")
+            raise LLMGatewayBusyError("大模型调用繁忙，请稍后重试")
+        with self._stats_lock:
+            self._in_flight += 1
+
+        start_time = time.perf_counter()
+        try:
+            response = await client.chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                timeout=self._build_timeout(timeout),
+                **kwargs
+            )
+        except Exception as e:
+            self._report(route, model, time.perf_counter() - start_time, error=e, user_id=user_id)
+            raise
+        finally:
+            with self._stats_lock:
+                self._in_flight -= 1
+            self._async_semaphore.release()
+
+        self._report(route, model, time.perf_counter() - start_time, response.usage, user_id=user_id)
+        return response
+
+    async def acomplete(self, messages, route, bypass_cache=False, **kwargs):
+        """complete的异步版本，参数同complete"""
+        key, ttl, content = self._cache_lookup(messages, route, bypass_cache, kwargs)
+        if content is not None:
+            return content
+
+        response = await self.resilience.acall(lambda: self.achat_completion(messages, route, **kwargs), route)
+        content = response.choices[0].message.content
+        if key and content:
+            self.cache.set(key, content, ttl)
+        return content
+
+    async def aexecute(self, call):
+        """异步执行一个LLMCall，返回生成的文本内容"""
+        return await self.acomplete(call.messages, call.route, user_id=call.user_id, **call.kwargs)
+
+    async def aexecute_all(self, calls):
+        """execute_all的异步版本"""
+        return list(await asyncio.gather(*(self.aexecute(call) for call in calls)))
+
+    async def aclose(self):
+        """关闭异步客户端的连接池，在ASGI应用关闭时调用"""
+        if self._async_client is not None:
+            await self._async_client.close()
+            self._async_client = None
+            self._async_semaphore = None
+
+    def stream(self, messages, route, temperature=0.7, max_tokens=1024, timeout=None, model=None, user_id=None, **kwargs):
+        """
+        以流式方式调用chat completions接口，逐段返回生成的文本
+
+        并发槽位在整个流式读取期间保持占用，调用方提前关闭生成器时会及时释放。
+        已输出的内容无法撤回，因此流式调用不重试、不对冲，只受熔断器保护。
+        参数同chat_completion
+
+        Yields:
+            str: 本次收到的增量文本
+        """
+        model = model or self.model
+        timeout = timeout or self.config["read_timeout"]
+        user_id = user_id or current_user_id()
+
+        breaker = self.resilience.breaker
+        token = breaker.allow()
+        try:
+            self._acquire(route)
+        except Exception:
+            breaker.release(token)
+            raise
+        start_time = time.perf_counter()
+        first_token_latency = None
+        usage = None
+        response = None
+        try:
+            response = self.client.chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                timeout=self._build_timeout(timeout),
+                stream=True,
+                stream_options={"include_usage": True},
+                **kwargs
+            )
+            for chunk in response:
+                if chunk.usage:
+                    usage = chunk.usage
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    if first_token_latency is None:
+                        first_token_latency = time.perf_counter() - start_time
+                    yield delta
+            breaker.record(False, token)
+        except Exception as e:
+            breaker.record_error(e, token)
+            self._report(route, model, time.perf_counter() - start_time, error=e,
+                         first_token_latency=first_token_latency, user_id=user_id)
+            raise
+        finally:
+            if response is not None:
+                response.close()
+            self._release()
+            # 调用方提前关闭生成器时交还探测令牌（已记录结果时不做任何事）
+            breaker.release(token)
+
+        self._report(route, model, time.perf_counter() - start_time, usage,
+                     first_token_latency=first_token_latency, user_id=user_id)
+
+    def get_stats(self):
+        """
+        获取网关统计信息
+
+        Returns:
+            dict: 当前并发数以及按路由汇总的调用次数、错误数、平均/最大耗时、token用量和前缀缓存命中率
+        """
+        with self._stats_lock:
+            routes = {}
+            for route, stats in self._stats.items():
+                routes[route] = {
+                    **stats,
+                    "avg_latency": stats["total_latency"] / stats["calls"] if stats["calls"] else 0.0,
+                    "avg_first_token_latency": stats["total_first_token_latency"] / stats["streams"] if stats["streams"] else 0.0,
+                    "cache_hit_rate": stats["cached_tokens"] / stats["prompt_tokens"] if stats["prompt_tokens"] else 0.0
+                }
+            prompt_tokens = sum(stats["prompt_tokens"] for stats in self._stats.values())
+            cached_tokens = sum(stats["cached_tokens"] for stats in self._stats.values())
+            return {
+                "in_flight": self._in_flight,
+                "max_concurrency": self.config["max_concurrency"],
+                # 全部路由合计的上游前缀缓存命中率（命中缓存的prompt token占比）
+                "cache_hit_rate": cached_tokens / prompt_tokens if prompt_tokens else 0.0,
+                "routes": routes,
+                "resilience": self.resilience.get_stats()
+            }
+
+
+# 进程级单例，所有蓝图共享同一个连接池和并发信号量
+llm_gateway = LLMGateway()
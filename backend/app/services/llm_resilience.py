@@ -0,0 +1,375 @@
+"""
+大模型调用容错
+
+为LLMGateway提供三层保护：
+- 有上限的指数退避重试，只重试连接错误、超时、限流和5xx等上游问题
+- 对冲请求：调用耗时超过该路由近期延迟的p95仍未返回时，再发起一个相同的请求，取先成功的结果
+- 熔断器：上游错误率飙升时直接抛出CircuitOpenError，调用方立即走已有的降级逻辑，不再排队等待超时
+"""
+import time
+import random
+import asyncio
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import openai
+from config import LLM_RESILIENCE_CONFIG
+
+
+class CircuitOpenError(Exception):
+    """熔断器打开期间调用上游时抛出"""
+
+
+# 视为上游故障的异常：重试、并计入熔断器错误率（APITimeoutError是APIConnectionError的子类）
+UPSTREAM_ERRORS = (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError)
+
+
+def is_upstream_error(error):
+    """判断异常是否属于上游故障（请求参数错误、本地并发繁忙等不算）"""
+    return isinstance(error, UPSTREAM_ERRORS)
+
+
+def upstream_outcome(error):
+    """
+    异常对应的上游调用结果
+
+    Returns:
+        bool: True表示上游故障（连接错误、超时、限流、5xx），False表示上游正常返回了响应（如4xx参数错误），
+              None表示请求没有到达上游（本地并发繁忙、熔断、解析错误等），不应计入熔断器
+    """
+    if is_upstream_error(error):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return False
+    return None
+
+
+class CircuitBreaker:
+    """
+    基于滑动时间窗口错误率的熔断器
+
+    - closed：正常放行，窗口内请求数达到下限且错误率超过阈值时打开
+    - open：直接拒绝，持续open_seconds秒
+    - half_open：放行一个探测请求，成功则关闭，失败则重新打开
+
+    allow()在半开状态下返回探测令牌，只有带着当前令牌的结果（即探测请求自己的结果）才会改变熔断状态；
+    熔断期间其他请求（包括打开前已发出的请求）的结果一律忽略。
+    """
+
+    def __init__(self, config):
+        self.window = config["breaker_window"]
+        self.min_requests = config["breaker_min_requests"]
+        self.error_rate = config["breaker_error_rate"]
+        self.open_seconds = config["breaker_open_seconds"]
+
+        self._lock = threading.Lock()
+        self._events = deque()  # (时间, 是否失败)
+        self._opened_at = None
+        self._probe = None  # 当前探测请求的令牌
+        self._probe_started = None
+        self._probe_seq = 0
+        self._stats = {"opened": 0, "rejected": 0}
+
+    def _state(self, now):
+        """当前状态（调用方需持有锁）"""
+        if self._opened_at is None:
+            return "closed"
+        if now - self._opened_at < self.open_seconds:
+            return "open"
+        return "half_open"
+
+    def allow(self):
+        """
+        请求上游前调用，熔断期间抛出CircuitOpenError
+
+        Returns:
+            int: 半开状态下放行的探测令牌，调用结果需带着该令牌记录；关闭状态下返回None
+        """
+        now = time.monotonic()
+        with self._lock:
+            state = self._state(now)
+            if state == "closed":
+                return None
+            # 半开状态只放行一个探测请求；探测请求长时间没有结果（如被调用方中断）时允许重新探测
+            if state == "half_open" and (self._probe is None or now - self._probe_started > self.open_seconds):
+                self._probe_seq += 1
+                self._probe = self._probe_seq
+                self._probe_started = now
+                return self._probe
+            self._stats["rejected"] += 1
+        raise CircuitOpenError("大模型服务暂时不可用，请稍后重试")
+
+    def release(self, token):
+        """请求没有到达上游（本地繁忙、调用方中断等）时交还探测令牌，不改变熔断状态"""
+        if token is None:
+            return
+        with self._lock:
+            if self._probe == token:
+                self._probe = None
+                self._probe_started = None
+
+    def record_error(self, error, token=None):
+        """记录一次失败的调用：上游故障计为失败，上游返回的错误响应计为成功，未到达上游的异常不计入"""
+        outcome = upstream_outcome(error)
+        if outcome is None:
+            self.release(token)
+        else:
+            self.record(outcome, token)
+
+    def record(self, failed, token=None):
+        """
+        记录一次上游调用结果
+
+        Args:
+            failed: 是否为上游故障
+            token: allow()返回的探测令牌
+        """
+        now = time.monotonic()
+        with self._lock:
+            if self._opened_at is not None:
+                # 只有当前探测请求自己的结果会改变状态，其他请求（包括打开前已发出的请求）的结果忽略
+                if token is None or token != self._probe:
+                    return
+                self._probe = None
+                self._probe_started = None
+                if failed:
+                    self._opened_at = now
+                    print("[LLM LOG] 熔断器探测失败，继续熔断")
+                else:
+                    self._opened_at = None
+                    self._events.clear()
+                    print("[LLM LOG] 熔断器探测成功，恢复调用上游")
+                return
+
+            self._events.append((now, failed))
+            while self._events and now - self._events[0][0] > self.window:
+                self._events.popleft()
+
+            total = len(self._events)
+            errors = sum(1 for _, is_failed in self._events if is_failed)
+            if total >= self.min_requests and errors / total >= self.error_rate:
+                self._opened_at = now
+                self._stats["opened"] += 1
+                print(f"[LLM LOG] 上游错误率过高（{errors}/{total}），熔断{self.open_seconds}秒")
+
+    def get_stats(self):
+        """获取熔断器状态和统计信息"""
+        now = time.monotonic()
+        with self._lock:
+            total = len(self._events)
+            errors = sum(1 for _, is_failed in self._events if is_failed)
+            return {
+                **self._stats,
+                "state": self._state(now),
+                "window_requests": total,
+                "window_error_rate": errors / total if total else 0.0
+            }
+
+
+class LatencyTracker:
+    """按路由保存最近若干次成功调用的耗时，用于计算对冲阈值"""
+
+    def __init__(self, size):
+        self.size = size
+        self._lock = threading.Lock()
+        self._samples = {}
+
+    def add(self, route, latency):
+        """记录一次成功调用的耗时（秒）"""
+        with self._lock:
+            self._samples.setdefault(route, deque(maxlen=self.size)).append(latency)
+
+    def percentile(self, route, percent, min_samples):
+        """
+        计算路由近期耗时的百分位数
+
+        Returns:
+            float: 耗时（秒），样本不足时返回None
+        """
+        with self._lock:
+            samples = sorted(self._samples.get(route, ()))
+        if len(samples) < min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * percent))]
+
+
+class LLMResilience:
+    """
+    重试、对冲和熔断的组合
+
+    示例用法：
+    >>> response = resilience.call(lambda: gateway.chat_completion(messages, route), route)
+    >>> response = await resilience.acall(lambda: gateway.achat_completion(messages, route), route)
+    """
+
+    def __init__(self, config=None):
+        self.config = config or LLM_RESILIENCE_CONFIG
+        self.breaker = CircuitBreaker(self.config)
+        self.latency = LatencyTracker(self.config["hedge_sample_size"])
+
+        # 同步对冲时主请求和对冲请求都在独立线程池中执行，避免与网关线程池互相等待
+        self._hedge_executor = None
+        if self.config["hedge_enabled"]:
+            self._hedge_executor = ThreadPoolExecutor(
+                max_workers=self.config["hedge_workers"],
+                thread_name_prefix="llm-hedge"
+            )
+
+        self._stats_lock = threading.Lock()
+        self._stats = {"retries": 0, "hedges": 0, "hedge_wins": 0}
+
+    def _count(self, name):
+        with self._stats_lock:
+            self._stats[name] += 1
+
+    def _backoff(self, attempt):
+        """第attempt次重试前的等待时间（秒），指数增长并带随机抖动"""
+        delay = min(self.config["backoff_max"], self.config["backoff_base"] * (2 ** attempt))
+        return delay * random.uniform(0.5, 1.0)
+
+    def hedge_delay(self, route):
+        """
+        对冲阈值：路由近期耗时的p95（不低于hedge_min_delay）
+
+        Returns:
+            float: 秒数，未开启对冲或样本不足时返回None
+        """
+        if not self.config["hedge_enabled"]:
+            return None
+        threshold = self.latency.percentile(route, self.config["hedge_percentile"], self.config["hedge_min_samples"])
+        if threshold is None:
+            return None
+        return max(threshold, self.config["hedge_min_delay"])
+
+    def _on_failure(self, route, attempt, error, token):
+        """
+        记录失败并决定是否重试
+
+        Returns:
+            float: 重试前的等待时间，不应重试时返回None
+        """
+        self.breaker.record_error(error, token)
+        if not is_upstream_error(error) or attempt + 1 >= self.config["max_attempts"]:
+            return None
+        delay = self._backoff(attempt)
+        self._count("retries")
+        print(f"[LLM LOG] route={route} - 第{attempt + 1}次调用失败，{delay:.1f}秒后重试: {error}")
+        return delay
+
+    def _on_success(self, route, latency, token):
+        self.breaker.record(False, token)
+        self.latency.add(route, latency)
+
+    def call(self, func, route):
+        """
+        同步执行一次上游调用
+
+        Args:
+            func: 无参函数，执行一次上游请求并返回结果
+            route: 调用来源路由标识
+
+        Raises:
+            CircuitOpenError: 熔断期间直接抛出
+        """
+        attempt = 0
+        while True:
+            token = self.breaker.allow()
+            start_time = time.perf_counter()
+            try:
+                result = self._hedged(func, route)
+            except Exception as e:
+                delay = self._on_failure(route, attempt, e, token)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                attempt += 1
+                continue
+            self._on_success(route, time.perf_counter() - start_time, token)
+            return result
+
+    def _hedged(self, func, route):
+        """超过对冲阈值仍未返回时发起对冲请求，返回先成功的结果（落后的请求结果被丢弃）"""
+        delay = self.hedge_delay(route)
+        if delay is None:
+            return func()
+
+        primary = self._hedge_executor.submit(func)
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+
+        print(f"[LLM LOG] route={route} - 超过{delay:.1f}秒未返回，发起对冲请求")
+        self._count("hedges")
+        hedge = self._hedge_executor.submit(func)
+        pending = {primary, hedge}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        self._count("hedge_wins")
+                    return future.result()
+        raise primary.exception()
+
+    async def acall(self, func, route):
+        """
+        call的异步版本
+
+        Args:
+            func: 无参函数，返回执行一次上游请求的协程
+        """
+        attempt = 0
+        while True:
+            token = self.breaker.allow()
+            start_time = time.perf_counter()
+            try:
+                result = await self._ahedged(func, route)
+            except Exception as e:
+                delay = self._on_failure(route, attempt, e, token)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            self._on_success(route, time.perf_counter() - start_time, token)
+            return result
+
+    async def _ahedged(self, func, route):
+        """_hedged的异步版本，先成功的结果返回后取消落后的请求"""
+        delay = self.hedge_delay(route)
+        if delay is None:
+            return await func()
+
+        primary = asyncio.ensure_future(func())
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done:
+            return primary.result()
+
+        print(f"[LLM LOG] route={route} - 超过{delay:.1f}秒未返回，发起对冲请求")
+        self._count("hedges")
+        hedge = asyncio.ensure_future(func())
+        pending = {primary, hedge}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self._count("hedge_wins")
+                        return task.result()
+            raise primary.exception()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def get_stats(self):
+        """
+        获取容错统计信息
+
+        Returns:
+            dict: 重试次数、对冲次数/胜出次数和熔断器状态
+        """
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["circuit_breaker"] = self.breaker.get_stats()
+        return stats
@@ -0,0 +1,183 @@
+"""
+面试报告生成的后台任务队列
+
+结束面试时只登记任务并立即返回任务ID，报告由独立的线程池生成，前端通过任务ID轮询（支持长轮询）结果。
+报告生成的并发数由workers单独限制，不占用Web工作线程，也不会挤占面试过程中逐题提问的调用；
+排队任务超过max_pending时拒绝新任务。
+
+任务状态保存在与会话存储相同类型的后端中，但使用独立的命名空间（单独的SQLite文件或Redis键前缀）和过期时间，
+不计入存活会话数，多进程或多节点部署时任意进程都能查询到任务结果。
+
+长轮询期间会占用一个Web工作线程，因此单次等待时间限制在max_wait秒以内，客户端未拿到结果时再次查询。
+"""
+import math
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from config import REPORT_JOB_CONFIG, SESSION_STORE_CONFIG
+from .session_store import create_session_store, SessionNotFoundError
+
+
+def create_report_job_store(config=None):
+    """创建报告任务使用的存储：后端与会话存储相同，命名空间和过期时间独立"""
+    config = config or REPORT_JOB_CONFIG
+    return create_session_store(dict(
+        SESSION_STORE_CONFIG,
+        ttl=config["ttl"],
+        sqlite_path=config["sqlite_path"],
+        key_prefix=config["key_prefix"]
+    ))
+
+
+class ReportQueueFullError(Exception):
+    """排队的报告任务过多"""
+
+
+class ReportJobQueue:
+    """
+    报告生成任务队列
+
+    示例用法：
+    >>> report_jobs.init_app(app)
+    >>> job_id = report_jobs.submit(user_id, generate_report, session, user_id)
+    >>> job = report_jobs.get(job_id, user_id, wait=20)
+    """
+
+    def __init__(self, config=None, store=None):
+        self.config = config or REPORT_JOB_CONFIG
+        self.store = store or create_report_job_store(self.config)
+        self.app = None
+        self._executor = ThreadPoolExecutor(max_workers=self.config["workers"], thread_name_prefix="report-job")
+        self._lock = threading.Lock()
+        self._events = {}  # 本进程提交的任务ID -> 完成事件，长轮询时无需反复读取存储
+        self._stats = {"submitted": 0, "completed": 0, "failed": 0, "rejected": 0, "queued": 0, "running": 0}
+
+    def init_app(self, app):
+        """绑定Flask应用，任务在应用上下文中执行（需要访问数据库），并启动过期任务的清理线程"""
+        self.app = app
+        self.store.start_sweeper()
+
+    def _count(self, name, value=1):
+        with self._lock:
+            self._stats[name] += value
+
+    def submit(self, owner, fn, *args):
+        """
+        提交报告生成任务
+
+        Args:
+            owner: 任务所属用户ID，查询时校验
+            fn: 生成报告的函数，返回报告字典
+            *args: 传给fn的参数
+
+        Returns:
+            str: 任务ID
+
+        Raises:
+            ReportQueueFullError: 排队的任务数达到max_pending
+        """
+        with self._lock:
+            if self._stats["queued"] >= self.config["max_pending"]:
+                self._stats["rejected"] += 1
+                raise ReportQueueFullError("面试报告生成繁忙，请稍后重试")
+            self._stats["queued"] += 1
+            self._stats["submitted"] += 1
+
+        job_id = uuid.uuid4().hex
+        try:
+            self.store.create(job_id, {
+                "status": "pending",
+                "owner": str(owner),
+                "created_at": time.time(),
+                "report": None
+            })
+        except Exception:
+            self._count("queued", -1)
+            raise
+        event = threading.Event()
+        with self._lock:
+            self._events[job_id] = event
+        self._executor.submit(self._run, job_id, event, fn, args)
+        return job_id
+
+    def _run(self, job_id, event, fn, args):
+        """在线程池中执行任务并保存结果"""
+        self._count("queued", -1)
+        self._count("running")
+        started = time.time()
+        try:
+            if self.app is not None:
+                with self.app.app_context():
+                    report = fn(*args)
+            else:
+                report = fn(*args)
+            status = "done"
+            self._count("completed")
+        except Exception as e:
+            print(f"生成面试报告任务失败: {e}")
+            report = None
+            status = "failed"
+            self._count("failed")
+        finally:
+            self._count("running", -1)
+
+        def apply(job):
+            job["status"] = status
+            job["report"] = report
+            job["finished_at"] = time.time()
+
+        try:
+            self.store.update(job_id, apply)
+        except SessionNotFoundError:
+            print(f"面试报告任务已过期，结果未保存: {job_id}")
+        finally:
+            with self._lock:
+                self._events.pop(job_id, None)
+            event.set()
+        print(f"[API LOG] 面试报告任务{job_id}{'完成' if status == 'done' else '失败'}，耗时{time.time() - started:.2f}秒")
+
+    def get(self, job_id, owner, wait=0):
+        """
+        查询任务状态，任务未完成时最多等待wait秒（长轮询）
+
+        Args:
+            job_id: 任务ID
+            owner: 查询者的用户ID，与任务所属用户不一致时视为不存在
+            wait: 最长等待秒数，不超过max_wait；负数、NaN和无穷大按0处理
+
+        Returns:
+            dict: {"jobId", "status": pending/done/failed, "report"}，任务不存在时返回None
+        """
+        if not math.isfinite(wait):
+            wait = 0
+        deadline = time.time() + min(max(wait, 0), self.config["max_wait"])
+        while True:
+            job = self.store.get(job_id)
+            if job is None or job.get("owner") != str(owner):
+                return None
+            remaining = deadline - time.time()
+            if job["status"] != "pending" or remaining <= 0:
+                return {"jobId": job_id, "status": job["status"], "report": job["report"]}
+            with self._lock:
+                event = self._events.get(job_id)
+            if event is not None:
+                event.wait(remaining)
+            else:
+                # 任务由其他进程执行，按间隔读取存储
+                time.sleep(min(self.config["poll_interval"], remaining))
+
+    def get_stats(self):
+        """
+        获取任务队列统计信息
+
+        Returns:
+            dict: 线程数、排队和执行中的任务数、存储中未过期的任务数，以及提交、完成、失败和拒绝的次数
+        """
+        live_jobs, _ = self.store.gauge()
+        with self._lock:
+            return {"workers": self.config["workers"], "live_jobs": live_jobs, **self._stats}
+
+
+# 进程级单例
+report_jobs = ReportJobQueue()
@@ -0,0 +1,103 @@
+"""
+面试会话共享的简历缓存
+
+会话中只保存简历ID和内容摘要，简历内容按摘要缓存在进程内LRU中，同一份简历的多场面试共用一个字符串；
+缓存未命中（如被淘汰，或会话由其他进程创建）时按简历ID重新读取。
+"""
+import sys
+import hashlib
+import threading
+from collections import OrderedDict
+from config import SESSION_STORE_CONFIG
+from .file_service import get_resume_content
+
+
+class ResumeCache:
+    """
+    按内容摘要缓存简历内容
+
+    示例用法：
+    >>> resume_key = resume_cache.put(resume_content)
+    >>> resume_content = resume_cache.get(resume_key, resume_id)
+    """
+
+    def __init__(self, max_entries=None):
+        self.max_entries = max_entries or SESSION_STORE_CONFIG["resume_cache_entries"]
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "reloads_changed": 0, "reloads_missing": 0}
+
+    @staticmethod
+    def make_key(resume_content):
+        """简历内容的摘要"""
+        return hashlib.sha256(resume_content.encode("utf-8")).hexdigest()[:32]
+
+    def _store(self, key, resume_content):
+        """写入缓存（调用方需持有锁），超过容量时淘汰最久未使用的简历"""
+        self._entries[key] = resume_content
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def put(self, resume_content):
+        """
+        缓存简历内容
+
+        Returns:
+            str: 简历内容摘要，保存到会话中
+        """
+        key = self.make_key(resume_content)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            else:
+                self._store(key, resume_content)
+        return key
+
+    def get(self, key, resume_id):
+        """
+        按摘要取出简历内容，未命中时按简历ID重新读取
+
+        面试过程中简历被修改时读到的内容与摘要不一致，此时使用新内容（并计入reloads_changed），
+        新内容按其自身的摘要缓存，不影响引用原摘要的其他会话；简历已被删除时返回空字符串，不写入缓存
+
+        Returns:
+            str: 简历内容
+        """
+        with self._lock:
+            resume_content = self._entries.get(key)
+            if resume_content is not None:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return resume_content
+            self._stats["misses"] += 1
+
+        resume_content = get_resume_content(resume_id, 'optimized')
+        if not resume_content:
+            with self._lock:
+                self._stats["reloads_missing"] += 1
+            return ""
+        reloaded_key = self.make_key(resume_content)
+        with self._lock:
+            if reloaded_key != key:
+                self._stats["reloads_changed"] += 1
+            self._store(reloaded_key, resume_content)
+        return resume_content
+
+    def get_stats(self):
+        """
+        获取缓存统计信息
+
+        Returns:
+            dict: 条目数、占用字节数（估算）、命中/未命中次数，以及重新读取时简历已修改或已删除的次数
+        """
+        with self._lock:
+            return {
+                **self._stats,
+                "entries": len(self._entries),
+                "bytes": sum(sys.getsizeof(content) for content in self._entries.values())
+            }
+
+
+# 进程级单例
+resume_cache = ResumeCache()
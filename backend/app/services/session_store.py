@@ -0,0 +1,617 @@
+"""
+模拟面试会话存储
+
+会话分为两部分保存：
+- 会话信息（风格、简历、当前问题序号、摘要等），整体读写
+- 问答记录，每轮一条，只追加或更新发生变化的那一条，不重写整个会话
+
+写操作按会话原子执行：update/update_turn传入的函数在锁或事务内作用于最新数据，
+多个worker进程或多个节点共享同一后端时不会互相覆盖。每次写入刷新过期时间，超过ttl秒没有写入的会话自动过期，
+后台清理线程定期删除过期会话，中途放弃的面试不会一直占用内存或磁盘。
+
+后端由SESSION_STORE_CONFIG['backend']选择：
+- memory：进程内字典，只适用于单进程部署
+- sqlite：本机SQLite文件，同一台机器上的多个worker进程共享
+- redis：Redis协议服务（Redis/Valkey/KeyDB等），多节点共享，需要安装redis客户端
+"""
+import os
+import sys
+import copy
+import json
+import time
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from config import SESSION_STORE_CONFIG
+
+
+class SessionNotFoundError(KeyError):
+    """会话不存在或已过期"""
+
+
+def _dumps(value):
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+def _loads(text):
+    return json.loads(text)
+
+
+def _split(session):
+    """拆分出会话信息和问答记录"""
+    meta = {key: value for key, value in session.items() if key != "question_answers"}
+    return meta, session.get("question_answers") or []
+
+
+class SessionStore(ABC):
+    """
+    会话存储的公共接口
+
+    示例用法：
+    >>> session_store.create(interview_id, session)
+    >>> session = session_store.get(interview_id)
+    >>> index = session_store.append_turn(interview_id, {"question": "...", "answer": "..."})
+    >>> session_store.update_turn(interview_id, index, lambda turn: turn.update(feedback="..."))
+    >>> session_store.update(interview_id, lambda meta: meta.update(current_question_id=2))
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.ttl = config["ttl"]
+        self._sweeper = None
+        self._stats_lock = threading.Lock()
+        self._stats = {"created": 0, "updates": 0, "turn_writes": 0, "deleted": 0, "expired": 0, "conflicts": 0}
+
+    def _count(self, name, value=1):
+        with self._stats_lock:
+            self._stats[name] += value
+
+    @abstractmethod
+    def create(self, session_id, session):
+        """保存新会话，已存在时覆盖"""
+
+    @abstractmethod
+    def get(self, session_id):
+        """
+        读取会话快照
+
+        Returns:
+            dict: 会话信息，question_answers为全部问答记录；会话不存在或已过期时返回None
+        """
+
+    @abstractmethod
+    def update(self, session_id, fn):
+        """
+        原子地修改会话信息
+
+        Args:
+            fn: 接收会话信息（不含question_answers）并原地修改的函数，其返回值作为update的返回值
+
+        Raises:
+            SessionNotFoundError: 会话不存在或已过期
+        """
+
+    @abstractmethod
+    def append_turn(self, session_id, turn):
+        """
+        追加一条问答记录，只写入这一条
+
+        Returns:
+            int: 该记录在question_answers中的序号
+
+        Raises:
+            SessionNotFoundError: 会话不存在或已过期
+        """
+
+    @abstractmethod
+    def update_turn(self, session_id, index, fn):
+        """
+        原子地修改一条问答记录，只写入这一条
+
+        Args:
+            fn: 接收问答记录并原地修改的函数，其返回值作为update_turn的返回值
+
+        Raises:
+            SessionNotFoundError: 会话或记录不存在
+        """
+
+    @abstractmethod
+    def delete(self, session_id):
+        """删除会话，返回会话是否存在"""
+
+    @abstractmethod
+    def purge_expired(self):
+        """删除所有已过期的会话，返回删除的数量"""
+
+    @abstractmethod
+    def gauge(self):
+        """
+        当前存活的会话数和占用的字节数（估算）
+
+        Returns:
+            tuple: (会话数, 字节数)
+        """
+
+    def start_sweeper(self):
+        """启动后台清理线程，每隔sweep_interval秒删除过期会话"""
+        if self._sweeper is not None or self.config["sweep_interval"] <= 0:
+            return
+        self._sweeper = threading.Thread(target=self._sweep, name="session-sweeper", daemon=True)
+        self._sweeper.start()
+
+    def _sweep(self):
+        while True:
+            time.sleep(self.config["sweep_interval"])
+            try:
+                purged = self.purge_expired()
+                if purged:
+                    print(f"[API LOG] 已清理{purged}个过期的面试会话")
+            except Exception as e:
+                print(f"清理过期面试会话失败: {e}")
+
+    def get_stats(self):
+        """
+        获取会话存储统计信息
+
+        Returns:
+            dict: 后端类型，存活会话数和字节数，以及创建、更新、问答写入、删除、过期和写冲突重试的次数
+        """
+        live_sessions, live_bytes = self.gauge()
+        with self._stats_lock:
+            return {"backend": self.config["backend"], "live_sessions": live_sessions, "live_bytes": live_bytes, **self._stats}
+
+
+class Turn:
+    """
+    内存后端中的一条问答记录
+
+    使用__slots__保存常用字段，比每条记录一个字典更省内存；其他字段放在extra中
+    """
+
+    __slots__ = ("question_id", "question", "answer", "feedback", "feedback_status", "evaluation", "evaluation_status", "extra")
+    FIELDS = __slots__[:-1]
+
+    def __init__(self, data):
+        data = dict(data)
+        for field in self.FIELDS:
+            setattr(self, field, data.pop(field, None))
+        self.extra = copy.deepcopy(data) if data else None
+
+    def to_dict(self):
+        data = {field: getattr(self, field) for field in self.FIELDS}
+        if self.extra:
+            data.update(copy.deepcopy(self.extra))
+        return data
+
+    def size(self):
+        """估算占用的字节数"""
+        return sys.getsizeof(self) + sum(sys.getsizeof(getattr(self, field)) for field in self.FIELDS) + \
+            (len(_dumps(self.extra)) if self.extra else 0)
+
+
+class _MemorySession:
+    """内存后端中的一个会话：会话信息为序列化后的文本，问答记录为Turn列表"""
+
+    __slots__ = ("meta", "turns", "expires_at")
+
+    def __init__(self, meta, turns, expires_at):
+        self.meta = meta
+        self.turns = turns
+        self.expires_at = expires_at
+
+    def size(self):
+        return sys.getsizeof(self) + sys.getsizeof(self.meta) + sys.getsizeof(self.turns) + sum(turn.size() for turn in self.turns)
+
+
+class MemorySessionStore(SessionStore):
+    """进程内会话存储，读写时复制数据，与共享后端的语义一致（调用方修改读到的快照不会影响存储）"""
+
+    def __init__(self, config):
+        super().__init__(config)
+        self._lock = threading.Lock()
+        self._sessions = {}
+
+    def _record(self, session_id, now):
+        """取出未过期的会话（调用方需持有锁），过期的会话顺便删除"""
+        record = self._sessions.get(session_id)
+        if record is not None and record.expires_at <= now:
+            del self._sessions[session_id]
+            self._count("expired")
+            return None
+        return record
+
+    def _require(self, session_id, now):
+        record = self._record(session_id, now)
+        if record is None:
+            raise SessionNotFoundError(session_id)
+        record.expires_at = now + self.ttl
+        return record
+
+    def create(self, session_id, session):
+        meta, turns = _split(session)
+        record = _MemorySession(_dumps(meta), [Turn(turn) for turn in turns], time.time() + self.ttl)
+        with self._lock:
+            self._sessions[session_id] = record
+        self._count("created")
+
+    def get(self, session_id):
+        with self._lock:
+            record = self._record(session_id, time.time())
+            if record is None:
+                return None
+            session = _loads(record.meta)
+            session["question_answers"] = [turn.to_dict() for turn in record.turns]
+        return session
+
+    def update(self, session_id, fn):
+        with self._lock:
+            record = self._require(session_id, time.time())
+            meta = _loads(record.meta)
+            result = fn(meta)
+            record.meta = _dumps(meta)
+        self._count("updates")
+        return result
+
+    def append_turn(self, session_id, turn):
+        turn = Turn(turn)
+        with self._lock:
+            record = self._require(session_id, time.time())
+            record.turns.append(turn)
+            index = len(record.turns) - 1
+        self._count("turn_writes")
+        return index
+
+    def update_turn(self, session_id, index, fn):
+        with self._lock:
+            record = self._require(session_id, time.time())
+            if not 0 <= index < len(record.turns):
+                raise SessionNotFoundError(f"{session_id}[{index}]")
+            turn = record.turns[index].to_dict()
+            result = fn(turn)
+            record.turns[index] = Turn(turn)
+        self._count("turn_writes")
+        return result
+
+    def delete(self, session_id):
+        with self._lock:
+            existed = self._sessions.pop(session_id, None) is not None
+        if existed:
+            self._count("deleted")
+        return existed
+
+    def purge_expired(self):
+        now = time.time()
+        with self._lock:
+            expired = [session_id for session_id, record in self._sessions.items() if record.expires_at <= now]
+            for session_id in expired:
+                del self._sessions[session_id]
+        if expired:
+            self._count("expired", len(expired))
+        return len(expired)
+
+    def gauge(self):
+        with self._lock:
+            return len(self._sessions), sum(record.size() for record in self._sessions.values())
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    基于本机SQLite文件的会话存储
+
+    每个线程使用独立连接，写操作在BEGIN IMMEDIATE事务中执行，同一台机器上的多个进程之间也是原子的。
+    """
+
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS interview_sessions ("
+        " session_id TEXT PRIMARY KEY, data TEXT NOT NULL, expires_at REAL NOT NULL)",
+        "CREATE TABLE IF NOT EXISTS interview_session_turns ("
+        " session_id TEXT NOT NULL, turn_index INTEGER NOT NULL, data TEXT NOT NULL,"
+        " PRIMARY KEY (session_id, turn_index))",
+        "CREATE INDEX IF NOT EXISTS idx_interview_sessions_expires_at ON interview_sessions (expires_at)"
+    )
+
+    def __init__(self, config):
+        super().__init__(config)
+        self.path = config["sqlite_path"]
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        conn = self._conn()
+        for statement in self.SCHEMA:
+            conn.execute(statement)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self, write=True):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE" if write else "BEGIN")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _delete(self, conn, session_id):
+        conn.execute("DELETE FROM interview_session_turns WHERE session_id = ?", (session_id,))
+        return conn.execute("DELETE FROM interview_sessions WHERE session_id = ?", (session_id,)).rowcount > 0
+
+    def _meta(self, conn, session_id, now, purge=False):
+        """读取未过期的会话信息，purge为True（写事务中）时顺便删除已过期的会话"""
+        row = conn.execute("SELECT data, expires_at FROM interview_sessions WHERE session_id = ?", (session_id,)).fetchone()
+        if row is None:
+            return None
+        if row[1] <= now:
+            if purge:
+                self._delete(conn, session_id)
+                self._count("expired")
+            return None
+        return row[0]
+
+    def _require(self, conn, session_id, now):
+        """在写事务中读取会话信息并刷新过期时间"""
+        data = self._meta(conn, session_id, now, purge=True)
+        if data is None:
+            raise SessionNotFoundError(session_id)
+        conn.execute("UPDATE interview_sessions SET expires_at = ? WHERE session_id = ?", (now + self.ttl, session_id))
+        return data
+
+    def create(self, session_id, session):
+        meta, turns = _split(session)
+        with self._transaction() as conn:
+            self._delete(conn, session_id)
+            conn.execute("INSERT INTO interview_sessions (session_id, data, expires_at) VALUES (?, ?, ?)",
+                         (session_id, _dumps(meta), time.time() + self.ttl))
+            conn.executemany("INSERT INTO interview_session_turns (session_id, turn_index, data) VALUES (?, ?, ?)",
+                             [(session_id, index, _dumps(turn)) for index, turn in enumerate(turns)])
+        self._count("created")
+
+    def get(self, session_id):
+        with self._transaction(write=False) as conn:
+            data = self._meta(conn, session_id, time.time())
+            if data is None:
+                return None
+            rows = conn.execute("SELECT data FROM interview_session_turns WHERE session_id = ? ORDER BY turn_index",
+                                (session_id,)).fetchall()
+        session = _loads(data)
+        session["question_answers"] = [_loads(row[0]) for row in rows]
+        return session
+
+    def update(self, session_id, fn):
+        with self._transaction() as conn:
+            meta = _loads(self._require(conn, session_id, time.time()))
+            result = fn(meta)
+            conn.execute("UPDATE interview_sessions SET data = ? WHERE session_id = ?", (_dumps(meta), session_id))
+        self._count("updates")
+        return result
+
+    def append_turn(self, session_id, turn):
+        with self._transaction() as conn:
+            self._require(conn, session_id, time.time())
+            index = conn.execute("SELECT COALESCE(MAX(turn_index) + 1, 0) FROM interview_session_turns WHERE session_id = ?",
+                                 (session_id,)).fetchone()[0]
+            conn.execute("INSERT INTO interview_session_turns (session_id, turn_index, data) VALUES (?, ?, ?)",
+                         (session_id, index, _dumps(turn)))
+        self._count("turn_writes")
+        return index
+
+    def update_turn(self, session_id, index, fn):
+        with self._transaction() as conn:
+            self._require(conn, session_id, time.time())
+            row = conn.execute("SELECT data FROM interview_session_turns WHERE session_id = ? AND turn_index = ?",
+                               (session_id, index)).fetchone()
+            if row is None:
+                raise SessionNotFoundError(f"{session_id}[{index}]")
+            turn = _loads(row[0])
+            result = fn(turn)
+            conn.execute("UPDATE interview_session_turns SET data = ? WHERE session_id = ? AND turn_index = ?",
+                         (_dumps(turn), session_id, index))
+        self._count("turn_writes")
+        return result
+
+    def delete(self, session_id):
+        with self._transaction() as conn:
+            existed = self._delete(conn, session_id)
+        if existed:
+            self._count("deleted")
+        return existed
+
+    def purge_expired(self):
+        with self._transaction() as conn:
+            now = time.time()
+            conn.execute("DELETE FROM interview_session_turns WHERE session_id IN "
+                         "(SELECT session_id FROM interview_sessions WHERE expires_at <= ?)", (now,))
+            purged = conn.execute("DELETE FROM interview_sessions WHERE expires_at <= ?", (now,)).rowcount
+        if purged:
+            self._count("expired", purged)
+        return purged
+
+    def gauge(self):
+        conn = self._conn()
+        now = time.time()
+        count, meta_bytes = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(LENGTH(CAST(data AS BLOB))), 0) FROM interview_sessions WHERE expires_at > ?", (now,)
+        ).fetchone()
+        turn_bytes = conn.execute(
+            "SELECT COALESCE(SUM(LENGTH(CAST(t.data AS BLOB))), 0) FROM interview_session_turns t "
+            "JOIN interview_sessions s ON s.session_id = t.session_id WHERE s.expires_at > ?", (now,)
+        ).fetchone()[0]
+        return count, meta_bytes + turn_bytes
+
+
+class RedisSessionStore(SessionStore):
+    """
+    基于Redis协议服务的会话存储
+
+    会话信息保存为字符串，问答记录保存为列表，两个键使用相同的过期时间。
+    修改操作使用WATCH乐观事务，被其他进程抢先修改时重新读取后重试。
+    """
+
+    def __init__(self, config):
+        super().__init__(config)
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("使用redis会话存储需要安装redis客户端：pip install redis") from e
+        self._redis_module = redis
+        self._redis = redis.Redis.from_url(config["redis_url"], decode_responses=True)
+        self.prefix = config["key_prefix"]
+
+    def _keys(self, session_id):
+        meta_key = self.prefix + session_id
+        return meta_key, meta_key + ":turns"
+
+    def _retry(self, watch, apply):
+        """
+        乐观事务：监视watch中的键，apply(pipe)读取数据并在pipe.multi()之后排队写入命令
+
+        Returns:
+            apply的返回值
+        """
+        while True:
+            with self._redis.pipeline() as pipe:
+                try:
+                    pipe.watch(*watch)
+                    result = apply(pipe)
+                    pipe.execute()
+                    return result
+                except self._redis_module.WatchError:
+                    self._count("conflicts")
+
+    def create(self, session_id, session):
+        meta, turns = _split(session)
+        meta_key, turns_key = self._keys(session_id)
+        pipe = self._redis.pipeline()
+        pipe.set(meta_key, _dumps(meta), ex=self.ttl)
+        pipe.delete(turns_key)
+        if turns:
+            pipe.rpush(turns_key, *[_dumps(turn) for turn in turns])
+            pipe.expire(turns_key, self.ttl)
+        pipe.execute()
+        self._count("created")
+
+    def get(self, session_id):
+        meta_key, turns_key = self._keys(session_id)
+        pipe = self._redis.pipeline()
+        pipe.get(meta_key)
+        pipe.lrange(turns_key, 0, -1)
+        data, turns = pipe.execute()
+        if data is None:
+            return None
+        session = _loads(data)
+        session["question_answers"] = [_loads(turn) for turn in turns]
+        return session
+
+    def update(self, session_id, fn):
+        meta_key, turns_key = self._keys(session_id)
+
+        def apply(pipe):
+            data = pipe.get(meta_key)
+            if data is None:
+                raise SessionNotFoundError(session_id)
+            meta = _loads(data)
+            result = fn(meta)
+            pipe.multi()
+            pipe.set(meta_key, _dumps(meta), ex=self.ttl)
+            pipe.expire(turns_key, self.ttl)
+            return result
+
+        result = self._retry((meta_key,), apply)
+        self._count("updates")
+        return result
+
+    def append_turn(self, session_id, turn):
+        meta_key, turns_key = self._keys(session_id)
+        data = _dumps(turn)
+
+        def apply(pipe):
+            if not pipe.exists(meta_key):
+                raise SessionNotFoundError(session_id)
+            length = pipe.llen(turns_key)
+            pipe.multi()
+            pipe.rpush(turns_key, data)
+            pipe.expire(turns_key, self.ttl)
+            pipe.expire(meta_key, self.ttl)
+            return length
+
+        index = self._retry((meta_key, turns_key), apply)
+        self._count("turn_writes")
+        return index
+
+    def update_turn(self, session_id, index, fn):
+        meta_key, turns_key = self._keys(session_id)
+
+        def apply(pipe):
+            data = pipe.lindex(turns_key, index) if index >= 0 else None
+            if data is None or not pipe.exists(meta_key):
+                raise SessionNotFoundError(f"{session_id}[{index}]")
+            turn = _loads(data)
+            result = fn(turn)
+            pipe.multi()
+            pipe.lset(turns_key, index, _dumps(turn))
+            pipe.expire(turns_key, self.ttl)
+            pipe.expire(meta_key, self.ttl)
+            return result
+
+        result = self._retry((meta_key, turns_key), apply)
+        self._count("turn_writes")
+        return result
+
+    def delete(self, session_id):
+        existed = self._redis.delete(*self._keys(session_id)) > 0
+        if existed:
+            self._count("deleted")
+        return existed
+
+    def purge_expired(self):
+        # 过期由Redis的键TTL完成
+        return 0
+
+    def _key_size(self, key, is_turns):
+        """键占用的字节数，MEMORY命令不可用（部分托管Redis禁用）时按数据长度估算"""
+        try:
+            return self._redis.memory_usage(key) or 0
+        except self._redis_module.exceptions.ResponseError:
+            if is_turns:
+                return sum(len(item.encode("utf-8")) for item in self._redis.lrange(key, 0, -1))
+            return self._redis.strlen(key)
+
+    def gauge(self):
+        count = 0
+        size = 0
+        for key in self._redis.scan_iter(match=self.prefix + "*", count=500):
+            is_turns = key.endswith(":turns")
+            if not is_turns:
+                count += 1
+            size += self._key_size(key, is_turns)
+        return count, size
+
+
+SESSION_STORE_BACKENDS = {
+    "memory": MemorySessionStore,
+    "sqlite": SQLiteSessionStore,
+    "redis": RedisSessionStore
+}
+
+
+def create_session_store(config=None):
+    """按配置创建会话存储"""
+    config = config or SESSION_STORE_CONFIG
+    backend = SESSION_STORE_BACKENDS.get(config["backend"])
+    if backend is None:
+        raise ValueError(f"未知的会话存储后端: {config['backend']}")
+    return backend(config)
+
+
+# 进程级单例
+session_store = create_session_store()
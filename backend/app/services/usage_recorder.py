@@ -0,0 +1,151 @@
+"""
+大模型调用用量记录
+
+每次上游调用的token用量、耗时、模型、路由和用户先放入内存队列，
+由后台线程按批写入llm_usages表，不占用请求处理时间。
+队列满时丢弃新记录（计入dropped），保证数据库变慢时不会拖慢请求。
+"""
+import time
+import queue
+import atexit
+import datetime
+import threading
+from config import USAGE_CONFIG
+from ..models import db, LLMUsage
+
+
+def get_cached_tokens(usage):
+    """
+    从usage中取出命中上游前缀缓存的prompt token数
+
+    DeepSeek返回prompt_cache_hit_tokens，OpenAI兼容格式返回prompt_tokens_details.cached_tokens
+    """
+    if usage is None:
+        return 0
+    cached = getattr(usage, "prompt_cache_hit_tokens", None)
+    if cached is None:
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached = getattr(details, "cached_tokens", None)
+    return cached or 0
+
+
+class UsageRecorder:
+    """
+    用量记录的后台批量写入器
+
+    示例用法：
+    >>> usage_recorder.init_app(app)
+    >>> usage_recorder.record(route="self_intro.generate", model="deepseek-chat", latency=1.2, usage=response.usage)
+    """
+
+    def __init__(self, config=None):
+        self.config = config or USAGE_CONFIG
+        self.app = None
+        self._queue = queue.Queue(maxsize=self.config["queue_size"])
+        self._thread = None
+        self._stop = threading.Event()
+        self._stats_lock = threading.Lock()
+        self._stats = {"recorded": 0, "written": 0, "dropped": 0, "write_errors": 0}
+
+    def init_app(self, app):
+        """绑定Flask应用并启动后台写入线程"""
+        if not self.config["enabled"] or self._thread is not None:
+            return
+        self.app = app
+        self._thread = threading.Thread(target=self._run, name="llm-usage-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def _count(self, name, value=1):
+        with self._stats_lock:
+            self._stats[name] += value
+
+    def record(self, route, model, latency, usage=None, error=None, user_id=None):
+        """
+        记录一次上游调用，写入在后台完成
+
+        Args:
+            route: 调用来源路由标识
+            model: 使用的模型
+            latency: 耗时（秒）
+            usage: 响应中的usage对象，可能为None
+            error: 调用失败时的异常
+            user_id: 发起调用的用户
+        """
+        if self._thread is None:
+            return
+        row = {
+            "user_id": user_id,
+            "route": route,
+            "model": model,
+            "prompt_tokens": getattr(usage, "prompt_tokens", 0) or 0,
+            "completion_tokens": getattr(usage, "completion_tokens", 0) or 0,
+            "cached_tokens": get_cached_tokens(usage),
+            "latency_ms": int(latency * 1000),
+            "success": error is None,
+            "created_at": datetime.datetime.now()
+        }
+        try:
+            self._queue.put_nowait(row)
+            self._count("recorded")
+        except queue.Full:
+            self._count("dropped")
+
+    def _drain(self):
+        """取出队列中最多batch_size条记录"""
+        rows = []
+        while len(rows) < self.config["batch_size"]:
+            try:
+                rows.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return rows
+
+    def _write(self, rows):
+        """批量写入一批记录"""
+        with self.app.app_context():
+            try:
+                db.session.bulk_insert_mappings(LLMUsage, rows)
+                db.session.commit()
+                self._count("written", len(rows))
+            except Exception as e:
+                db.session.rollback()
+                self._count("write_errors")
+                print(f"写入大模型用量记录失败: {e}")
+
+    def _run(self):
+        """后台线程：每隔flush_interval秒或攒够一批时写入"""
+        while not self._stop.is_set():
+            deadline = time.monotonic() + self.config["flush_interval"]
+            while self._queue.qsize() < self.config["batch_size"] and time.monotonic() < deadline:
+                if self._stop.wait(0.2):
+                    break
+            rows = self._drain()
+            if rows:
+                self._write(rows)
+
+    def close(self):
+        """停止后台线程并写入剩余记录，进程退出时自动调用"""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout=5)
+        while True:
+            rows = self._drain()
+            if not rows:
+                break
+            self._write(rows)
+
+    def get_stats(self):
+        """
+        获取写入统计信息
+
+        Returns:
+            dict: 记录数、已写入数、丢弃数、写入失败批次数和当前队列长度
+        """
+        with self._stats_lock:
+            return {**self._stats, "queued": self._queue.qsize()}
+
+
+# 进程级单例
+usage_recorder = UsageRecorder()
@@ -0,0 +1,159 @@
+"""
+本地Faster Whisper语音识别服务
+
+模型在进程内只加载一次（首次识别时加载，或配置preload在启动时后台加载），
+在CPU上以int8量化推理；识别任务交给固定大小的线程池执行，
+每个推理线程使用cpu_threads个计算线程，排队任务超过max_pending时直接拒绝，避免请求无限堆积。
+识别不经过网络，也不消耗第三方额度，适合作为默认引擎和阿里云ASR失败时的降级引擎。
+"""
+import io
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from config import WHISPER_CONFIG
+
+
+class WhisperBusyError(Exception):
+    """排队的识别任务过多"""
+
+
+class WhisperASRService:
+    """
+    本地Faster Whisper语音识别服务
+
+    示例用法：
+    >>> whisper_asr_service.preload()  # 可选，启动时后台加载模型
+    >>> text = whisper_asr_service.transcribe_audio_bytes(audio_bytes)
+    """
+
+    def __init__(self, config=None):
+        self.config = config or WHISPER_CONFIG
+        self._model = None
+        self._load_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=self.config["workers"], thread_name_prefix="whisper")
+        self._lock = threading.Lock()
+        self._stats = {
+            "requests": 0, "completed": 0, "failed": 0, "rejected": 0, "queued": 0, "running": 0,
+            "total_latency": 0.0, "audio_seconds": 0.0, "load_seconds": None
+        }
+
+    def _get_model(self):
+        """获取模型，首次调用时加载（并发调用只加载一次）"""
+        if self._model is None:
+            with self._load_lock:
+                if self._model is None:
+                    from faster_whisper import WhisperModel
+                    start_time = time.time()
+                    self._model = WhisperModel(
+                        self.config["model"],
+                        device=self.config["device"],
+                        compute_type=self.config["compute_type"],
+                        cpu_threads=self.config["cpu_threads"],
+                        # 多个线程同时调用transcribe时并行推理
+                        num_workers=self.config["workers"],
+                        download_root=self.config["download_root"] or None
+                    )
+                    load_seconds = time.time() - start_time
+                    with self._lock:
+                        self._stats["load_seconds"] = round(load_seconds, 2)
+                    print(f"[API LOG] Faster Whisper模型已加载: {self.config['model']} "
+                          f"({self.config['device']}/{self.config['compute_type']})，耗时{load_seconds:.2f}秒")
+        return self._model
+
+    def preload(self):
+        """在后台线程中加载模型，首个识别请求不必等待加载"""
+        def load():
+            try:
+                self._get_model()
+            except Exception as e:
+                print(f"预加载Faster Whisper模型失败: {e}")
+        threading.Thread(target=load, name="whisper-preload", daemon=True).start()
+
+    def _transcribe(self, audio_data):
+        """在推理线程中识别一段音频"""
+        with self._lock:
+            self._stats["queued"] -= 1
+            self._stats["running"] += 1
+        start_time = time.time()
+        try:
+            segments, info = self._get_model().transcribe(
+                io.BytesIO(audio_data),
+                language=self.config["language"] or None,
+                beam_size=self.config["beam_size"],
+                vad_filter=self.config["vad_filter"]
+            )
+            # segments是生成器，遍历时才真正解码
+            text = "".join(segment.text for segment in segments).strip()
+        except Exception:
+            with self._lock:
+                self._stats["running"] -= 1
+                self._stats["failed"] += 1
+            raise
+        with self._lock:
+            self._stats["running"] -= 1
+            self._stats["completed"] += 1
+            self._stats["total_latency"] += time.time() - start_time
+            self._stats["audio_seconds"] += info.duration
+        return text
+
+    def transcribe_audio_bytes(self, audio, audio_format=None):
+        """
+        识别内存中的音频
+
+        Args:
+            audio: 音频字节数据，或可读取的文件对象
+            audio_format: 音频格式（由解码器自动识别，保留该参数与阿里云ASR接口一致）
+
+        Returns:
+            str: 转录后的文本
+
+        Raises:
+            WhisperBusyError: 排队的识别任务数达到max_pending
+        """
+        audio_data = audio.read() if hasattr(audio, "read") else bytes(audio)
+        with self._lock:
+            if self._stats["queued"] >= self.config["max_pending"]:
+                self._stats["rejected"] += 1
+                raise WhisperBusyError("本地语音识别繁忙，请稍后重试")
+            self._stats["queued"] += 1
+            self._stats["requests"] += 1
+        return self._executor.submit(self._transcribe, audio_data).result(timeout=self.config["timeout"])
+
+    def transcribe_audio(self, audio_path):
+        """
+        识别音频文件
+
+        Args:
+            audio_path: 音频文件路径
+
+        Returns:
+            str: 转录后的文本
+        """
+        with open(audio_path, 'rb') as f:
+            return self.transcribe_audio_bytes(f.read())
+
+    def get_stats(self):
+        """
+        获取识别服务统计信息
+
+        Returns:
+            dict: 模型配置、是否已加载、排队和执行中的任务数、完成/失败/拒绝次数、平均耗时（秒）和实时率
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        total_latency = stats.pop("total_latency")
+        stats["avg_latency"] = total_latency / stats["completed"] if stats["completed"] else 0.0
+        # 实时率：推理耗时 / 音频时长，小于1表示识别比实时快
+        stats["real_time_factor"] = total_latency / stats["audio_seconds"] if stats["audio_seconds"] else None
+        return {
+            "model": self.config["model"],
+            "compute_type": self.config["compute_type"],
+            "workers": self.config["workers"],
+            "cpu_threads": self.config["cpu_threads"],
+            "loaded": self._model is not None,
+            **stats
+        }
+
+
+# 进程级单例，模型在进程内只加载一次
+whisper_asr_service = WhisperASRService()
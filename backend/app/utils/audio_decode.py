@@ -0,0 +1,187 @@
+"""
+服务端音频解码与重采样
+
+浏览器录音是webm/opus（也可能上传mp3、wav等），而阿里云ASR按ALIYUN_ASR_FORMAT=wav、16000Hz识别。
+这里在内存中把上传的音频统一转换为16kHz单声道16位PCM的WAV，再交给任意识别引擎、VAD和识别会话，不写临时文件：
+- 16位PCM的WAV：直接解析，采样率不同时用NumPy向量化重采样（加窗sinc低通滤波后线性插值）
+- 其他格式：用PyAV（faster-whisper已依赖）在内存中解码，libswresample同时完成混音和重采样；
+  未安装PyAV时通过管道调用ffmpeg进程解码
+- 已经是16kHz单声道的WAV原样返回，无法解码的音频原样返回，由识别引擎自行处理
+
+16kHz单声道16位PCM每秒32KB，比浏览器常用的44.1/48kHz立体声WAV小得多，上传给识别引擎的数据量随之减少，
+前端也不必再在浏览器中解码webm并拼接WAV文件头。
+"""
+import io
+import time
+import wave
+import shutil
+import threading
+import subprocess
+import numpy as np
+from config import AUDIO_DECODE_CONFIG
+from .audio_vad import decode_wav, encode_wav
+
+try:
+    import av
+except ImportError:
+    av = None
+
+
+def resample(samples, from_rate, to_rate):
+    """
+    单声道float32样本重采样
+
+    降采样时先用加窗sinc低通滤波去掉高于目标奈奎斯特频率的成分，再按目标采样点线性插值
+    """
+    if from_rate == to_rate or len(samples) == 0:
+        return samples
+    if to_rate < from_rate:
+        # 截止频率取目标奈奎斯特频率的90%（相对原采样率归一化）
+        cutoff = 0.45 * to_rate / from_rate
+        half = int(4 / cutoff)
+        taps = np.arange(-half, half + 1)
+        kernel = 2 * cutoff * np.sinc(2 * cutoff * taps) * np.hamming(len(taps))
+        samples = np.convolve(samples, kernel / kernel.sum(), mode="same")
+    count = int(len(samples) * to_rate / from_rate)
+    positions = np.arange(count) * (from_rate / to_rate)
+    return np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+
+
+def _wav_layout(data):
+    """读取WAV的(声道数, 采样率, 采样位宽)，不是WAV时返回None"""
+    try:
+        with wave.open(io.BytesIO(data), "rb") as wav_file:
+            return wav_file.getnchannels(), wav_file.getframerate(), wav_file.getsampwidth()
+    except (wave.Error, EOFError):
+        return None
+
+
+class AudioDecoder:
+    """
+    把上传的音频转换为识别引擎统一使用的16kHz单声道PCM WAV
+
+    示例用法：
+    >>> wav_bytes = audio_decoder.normalize(webm_bytes)
+    >>> samples = audio_decoder.decode(webm_bytes)  # float32样本，无法解码时为None
+    """
+
+    def __init__(self, config=None):
+        self.config = config or AUDIO_DECODE_CONFIG
+        self._ffmpeg = shutil.which(self.config["ffmpeg_path"])
+        self._lock = threading.Lock()
+        self._stats = {
+            "requests": 0, "passthrough": 0, "wav": 0, "pyav": 0, "ffmpeg": 0, "failed": 0,
+            "input_bytes": 0, "output_bytes": 0, "audio_seconds": 0.0, "decode_seconds": 0.0
+        }
+
+    def _count(self, name, value=1):
+        with self._lock:
+            self._stats[name] += value
+
+    def _decode_pyav(self, data):
+        """用PyAV在内存中解码，返回目标采样率的单声道float32样本"""
+        rate = self.config["sample_rate"]
+        resampler = av.AudioResampler(format="flt", layout="mono", rate=rate)
+        parts = []
+        with av.open(io.BytesIO(data), mode="r") as container:
+            for frame in container.decode(audio=0):
+                # 丢弃时间戳，避免分片录音的时间戳不连续时重采样器报错
+                frame.pts = None
+                parts.extend(resampled.to_ndarray().reshape(-1) for resampled in resampler.resample(frame))
+            parts.extend(resampled.to_ndarray().reshape(-1) for resampled in resampler.resample(None))
+        return np.concatenate(parts).astype(np.float32, copy=False) if parts else None
+
+    def _decode_ffmpeg(self, data):
+        """通过管道调用ffmpeg解码，返回目标采样率的单声道float32样本"""
+        command = [
+            self._ffmpeg, "-nostdin", "-loglevel", "error", "-i", "pipe:0",
+            "-f", "s16le", "-ac", "1", "-ar", str(self.config["sample_rate"]), "pipe:1"
+        ]
+        completed = subprocess.run(command, input=data, capture_output=True, timeout=self.config["timeout"])
+        if completed.returncode != 0 or not completed.stdout:
+            raise RuntimeError(completed.stderr.decode("utf-8", "ignore").strip() or "ffmpeg解码失败")
+        return np.frombuffer(completed.stdout, dtype="<i2").astype(np.float32) / 32768.0
+
+    def decode(self, audio):
+        """
+        解码音频
+
+        Args:
+            audio: 音频字节数据（wav、webm、ogg、mp3等）
+
+        Returns:
+            numpy.ndarray: 目标采样率的单声道float32样本（-1~1），无法解码时返回None
+        """
+        rate = self.config["sample_rate"]
+        decoded = decode_wav(audio)
+        if decoded is not None:
+            samples, sample_rate = decoded
+            self._count("wav")
+            return resample(samples, sample_rate, rate)
+
+        try:
+            if av is not None:
+                samples = self._decode_pyav(audio)
+                self._count("pyav")
+                return samples
+            if self._ffmpeg:
+                samples = self._decode_ffmpeg(audio)
+                self._count("ffmpeg")
+                return samples
+        except Exception as e:
+            print(f"音频解码失败: {e}")
+        self._count("failed")
+        return None
+
+    def normalize(self, audio):
+        """
+        把音频转换为目标采样率的单声道16位PCM WAV
+
+        Args:
+            audio: 音频字节数据
+
+        Returns:
+            bytes: WAV数据；已是目标格式、未开启或无法解码时原样返回
+        """
+        if not self.config["enabled"] or not audio:
+            return audio
+        start_time = time.time()
+        with self._lock:
+            self._stats["requests"] += 1
+            self._stats["input_bytes"] += len(audio)
+
+        if _wav_layout(audio) == (1, self.config["sample_rate"], 2):
+            with self._lock:
+                self._stats["passthrough"] += 1
+                self._stats["output_bytes"] += len(audio)
+            return audio
+
+        samples = self.decode(audio)
+        if samples is None:
+            self._count("output_bytes", len(audio))
+            return audio
+        wav_data = encode_wav(samples, self.config["sample_rate"])
+        with self._lock:
+            self._stats["output_bytes"] += len(wav_data)
+            self._stats["audio_seconds"] += len(samples) / self.config["sample_rate"]
+            self._stats["decode_seconds"] += time.time() - start_time
+        return wav_data
+
+    def get_stats(self):
+        """
+        获取解码统计信息
+
+        Returns:
+            dict: 各解码方式的次数、原样返回和解码失败的次数、输入/输出字节数、解码的音频时长和耗时（秒）
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        stats["backend"] = "pyav" if av is not None else ("ffmpeg" if self._ffmpeg else None)
+        stats["sample_rate"] = self.config["sample_rate"]
+        # 输出/输入字节比，小于1表示上传给识别引擎的数据变小
+        stats["size_ratio"] = stats["output_bytes"] / stats["input_bytes"] if stats["input_bytes"] else None
+        return stats
+
+
+# 进程级单例
+audio_decoder = AudioDecoder()
@@ -0,0 +1,170 @@
+"""
+服务端语音活动检测（VAD）
+
+对解码后的PCM按帧计算短时能量和过零率（NumPy向量化，不逐样本循环），判断音频中是否有人声：
+- 能量高于energy_threshold_db（dBFS）的帧为语音帧
+- 能量略低于阈值（fricative_margin_db以内）但过零率高于fricative_zcr的帧也算语音（s、sh等清辅音能量低、过零率高）
+- 语音帧累计不足min_speech_ms时判定为静音
+
+有人声时裁掉首尾静音（两端各保留padding_ms），减少上传给识别引擎的数据量；
+静音片段直接返回空识别结果，不调用识别引擎。面试中大部分音频是静音或思考时间，可以省掉大量识别调用。
+"""
+import io
+import wave
+import threading
+import numpy as np
+from config import VAD_CONFIG
+
+
+class VadResult:
+    """一段音频的检测结果，start、end为裁剪后保留的样本范围"""
+
+    __slots__ = ("has_speech", "speech_ms", "total_ms", "start", "end")
+
+    def __init__(self, has_speech, speech_ms, total_ms, start, end):
+        self.has_speech = has_speech
+        self.speech_ms = speech_ms
+        self.total_ms = total_ms
+        self.start = start
+        self.end = end
+
+
+def decode_wav(data):
+    """
+    解析16位PCM的WAV数据
+
+    Returns:
+        tuple: (单声道float32样本（-1~1）, 采样率)，不是16位PCM WAV时返回None
+    """
+    try:
+        with wave.open(io.BytesIO(data), "rb") as wav_file:
+            if wav_file.getsampwidth() != 2 or wav_file.getcomptype() != "NONE":
+                return None
+            channels = wav_file.getnchannels()
+            sample_rate = wav_file.getframerate()
+            frames = wav_file.readframes(wav_file.getnframes())
+    except (wave.Error, EOFError):
+        return None
+    samples = np.frombuffer(frames, dtype="<i2")
+    samples = samples[:len(samples) - len(samples) % channels].reshape(-1, channels)
+    return samples.mean(axis=1, dtype=np.float32) / 32768.0, sample_rate
+
+
+def encode_wav(samples, sample_rate):
+    """把单声道float32样本编码为16位PCM的WAV数据"""
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype("<i2")
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(pcm.tobytes())
+    return buffer.getvalue()
+
+
+def detect_speech(samples, sample_rate, config=None):
+    """
+    检测单声道样本中的语音
+
+    Args:
+        samples: 单声道float32样本（-1~1）
+        sample_rate: 采样率
+        config: VAD配置，默认使用VAD_CONFIG
+
+    Returns:
+        VadResult: 检测结果
+    """
+    config = config or VAD_CONFIG
+    frame_size = max(1, int(sample_rate * config["frame_ms"] / 1000))
+    frame_count = len(samples) // frame_size
+    total_ms = len(samples) * 1000 / sample_rate if sample_rate else 0
+    if frame_count == 0:
+        return VadResult(False, 0, total_ms, 0, 0)
+
+    frames = samples[:frame_count * frame_size].reshape(frame_count, frame_size)
+    # 短时能量（dBFS）
+    rms = np.sqrt(np.mean(np.square(frames, dtype=np.float64), axis=1))
+    energy_db = 20 * np.log10(np.maximum(rms, 1e-10))
+    # 过零率：相邻样本符号变化的比例
+    signs = np.signbit(frames)
+    zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / (frame_size - 1 if frame_size > 1 else 1)
+
+    threshold = config["energy_threshold_db"]
+    voiced = energy_db >= threshold
+    fricative = (energy_db >= threshold - config["fricative_margin_db"]) & (zcr >= config["fricative_zcr"])
+    speech = voiced | fricative
+
+    speech_ms = int(np.count_nonzero(speech) * config["frame_ms"])
+    if speech_ms < config["min_speech_ms"]:
+        return VadResult(False, speech_ms, total_ms, 0, 0)
+
+    indexes = np.flatnonzero(speech)
+    padding = int(sample_rate * config["padding_ms"] / 1000)
+    start = max(0, indexes[0] * frame_size - padding)
+    end = min(len(samples), (indexes[-1] + 1) * frame_size + padding)
+    return VadResult(True, speech_ms, total_ms, int(start), int(end))
+
+
+class VoiceActivityFilter:
+    """
+    识别前的静音过滤，统计被跳过的静音片段和裁掉的音频时长
+
+    示例用法：
+    >>> audio, result = voice_activity_filter.process(wav_bytes)
+    >>> if result is not None and not result.has_speech:
+    ...     return ""  # 静音，不调用识别引擎
+    """
+
+    def __init__(self, config=None):
+        self.config = config or VAD_CONFIG
+        self._lock = threading.Lock()
+        self._stats = {"checked": 0, "silent": 0, "undecodable": 0, "total_ms": 0, "trimmed_ms": 0}
+
+    def process(self, audio):
+        """
+        检测音频并裁掉首尾静音
+
+        Args:
+            audio: 音频字节数据（目前只解析16位PCM的WAV，其他格式原样返回）
+
+        Returns:
+            tuple: (裁剪后的音频, VadResult)；未开启或无法解析时VadResult为None，音频原样返回
+        """
+        if not self.config["enabled"]:
+            return audio, None
+        decoded = decode_wav(audio)
+        if decoded is None:
+            with self._lock:
+                self._stats["undecodable"] += 1
+            return audio, None
+
+        samples, sample_rate = decoded
+        result = detect_speech(samples, sample_rate, self.config)
+        kept_ms = (result.end - result.start) * 1000 / sample_rate
+        with self._lock:
+            self._stats["checked"] += 1
+            self._stats["total_ms"] += int(result.total_ms)
+            self._stats["trimmed_ms"] += int(result.total_ms - kept_ms)
+            if not result.has_speech:
+                self._stats["silent"] += 1
+        if not result.has_speech:
+            return b"", result
+        if result.start == 0 and result.end == len(samples):
+            return audio, result
+        return encode_wav(samples[result.start:result.end], sample_rate), result
+
+    def get_stats(self):
+        """
+        获取统计信息
+
+        Returns:
+            dict: 检测的片段数、判定为静音而跳过识别的片段数、无法解析的片段数，以及音频总时长和裁掉的时长（毫秒）
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        stats["silent_rate"] = stats["silent"] / stats["checked"] if stats["checked"] else 0.0
+        return stats
+
+
+# 进程级单例
+voice_activity_filter = VoiceActivityFilter()
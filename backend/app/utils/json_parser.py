@@ -136,3 +136,77 @@ def parse_resume_result(content):
     
     print("=== JSON解析失败 ===")
     return result
+
+
+class JSONStringFieldStreamer:
+    """
+    从流式返回的JSON文本中增量提取某个字符串字段的值
+
+    模型按token输出 {"feedback": "...", "nextQuestion": {...}} 时，
+    可以在整个JSON结束之前就把feedback的内容逐段推送给前端。
+
+    示例用法：
+    >>> streamer = JSONStringFieldStreamer("feedback")
+    >>> streamer.feed('{"feedback": "回答')
+    '回答'
+    >>> streamer.feed('很好", "nextQuestion"')
+    '很好'
+    """
+
+    _ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+    def __init__(self, field):
+        self.buffer = ""
+        self.done = False
+        self._key_pattern = re.compile(r'"' + re.escape(field) + r'"\s*:\s*"')
+        self._pos = None  # 字段值在buffer中的当前解析位置，None表示尚未找到字段
+
+    def feed(self, chunk):
+        """
+        追加一段模型输出，返回本次新解析出的字段文本
+
+        Args:
+            chunk: 模型输出的增量文本
+
+        Returns:
+            str: 新解码出的字段内容（可能为空字符串）
+        """
+        self.buffer += chunk
+        if self.done:
+            return ""
+
+        if self._pos is None:
+            match = self._key_pattern.search(self.buffer)
+            if not match:
+                return ""
+            self._pos = match.end()
+
+        output = []
+        pos = self._pos
+        while pos < len(self.buffer):
+            char = self.buffer[pos]
+            if char == '"':
+                self.done = True
+                pos += 1
+                break
+            if char != '\\':
+                output.append(char)
+                pos += 1
+                continue
+            # 转义序列不完整时等待下一段输出
+            if pos + 1 >= len(self.buffer):
+                break
+            escape = self.buffer[pos + 1]
+            if escape == 'u':
+                if pos + 6 > len(self.buffer):
+                    break
+                try:
+                    output.append(chr(int(self.buffer[pos + 2:pos + 6], 16)))
+                except ValueError:
+                    pass
+                pos += 6
+            else:
+                output.append(self._ESCAPES.get(escape, escape))
+                pos += 2
+        self._pos = pos
+        return "".join(output)
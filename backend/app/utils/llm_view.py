@@ -0,0 +1,90 @@
+"""
+大模型视图驱动
+
+需要调用大模型的视图写成生成器，在需要调用时 ``yield LLMCall(...)`` 并取回生成的文本：
+
+    @bp.route('/generate', methods=['POST'])
+    @llm_view
+    @auth_required
+    def generate():
+        ...
+        content = yield LLMCall(messages=messages, route="xxx.generate", max_tokens=1000)
+        ...
+        # 互不依赖的调用可以放在列表中一起yield，并发执行后按顺序取回结果
+        first, second = yield [LLMCall(...), LLMCall(...)]
+        ...
+        return jsonify(result), 200
+
+在Flask（WSGI）下由run_llm_view在当前线程同步执行调用；在ASGI入口（app/asgi.py）下，
+同一个生成器的同步部分在线程池中执行，大模型调用则由AsyncOpenAI在事件循环中异步等待。
+
+每次yield前会关闭当前的数据库会话，把连接归还连接池，避免长时间等待大模型时占满连接池。
+yield之后可以继续读取之前查询到的对象上已加载的字段，但不要再通过它们做延迟加载或修改。
+"""
+import inspect
+from functools import wraps
+from ..models import db
+from ..services.llm_gateway import llm_gateway
+
+
+def advance_llm_view(gen, value=None, error=None):
+    """
+    推进视图生成器一步
+
+    Args:
+        gen: 视图返回的生成器
+        value: 上一次LLMCall（或LLMCall列表）的执行结果
+        error: 上一次LLMCall抛出的异常，会抛回视图中由视图自行处理
+
+    Returns:
+        tuple: (是否结束, 下一个LLMCall（或LLMCall列表）或视图最终返回值)
+    """
+    try:
+        if error is not None:
+            call = gen.throw(error)
+        else:
+            call = gen.send(value)
+    except StopIteration as stop:
+        return True, stop.value
+
+    # 等待大模型期间不占用数据库连接
+    db.session.close()
+    return False, call
+
+
+def run_llm_view(rv):
+    """
+    同步驱动视图生成器，直到得到视图的最终返回值
+
+    Args:
+        rv: 视图函数的返回值，不是生成器时（如认证失败的响应）原样返回
+    """
+    if not inspect.isgenerator(rv):
+        return rv
+
+    value, error = None, None
+    while True:
+        done, item = advance_llm_view(rv, value, error)
+        if done:
+            return item
+        try:
+            if isinstance(item, list):
+                value, error = llm_gateway.execute_all(item), None
+            else:
+                value, error = llm_gateway.execute(item), None
+        except Exception as e:
+            value, error = None, e
+
+
+def llm_view(view):
+    """
+    把以yield LLMCall方式编写的视图包装成普通Flask视图
+
+    原始函数保存在包装函数的llm_view_func属性上，供ASGI入口异步驱动。
+    应放在@bp.route之下、@auth_required之上，使认证也由驱动器执行。
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        return run_llm_view(view(*args, **kwargs))
+    wrapper.llm_view_func = view
+    return wrapper
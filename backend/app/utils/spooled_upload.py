@@ -0,0 +1,17 @@
+"""
+上传文件的内存缓冲
+
+Werkzeug解析multipart请求时，上传文件超过500KB就写入磁盘临时文件。
+这里把阈值改为可配置（默认8MB），语音分片和整段回答的音频都保留在内存中，
+识别时直接读取缓冲区，不经过磁盘写入、读取和删除；超过阈值的大文件仍转存到磁盘。
+"""
+from tempfile import SpooledTemporaryFile
+from flask import Request
+from config import UPLOAD_CONFIG
+
+
+class SpooledUploadRequest(Request):
+    """上传文件在spool_max_size字节以内时保存在内存中的请求类"""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return SpooledTemporaryFile(max_size=UPLOAD_CONFIG["spool_max_size"], mode="rb+")
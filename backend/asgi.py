@@ -0,0 +1,6 @@
+# ASGI入口：大模型相关接口由AsyncOpenAI异步驱动，其余接口仍由Flask处理
+# 启动方式：uvicorn asgi:application --host 0.0.0.0 --port 5000
+from app import app
+from app.asgi import create_asgi_app
+
+application = create_asgi_app(app)
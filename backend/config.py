@@ -15,6 +15,114 @@ DEEPSEEK_CONFIG = {
     "model": os.getenv("DEEPSEEK_MODEL", "deepseek-chat")
 }
 
+# 大模型调用网关配置（连接池、超时、并发控制）
+LLM_GATEWAY_CONFIG = {
+    "max_connections": int(os.getenv("LLM_MAX_CONNECTIONS", "64")),
+    "max_keepalive_connections": int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "32")),
+    "keepalive_expiry": float(os.getenv("LLM_KEEPALIVE_EXPIRY", "60")),
+    "connect_timeout": float(os.getenv("LLM_CONNECT_TIMEOUT", "5")),
+    "read_timeout": float(os.getenv("LLM_READ_TIMEOUT", "120")),  # 默认读超时（秒），单次调用可覆盖
+    "max_retries": int(os.getenv("LLM_MAX_RETRIES", "0")),  # SDK内置重试，默认关闭，由LLM_RESILIENCE_CONFIG统一控制
+    "max_concurrency": int(os.getenv("LLM_MAX_CONCURRENCY", "32")),  # 进程内同时进行的上游调用数上限
+    "acquire_timeout": float(os.getenv("LLM_ACQUIRE_TIMEOUT", "30")),  # 等待并发槽位的最长时间（秒）
+    # ASGI入口下异步调用的连接数和并发上限，不受线程数限制
+    "async_max_connections": int(os.getenv("LLM_ASYNC_MAX_CONNECTIONS", "512")),
+    "async_max_concurrency": int(os.getenv("LLM_ASYNC_MAX_CONCURRENCY", "512"))
+}
+
+# ASGI入口配置
+ASGI_CONFIG = {
+    # 执行数据库查询、文件解析等同步步骤的线程数，等待大模型期间不占用这些线程
+    "sync_workers": int(os.getenv("ASGI_SYNC_WORKERS", "32")),
+    # 模拟面试WebSocket通道：录制中每累计多少秒新音频识别一次，单个回答最多接收的音频秒数
+    "ws_partial_interval": float(os.getenv("ASGI_WS_PARTIAL_INTERVAL", "1.5")),
+    "ws_max_answer_seconds": float(os.getenv("ASGI_WS_MAX_ANSWER_SECONDS", "300"))
+}
+
+# 大模型调用容错配置（重试、对冲请求、熔断）
+LLM_RESILIENCE_CONFIG = {
+    "max_attempts": int(os.getenv("LLM_RETRY_MAX_ATTEMPTS", "3")),  # 含首次调用在内的最大尝试次数
+    "backoff_base": float(os.getenv("LLM_RETRY_BACKOFF_BASE", "0.5")),  # 首次重试等待（秒），之后指数增长
+    "backoff_max": float(os.getenv("LLM_RETRY_BACKOFF_MAX", "8")),
+    "hedge_enabled": os.getenv("LLM_HEDGE_ENABLED", "False").lower() == "true",
+    "hedge_percentile": float(os.getenv("LLM_HEDGE_PERCENTILE", "0.95")),  # 超过该路由近期耗时的此百分位仍未返回时发起对冲
+    "hedge_min_samples": int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20")),  # 样本数不足时不对冲
+    "hedge_min_delay": float(os.getenv("LLM_HEDGE_MIN_DELAY", "1")),
+    "hedge_sample_size": int(os.getenv("LLM_HEDGE_SAMPLE_SIZE", "200")),
+    "hedge_workers": int(os.getenv("LLM_HEDGE_WORKERS", "64")),
+    "breaker_window": int(os.getenv("LLM_BREAKER_WINDOW", "60")),  # 统计错误率的时间窗口（秒）
+    "breaker_min_requests": int(os.getenv("LLM_BREAKER_MIN_REQUESTS", "20")),
+    "breaker_error_rate": float(os.getenv("LLM_BREAKER_ERROR_RATE", "0.5")),
+    "breaker_open_seconds": int(os.getenv("LLM_BREAKER_OPEN_SECONDS", "30"))
+}
+
+# 大模型响应缓存配置
+LLM_CACHE_CONFIG = {
+    "enabled": os.getenv("LLM_CACHE_ENABLED", "True").lower() == "true",
+    "max_entries": int(os.getenv("LLM_CACHE_MAX_ENTRIES", "512")),  # 进程内LRU容量
+    "disk_path": os.getenv("LLM_CACHE_DISK_PATH", ""),  # 磁盘缓存目录，为空时不启用磁盘层
+    # 按路由配置的缓存有效期（秒），未配置的路由不使用缓存
+    "route_ttl": {
+        "self_intro.generate": int(os.getenv("LLM_CACHE_TTL_SELF_INTRO", "86400")),
+        "strategy.analysis": int(os.getenv("LLM_CACHE_TTL_STRATEGY", "86400")),
+        "strategy.questions": int(os.getenv("LLM_CACHE_TTL_STRATEGY", "86400")),
+        "question_bank.generate": int(os.getenv("LLM_CACHE_TTL_QUESTION_BANK", "3600"))
+    }
+}
+
+# 大模型用量记录配置
+USAGE_CONFIG = {
+    "enabled": os.getenv("LLM_USAGE_ENABLED", "True").lower() == "true",
+    "batch_size": int(os.getenv("LLM_USAGE_BATCH_SIZE", "200")),  # 每批写入的最大记录数
+    "flush_interval": float(os.getenv("LLM_USAGE_FLUSH_INTERVAL", "2")),  # 最长写入间隔（秒）
+    "queue_size": int(os.getenv("LLM_USAGE_QUEUE_SIZE", "10000"))  # 队列满时丢弃新记录
+}
+
+# 模拟面试配置
+MOCK_INTERVIEW_CONFIG = {
+    "total_questions": int(os.getenv("MOCK_INTERVIEW_TOTAL_QUESTIONS", "10")),
+    # 开始面试时一次性生成全部问题，之后每轮只生成反馈（可由/start的planAhead参数覆盖）
+    "plan_ahead": os.getenv("MOCK_INTERVIEW_PLAN_AHEAD", "False").lower() == "true",
+    # 预生成模式下是否根据候选人回答改写下一个问题为追问（可由/start的followUp参数覆盖）
+    "follow_up": os.getenv("MOCK_INTERVIEW_FOLLOW_UP", "False").lower() == "true",
+    # 对话压缩：未合并的轮次达到keep_turns的两倍时，除最近keep_turns轮外合并进滚动摘要
+    "keep_turns": int(os.getenv("MOCK_INTERVIEW_KEEP_TURNS", "4")),
+    "summary_max_tokens": int(os.getenv("MOCK_INTERVIEW_SUMMARY_MAX_TOKENS", "400")),
+    # 每个prompt中简历和对话历史合计的token预算（估算值），简历最多占用resume_token_budget
+    "prompt_token_budget": int(os.getenv("MOCK_INTERVIEW_PROMPT_TOKEN_BUDGET", "6000")),
+    "resume_token_budget": int(os.getenv("MOCK_INTERVIEW_RESUME_TOKEN_BUDGET", "3000")),
+    # 生成面试报告时简历和问答记录合计的token预算
+    "report_token_budget": int(os.getenv("MOCK_INTERVIEW_REPORT_TOKEN_BUDGET", "12000")),
+    # 逐题评估：每个回答在后台评分和诊断，结束面试时只汇总；关闭时结束面试由一次完整的报告调用生成
+    "evaluate_answers": os.getenv("MOCK_INTERVIEW_EVALUATE_ANSWERS", "True").lower() == "true",
+    "evaluation_wait": float(os.getenv("MOCK_INTERVIEW_EVALUATION_WAIT", "30"))  # 结束面试时等待进行中评估的最长秒数
+}
+
+# 模拟面试会话存储配置
+SESSION_STORE_CONFIG = {
+    # memory：进程内（只适用于单进程）；sqlite：本机多进程共享；redis：多节点共享
+    "backend": os.getenv("SESSION_STORE_BACKEND", "memory"),
+    "ttl": int(os.getenv("SESSION_STORE_TTL", "7200")),  # 会话超过该秒数没有写入时过期
+    "sqlite_path": os.getenv("SESSION_STORE_SQLITE_PATH") or os.path.join(BASE_DIR, "instance", "interview_sessions.db"),
+    "redis_url": os.getenv("SESSION_STORE_REDIS_URL", "redis://localhost:6379/0"),
+    "key_prefix": os.getenv("SESSION_STORE_KEY_PREFIX", "ai_interview:session:"),
+    "sweep_interval": int(os.getenv("SESSION_STORE_SWEEP_INTERVAL", "60")),  # 清理过期会话的间隔秒数，0表示不启动清理线程
+    "resume_cache_entries": int(os.getenv("SESSION_RESUME_CACHE_ENTRIES", "256"))  # 会话共享的简历缓存条目数
+}
+
+# 面试报告生成任务配置
+REPORT_JOB_CONFIG = {
+    "workers": int(os.getenv("REPORT_JOB_WORKERS", "4")),  # 同时生成报告的线程数
+    "max_pending": int(os.getenv("REPORT_JOB_MAX_PENDING", "64")),  # 排队任务数上限，超过时拒绝结束面试请求
+    # 查询报告时长轮询的最长等待秒数，等待期间占用一个Web工作线程，不宜过大
+    "max_wait": float(os.getenv("REPORT_JOB_MAX_WAIT", "5")),
+    "poll_interval": float(os.getenv("REPORT_JOB_POLL_INTERVAL", "0.5")),  # 任务由其他进程执行时读取存储的间隔秒数
+    "ttl": int(os.getenv("REPORT_JOB_TTL", "3600")),  # 任务超过该秒数没有更新时过期
+    # 任务存储与会话存储使用相同的后端，但使用独立的SQLite文件/Redis键前缀，不计入存活会话数
+    "sqlite_path": os.getenv("REPORT_JOB_SQLITE_PATH") or os.path.join(BASE_DIR, "instance", "report_jobs.db"),
+    "key_prefix": os.getenv("REPORT_JOB_KEY_PREFIX", "ai_interview:report_job:")
+}
+
 # 数据库配置
 DB_CONFIG = {
     "host": os.getenv("DB_HOST", "localhost"),
@@ -66,6 +174,12 @@ AUTH_CONFIG = {
     "lock_duration": int(os.getenv("LOCK_DURATION", "300"))  # 账号锁定时间（秒）
 }
 
+# 管理员配置
+ADMIN_CONFIG = {
+    # 管理员用户ID，逗号分隔；可以查看/api/metrics运行时指标和全部用户的大模型用量，其他用户只能查询自己的用量
+    "user_ids": [user_id for user_id in os.getenv("ADMIN_USER_IDS", "").split(",") if user_id]
+}
+
 # 阿里云ASR配置
 ALIYUN_ASR_CONFIG = {
     "access_key_id": os.getenv("ALIYUN_ACCESS_KEY_ID", ""),
@@ -75,7 +189,12 @@ ALIYUN_ASR_CONFIG = {
     "format": os.getenv("ALIYUN_ASR_FORMAT", "wav"),
     "sample_rate": int(os.getenv("ALIYUN_ASR_SAMPLE_RATE", "16000")),
     "enable_punctuation_prediction": os.getenv("ALIYUN_ASR_ENABLE_PUNCTUATION", "True").lower() == "true",
-    "enable_inverse_text_normalization": os.getenv("ALIYUN_ASR_ENABLE_ITN", "True").lower() == "true"
+    "enable_inverse_text_normalization": os.getenv("ALIYUN_ASR_ENABLE_ITN", "True").lower() == "true",
+    "token_refresh_ahead": int(os.getenv("ALIYUN_ASR_TOKEN_REFRESH_AHEAD", "300")),  # Token过期前多少秒开始后台刷新
+    "token_retry_interval": int(os.getenv("ALIYUN_ASR_TOKEN_RETRY_INTERVAL", "5")),  # 获取Token失败后多少秒内不再重试
+    "pool_maxsize": int(os.getenv("ALIYUN_ASR_POOL_MAXSIZE", "16")),  # 到识别网关的最大keep-alive连接数
+    "pool_block": os.getenv("ALIYUN_ASR_POOL_BLOCK", "False").lower() == "true",  # 连接用尽时等待空闲连接，而不是临时新建不复用的连接
+    "request_timeout": int(os.getenv("ALIYUN_ASR_REQUEST_TIMEOUT", "30"))  # 识别请求超时时间（秒）
 }
 
 # 阿里云ASR服务URL
@@ -84,4 +203,67 @@ ALIYUN_ASR_URL = {
     "cn-beijing": "https://nls-gateway-cn-beijing.aliyuncs.com",
     "cn-hangzhou": "https://nls-gateway-cn-hangzhou.aliyuncs.com",
     "ap-southeast-1": "https://nls-gateway-ap-southeast-1.aliyuncs.com"
+}
+
+# 本地Faster Whisper语音识别配置
+WHISPER_CONFIG = {
+    "model": os.getenv("WHISPER_MODEL", "small"),  # 模型名称或本地模型目录
+    "download_root": os.getenv("WHISPER_DOWNLOAD_ROOT", ""),  # 模型下载/缓存目录，为空时使用huggingface默认缓存
+    "device": os.getenv("WHISPER_DEVICE", "cpu"),
+    "compute_type": os.getenv("WHISPER_COMPUTE_TYPE", "int8"),
+    "workers": int(os.getenv("WHISPER_WORKERS", "2")),  # 同时推理的任务数
+    "cpu_threads": int(os.getenv("WHISPER_CPU_THREADS", "2")),  # 每个推理任务使用的CPU线程数
+    "max_pending": int(os.getenv("WHISPER_MAX_PENDING", "32")),  # 排队任务数上限，超过时拒绝识别请求
+    "timeout": float(os.getenv("WHISPER_TIMEOUT", "60")),  # 等待识别结果的最长时间（秒）
+    "language": os.getenv("WHISPER_LANGUAGE", "zh"),  # 为空时自动检测语言
+    "beam_size": int(os.getenv("WHISPER_BEAM_SIZE", "5")),
+    "vad_filter": os.getenv("WHISPER_VAD_FILTER", "True").lower() == "true",  # 跳过静音片段
+    "preload": os.getenv("WHISPER_PRELOAD", "False").lower() == "true"  # 启动时在后台加载模型
+}
+
+# 服务端指定的语音识别引擎（aliyun/whisper/race），为空时使用客户端传入的engine参数
+ASR_ENGINE = os.getenv("ASR_ENGINE", "").strip().lower()
+
+# 语音识别引擎竞速配置（engine=race时同时调用多个引擎，采用最先返回的非空结果）
+ASR_RACE_CONFIG = {
+    "engines": [name.strip() for name in os.getenv("ASR_RACE_ENGINES", "aliyun,whisper").split(",") if name.strip()],
+    "workers": int(os.getenv("ASR_RACE_WORKERS", "16")),  # 竞速线程数，每次竞速每个引擎占用一个线程
+    "timeout": float(os.getenv("ASR_RACE_TIMEOUT", "30"))  # 等待引擎返回非空结果的最长时间（秒）
+}
+
+# 服务端音频解码配置，上传的音频统一转换为16kHz单声道PCM WAV后再识别
+AUDIO_DECODE_CONFIG = {
+    "enabled": os.getenv("AUDIO_DECODE_ENABLED", "True").lower() == "true",
+    "sample_rate": int(os.getenv("AUDIO_DECODE_SAMPLE_RATE", "16000")),  # 目标采样率，需与ALIYUN_ASR_SAMPLE_RATE一致
+    "ffmpeg_path": os.getenv("AUDIO_DECODE_FFMPEG_PATH", "ffmpeg"),  # 未安装PyAV时使用的ffmpeg可执行文件
+    "timeout": int(os.getenv("AUDIO_DECODE_TIMEOUT", "30"))  # ffmpeg解码超时时间（秒）
+}
+
+# 服务端语音活动检测（VAD）配置，静音片段不调用识别引擎
+VAD_CONFIG = {
+    "enabled": os.getenv("VAD_ENABLED", "True").lower() == "true",
+    "frame_ms": int(os.getenv("VAD_FRAME_MS", "30")),  # 分帧长度（毫秒）
+    "energy_threshold_db": float(os.getenv("VAD_ENERGY_THRESHOLD_DB", "-40")),  # 语音帧的能量阈值（dBFS）
+    "fricative_margin_db": float(os.getenv("VAD_FRICATIVE_MARGIN_DB", "10")),  # 高过零率的帧允许低于能量阈值的幅度（dB）
+    "fricative_zcr": float(os.getenv("VAD_FRICATIVE_ZCR", "0.25")),  # 清辅音帧的过零率下限
+    "min_speech_ms": int(os.getenv("VAD_MIN_SPEECH_MS", "90")),  # 语音帧累计时长低于此值时判定为静音（毫秒）
+    "padding_ms": int(os.getenv("VAD_PADDING_MS", "200"))  # 裁剪首尾静音时两端保留的时长（毫秒）
+}
+
+# 实时语音识别会话配置（/realtime-voice分片合并识别）
+ASR_SESSION_CONFIG = {
+    "jitter_chunks": int(os.getenv("ASR_SESSION_JITTER_CHUNKS", "2")),  # 缺失分片最多等待的后续分片数，超过后跳过
+    "min_window": float(os.getenv("ASR_SESSION_MIN_WINDOW", "2")),  # 识别窗口下限（秒），新音频达到窗口时识别一次
+    "max_window": float(os.getenv("ASR_SESSION_MAX_WINDOW", "10")),  # 未确认音频达到此时长（秒）时强制确认识别结果
+    "window_factor": float(os.getenv("ASR_SESSION_WINDOW_FACTOR", "2")),  # 识别窗口 = 近期识别耗时 × 该系数
+    "pause_ms": int(os.getenv("ASR_SESSION_PAUSE_MS", "500")),  # 末尾停顿达到此时长（毫秒）时确认识别结果
+    "final_wait": float(os.getenv("ASR_SESSION_FINAL_WAIT", "30")),  # 结束录音时等待进行中识别的最长时间（秒）
+    # 未提供recordingId时，提交的录音与识别会话收到的音频时长相差不超过此值（秒）才复用识别文本
+    "reuse_tolerance": float(os.getenv("ASR_SESSION_REUSE_TOLERANCE", "1")),
+    "ttl": int(os.getenv("ASR_SESSION_TTL", "120"))  # 会话闲置超过此时间（秒）后清理
+}
+
+# 上传文件配置
+UPLOAD_CONFIG = {
+    "spool_max_size": int(os.getenv("UPLOAD_SPOOL_MAX_SIZE", str(8 * 1024 * 1024)))  # 上传文件在此大小（字节）以内时保存在内存中，不写入磁盘
 }
\ No newline at end of file
@@ -0,0 +1,24 @@
+"""
+pytest公共配置
+
+单元测试不依赖MySQL和DeepSeek：导入应用前把数据库切到内存SQLite，并提供占位的API Key（测试中不会真正调用上游）。
+本目录下需要真实凭证、模型或网络的手动测试脚本不参与pytest收集，仍按原方式直接运行。
+"""
+import os
+import sys
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, BACKEND_DIR)
+
+os.environ.setdefault("DEEPSEEK_API_KEY", "test")
+os.environ.setdefault("SESSION_STORE_BACKEND", "memory")
+os.environ.setdefault("SESSION_STORE_SWEEP_INTERVAL", "0")
+os.environ.setdefault("LLM_CACHE_DISK_PATH", "")
+os.environ.setdefault("WHISPER_PRELOAD", "False")
+
+import config  # noqa: E402
+
+config.SQLALCHEMY_DATABASE_URI = "sqlite://"
+
+# 手动测试脚本：需要真实的阿里云凭证、Whisper模型或网络
+collect_ignore = ["test.py", "test_aliyun_asr.py", "test_real_token.py", "test_whisper.py", "to_sitemap.py"]
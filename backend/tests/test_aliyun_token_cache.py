@@ -0,0 +1,113 @@
+"""
+阿里云ASR Token缓存的单元测试：以假的CreateToken代替阿里云SDK，检查复用、提前刷新、并发单次获取、失败退避和失效
+"""
+import threading
+import time
+
+import pytest
+
+from app.services.aliyun_asr_service import AliyunTokenCache, AliyunTokenError
+
+
+class FakeCreateToken:
+    """依次返回token-1、token-2……，有效期为lifetime秒；error不为None时抛出该异常"""
+
+    def __init__(self, lifetime=3600, delay=0.0):
+        self.lifetime = lifetime
+        self.delay = delay
+        self.error = None
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        time.sleep(self.delay)
+        with self._lock:
+            self.calls += 1
+            calls = self.calls
+        if self.error is not None:
+            raise self.error
+        return f"token-{calls}", time.time() + self.lifetime
+
+
+def wait_until(condition, timeout=1.0):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_token_is_reused_until_expiry():
+    fetch = FakeCreateToken()
+    cache = AliyunTokenCache(fetch, refresh_ahead=300)
+    assert cache.get() == "token-1"
+    assert cache.get() == "token-1"
+    assert fetch.calls == 1
+    stats = cache.get_stats()
+    assert stats["fetches"] == 1
+    assert stats["hits"] == 1
+    assert 3590 < stats["expires_in"] <= 3600
+
+
+def test_concurrent_first_requests_fetch_once():
+    fetch = FakeCreateToken(delay=0.1)
+    cache = AliyunTokenCache(fetch)
+    tokens = []
+    threads = [threading.Thread(target=lambda: tokens.append(cache.get())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert tokens == ["token-1"] * 8
+    assert fetch.calls == 1
+
+
+def test_refresh_ahead_runs_in_background():
+    # 有效期短于提前刷新窗口：当前Token仍可用，同时在后台获取新Token
+    fetch = FakeCreateToken(lifetime=10, delay=0.05)
+    cache = AliyunTokenCache(fetch, refresh_ahead=60)
+    assert cache.get() == "token-1"
+    fetch.lifetime = 3600
+    assert cache.get() == "token-1"
+    assert cache.get() == "token-1"
+    assert wait_until(lambda: cache.get_stats()["background_refreshes"] == 1)
+    assert cache.get() == "token-2"
+    assert fetch.calls == 2
+
+
+def test_failed_background_refresh_keeps_the_current_token():
+    fetch = FakeCreateToken(lifetime=10)
+    cache = AliyunTokenCache(fetch, refresh_ahead=60)
+    assert cache.get() == "token-1"
+    fetch.error = RuntimeError("网络不可用")
+    assert cache.get() == "token-1"
+    assert wait_until(lambda: cache.get_stats()["failures"] == 1)
+    assert cache.get() == "token-1"
+
+
+def test_fetch_errors_are_not_retried_within_retry_interval():
+    fetch = FakeCreateToken()
+    fetch.error = RuntimeError("AccessKey无效")
+    cache = AliyunTokenCache(fetch, retry_interval=0.1)
+    with pytest.raises(AliyunTokenError) as excinfo:
+        cache.get()
+    assert excinfo.value.__cause__ is fetch.error
+    with pytest.raises(AliyunTokenError):
+        cache.get()
+    assert fetch.calls == 1
+
+    time.sleep(0.15)
+    fetch.error = None
+    assert cache.get() == "token-2"
+    assert cache.get_stats()["last_error"] is None
+
+
+def test_invalidate_drops_only_the_current_token():
+    fetch = FakeCreateToken()
+    cache = AliyunTokenCache(fetch)
+    assert cache.get() == "token-1"
+    cache.invalidate("token-1")
+    assert cache.get() == "token-2"
+    # 其他线程报告的旧Token已被替换，不影响当前Token
+    cache.invalidate("token-1")
+    assert cache.get() == "token-2"
+    assert cache.get_stats()["invalidations"] == 1
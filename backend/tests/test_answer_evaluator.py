@@ -0,0 +1,119 @@
+"""
+逐题评估的单元测试：以假网关代替LLM上游，检查评估结果写回的问答记录、评分解析和报告汇总
+"""
+import json
+from concurrent.futures import Future
+
+import pytest
+
+from app.services.answer_evaluator import AnswerEvaluator, SCORE_TIPS, MIN_SUGGESTIONS
+from app.services.session_store import SESSION_STORE_BACKENDS
+
+PREFIX = {"role": "system", "content": "面试官人设和简历"}
+
+
+class FakeGateway:
+    """按回答内容返回预设评估结果的假网关，submit立即返回已完成的Future"""
+
+    def __init__(self, results):
+        self.results = results
+        self.calls = []
+
+    def submit(self, call):
+        self.calls.append(call)
+        future = Future()
+        result = self.results[call.messages[2]["content"]]
+        if isinstance(result, Exception):
+            future.set_exception(result)
+        else:
+            future.set_result(result)
+        return future
+
+
+def evaluation_json(score, improvement=""):
+    return json.dumps({"professionalScore": score, "logicScore": score, "confidenceScore": score,
+                       "matchScore": score, "feedback": f"评价{score}", "suggestion": f"建议{score}",
+                       "improvement": improvement}, ensure_ascii=False)
+
+
+def make_evaluator(results):
+    store = SESSION_STORE_BACKENDS["memory"]({"ttl": 60, "sweep_interval": 0})
+    store.create("iv", {"interview_id": "iv", "question_answers": []})
+    config = {"evaluate_answers": True, "evaluation_wait": 0}
+    return AnswerEvaluator(config=config, gateway=FakeGateway(results), store=store), store
+
+
+def append(store, question, answer):
+    entry = {"question": question, "answer": answer, "evaluation": None, "evaluation_status": "pending"}
+    return store.append_turn("iv", entry), entry
+
+
+def test_submit_writes_to_the_returned_index():
+    evaluator, store = make_evaluator({"回答1": evaluation_json(60), "回答2": evaluation_json(90)})
+    append(store, "问题1", "回答1")
+    index, entry = append(store, "问题2", "回答2")
+
+    # 本地快照只有一轮问答时也按传入的问答记录和序号评估
+    evaluator.submit("iv", index, entry, PREFIX)
+
+    call = evaluator.gateway.calls[0]
+    assert call.messages[0] is PREFIX
+    assert call.messages[1]["content"] == "问题2"
+    turns = store.get("iv")["question_answers"]
+    assert turns[0]["evaluation_status"] == "pending"
+    assert turns[1]["evaluation_status"] == "done"
+    assert turns[1]["evaluation"]["professionalScore"] == 90
+
+
+def test_submit_marks_failed_evaluation():
+    evaluator, store = make_evaluator({"回答1": RuntimeError("上游超时")})
+    index, entry = append(store, "问题1", "回答1")
+    evaluator.submit("iv", index, entry, PREFIX)
+    turn = store.get("iv")["question_answers"][0]
+    assert turn["evaluation_status"] == "error"
+    assert turn["evaluation"] is None
+
+
+def test_collect_retries_missing_evaluations():
+    evaluator, store = make_evaluator({"回答1": evaluation_json(70)})
+    append(store, "问题1", "回答1")
+    session = evaluator.collect("iv", PREFIX)
+    assert session["question_answers"][0]["evaluation"]["logicScore"] == 70
+
+
+def test_parse_clamps_scores_and_requires_one_score():
+    evaluator, _ = make_evaluator({})
+    evaluation = evaluator.parse('评估如下：{"professionalScore": 120, "logicScore": "-5", '
+                                 '"confidenceScore": 88.6, "matchScore": "未知", "feedback": " 不错 "}')
+    assert evaluation["professionalScore"] == 100
+    assert evaluation["logicScore"] == 0
+    assert evaluation["confidenceScore"] == 89
+    assert evaluation["matchScore"] is None
+    assert evaluation["feedback"] == "不错"
+    assert evaluation["improvement"] == ""
+    with pytest.raises(ValueError):
+        evaluator.parse('{"feedback": "没有评分"}')
+    with pytest.raises(ValueError):
+        evaluator.parse("没有JSON")
+
+
+def test_aggregate_averages_and_fills_suggestions():
+    evaluator, _ = make_evaluator({})
+    low = json.loads(evaluation_json(50, "先说结论"))
+    high = json.loads(evaluation_json(90, "多举数据"))
+    high["logicScore"] = 30
+    session = {"question_answers": [
+        {"question": "问题1", "answer": "回答1", "evaluation": high},
+        {"question": "问题2", "answer": "回答2", "evaluation": low},
+        {"question": "问题3", "answer": "回答3", "evaluation": None, "feedback": "旧评价"}
+    ]}
+    report = evaluator.aggregate(session)
+    assert report["professionalScore"] == 70
+    assert report["logicScore"] == 40
+    assert report["questionAnalysis"][2]["feedback"] == "旧评价"
+    suggestions = report["optimizationSuggestions"]
+    # 得分较低回答的优化建议排在前面，不足时按最低评分项补充
+    assert suggestions[:2] == ["先说结论", "多举数据"]
+    assert suggestions[2] == SCORE_TIPS["logicScore"]
+    assert len(suggestions) == MIN_SUGGESTIONS
+    assert evaluator.aggregate({"question_answers": [{"question": "问题", "answer": "", "evaluation": None}]}) is None
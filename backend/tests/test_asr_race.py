@@ -0,0 +1,90 @@
+"""
+语音识别引擎竞速的单元测试：以按预设耗时返回的假引擎代替阿里云ASR和Whisper，检查胜出判定和统计
+"""
+import time
+
+import pytest
+
+from app.services.asr_race import AsrRacer
+
+
+def engine(text, delay=0.0, error=None):
+    def transcribe(audio):
+        time.sleep(delay)
+        if error is not None:
+            raise error
+        return text
+    return transcribe
+
+
+def make_racer(workers=4, timeout=2):
+    return AsrRacer({"workers": workers, "timeout": timeout})
+
+
+def test_fastest_non_empty_result_wins():
+    racer = make_racer()
+    text = racer.race(b"wav", {"aliyun": engine("阿里云", 0.2), "whisper": engine("本地", 0.01)})
+    assert text == "本地"
+    stats = racer.get_stats()
+    assert stats["races"] == 1
+    assert stats["engines"]["whisper"]["wins"] == 1
+    assert stats["engines"]["whisper"]["win_rate"] == 1.0
+    assert stats["engines"]["aliyun"]["win_rate"] == 0.0
+
+
+def test_empty_or_failed_result_does_not_win():
+    racer = make_racer()
+    assert racer.race(b"wav", {"aliyun": engine("", 0.01), "whisper": engine("本地", 0.1)}) == "本地"
+    failing = engine(None, 0.01, RuntimeError("识别服务不可用"))
+    assert racer.race(b"wav", {"aliyun": failing, "whisper": engine("本地", 0.1)}) == "本地"
+    stats = racer.get_stats()["engines"]
+    assert stats["aliyun"]["empty"] == 1
+    assert stats["aliyun"]["errors"] == 1
+    assert stats["whisper"]["wins"] == 2
+
+
+def test_all_empty_returns_empty_text():
+    racer = make_racer()
+    assert racer.race(b"wav", {"aliyun": engine(""), "whisper": engine("  ")}) in ("", "  ")
+    assert racer.get_stats()["no_winner"] == 1
+
+
+def test_all_failed_raises_the_error():
+    racer = make_racer()
+    with pytest.raises(RuntimeError):
+        racer.race(b"wav", {"aliyun": engine(None, error=RuntimeError("阿里云失败")),
+                            "whisper": engine(None, error=RuntimeError("Whisper失败"))})
+    assert racer.get_stats()["no_winner"] == 1
+
+
+def test_timeout_without_result():
+    racer = make_racer(timeout=0.05)
+    with pytest.raises(TimeoutError):
+        racer.race(b"wav", {"aliyun": engine("阿里云", 0.3)})
+
+
+def test_queued_engine_is_cancelled_on_timeout():
+    # 只有一个工作线程时第二个引擎还在排队，超时后直接取消；已在执行的引擎不能取消
+    racer = make_racer(workers=1, timeout=0.05)
+    with pytest.raises(TimeoutError):
+        racer.race(b"wav", {"aliyun": engine("阿里云", 0.3), "whisper": engine("本地")})
+    stats = racer.get_stats()
+    assert stats["no_winner"] == 1
+    assert stats["engines"]["whisper"]["cancelled"] == 1
+    assert stats["engines"]["aliyun"]["cancelled"] == 0
+
+
+def test_loser_is_cancelled_or_recorded_after_win():
+    # 胜出时排队中的引擎被取消，已开始执行的引擎完成后只记录耗时，两者必居其一
+    racer = make_racer(workers=1)
+    assert racer.race(b"wav", {"aliyun": engine("阿里云", 0.05), "whisper": engine("本地")}) == "阿里云"
+    time.sleep(0.1)
+    stats = racer.get_stats()["engines"]
+    assert stats["whisper"]["cancelled"] + stats["whisper"]["completed"] == 1
+    assert stats["whisper"]["wins"] == 0
+    assert stats["aliyun"]["avg_latency"] >= 0.05
+
+
+def test_no_engines_raises():
+    with pytest.raises(ValueError):
+        make_racer().race(b"wav", {})
@@ -0,0 +1,202 @@
+"""
+实时语音识别会话的单元测试：以按音频时长返回文本的假识别函数代替识别引擎，检查抖动缓冲、稳定前缀、结束录音和重新录制
+"""
+import numpy as np
+import pytest
+
+from app.services.asr_session import AsrSessionManager
+from app.utils.audio_vad import decode_wav, encode_wav
+
+RATE = 16000
+SENTENCE = "我在上一家公司负责订单系统的性能优化把接口延迟从两百毫秒降到了五十毫秒"
+CONFIG = {
+    "jitter_chunks": 2,
+    "min_window": 2,
+    "max_window": 10,
+    "window_factor": 2,
+    "pause_ms": 500,
+    "final_wait": 5,
+    "reuse_tolerance": 1,
+    "ttl": 120
+}
+VAD_CONFIG = {
+    "enabled": True,
+    "frame_ms": 30,
+    "energy_threshold_db": -40,
+    "fricative_margin_db": 10,
+    "fricative_zcr": 0.25,
+    "min_speech_ms": 90,
+    "padding_ms": 200
+}
+
+
+class FakeTranscriber:
+    """每秒音频识别出两个字，记录每次识别的音频时长"""
+
+    def __init__(self):
+        self.durations = []
+
+    def __call__(self, audio):
+        samples, rate = decode_wav(audio)
+        seconds = len(samples) / rate
+        self.durations.append(seconds)
+        return SENTENCE[:int(round(seconds * 2))]
+
+
+def speech_chunk(index, seconds=1.0):
+    t = (np.arange(int(RATE * seconds)) + index * int(RATE * seconds)) / RATE
+    return encode_wav((0.1 * np.sin(2 * np.pi * 220 * t)).astype(np.float32), RATE)
+
+
+def silent_chunk(seconds=1.0):
+    return encode_wav(np.zeros(int(RATE * seconds), dtype=np.float32), RATE)
+
+
+def make_manager():
+    return AsrSessionManager(config=CONFIG, vad_config=VAD_CONFIG), FakeTranscriber()
+
+
+def test_out_of_order_chunks_are_reordered():
+    manager, transcribe = make_manager()
+    result = manager.feed("iv", 1, 1, speech_chunk(1), transcribe)
+    # 分段1先到达时等待分段0，不识别
+    assert result["transcribedText"] == ""
+    assert transcribe.durations == []
+    manager.feed("iv", 1, 0, speech_chunk(0), transcribe)
+    assert transcribe.durations == [2.0]
+    assert manager.get_stats()["lost_chunks"] == 0
+
+
+def test_lost_chunk_is_skipped_after_jitter_buffer():
+    manager, transcribe = make_manager()
+    manager.feed("iv", 1, 0, speech_chunk(0), transcribe)
+    manager.feed("iv", 1, 2, speech_chunk(2), transcribe)
+    assert manager.get_stats()["lost_chunks"] == 0
+    manager.feed("iv", 1, 3, speech_chunk(3), transcribe)
+    assert manager.get_stats()["lost_chunks"] == 1
+    # 跳过分段1后拼接分段0、2、3
+    assert transcribe.durations[-1] == 3.0
+
+
+def test_duplicate_chunks_are_counted_once():
+    # 同一次录音（recordingId相同）重发的分段0是重复分段
+    manager, transcribe = make_manager()
+    manager.feed("iv", 1, 0, speech_chunk(0), transcribe, recording_id="r1")
+    manager.feed("iv", 1, 0, speech_chunk(0), transcribe, recording_id="r1")
+    manager.feed("iv", 1, 1, speech_chunk(1), transcribe, recording_id="r1")
+    stats = manager.get_stats()
+    assert stats["chunks"] == 3
+    assert stats["duplicates"] == 1
+    assert transcribe.durations == [2.0]
+
+
+def test_stable_prefix_only_grows_and_returns_deltas():
+    manager, transcribe = make_manager()
+    deltas = []
+    previous = ""
+    for index in range(6):
+        result = manager.feed("iv", 1, index, speech_chunk(index), transcribe)
+        assert result["stableText"].startswith(previous)
+        assert result["partialText"].startswith(result["stableText"])
+        deltas.append(result["transcribedText"])
+        previous = result["stableText"]
+    assert previous == SENTENCE[:8]
+    assert "".join(deltas) == previous
+
+    result = manager.feed("iv", 1, 6, speech_chunk(6), transcribe, final=True)
+    assert result["final"]
+    assert result["stableText"] == SENTENCE[:14]
+    assert "".join(deltas) + result["transcribedText"] == SENTENCE[:14]
+
+
+def test_take_transcript_recognizes_the_tail_and_removes_the_session():
+    manager, transcribe = make_manager()
+    for index in range(3):
+        manager.feed("iv", 1, index, speech_chunk(index), transcribe)
+    assert manager.take_transcript("iv", 1, transcribe) == SENTENCE[:6]
+    assert transcribe.durations[-1] == 3.0
+    assert manager.take_transcript("iv", 1, transcribe) is None
+    stats = manager.get_stats()
+    assert stats["reused_transcripts"] == 1
+    assert stats["sessions"] == 0
+
+
+def test_silence_is_not_sent_to_the_transcriber():
+    manager, transcribe = make_manager()
+    manager.feed("iv", 1, 0, silent_chunk(), transcribe)
+    result = manager.feed("iv", 1, 1, silent_chunk(), transcribe, final=True)
+    assert result["stableText"] == ""
+    assert transcribe.durations == []
+    assert manager.get_stats()["silent_windows"] >= 1
+
+
+def test_failed_recognition_keeps_the_previous_hypothesis():
+    manager, transcribe = make_manager()
+    manager.feed("iv", 1, 0, speech_chunk(0), transcribe)
+    manager.feed("iv", 1, 1, speech_chunk(1), transcribe)
+
+    def failing(audio):
+        raise RuntimeError("识别服务不可用")
+
+    manager.feed("iv", 1, 2, speech_chunk(2), failing)
+    with pytest.raises(RuntimeError):
+        manager.feed("iv", 1, 3, speech_chunk(3), failing, final=True)
+    # 识别失败时确认上次的识别结果
+    assert manager.take_transcript("iv", 1, transcribe) == SENTENCE[:4]
+
+
+def test_non_wav_chunks_are_left_to_the_caller():
+    manager, transcribe = make_manager()
+    assert manager.feed("iv", 1, 0, b"webm data", transcribe) is None
+    assert manager.discard("iv", 1) is None
+
+
+def record(manager, transcribe, chunks, recording_id=None, final=False):
+    for index in range(chunks):
+        result = manager.feed("iv", 1, index, speech_chunk(index), transcribe,
+                              final=final and index == chunks - 1, recording_id=recording_id)
+    return result
+
+
+def test_recording_the_same_question_twice_uses_the_second_recording():
+    manager, transcribe = make_manager()
+    record(manager, transcribe, 3, recording_id="r1")
+    # 第一次录音未结束就重新录制
+    result = record(manager, transcribe, 2, recording_id="r2", final=True)
+    assert result["stableText"] == SENTENCE[:4]
+    assert manager.take_transcript("iv", 1, transcribe, recording_id="r2") == SENTENCE[:4]
+    stats = manager.get_stats()
+    assert stats["restarts"] == 1
+    assert stats["duplicates"] == 0
+
+
+def test_chunk_zero_without_recording_id_restarts_the_session():
+    manager, transcribe = make_manager()
+    record(manager, transcribe, 3)
+    record(manager, transcribe, 2)
+    assert manager.take_transcript("iv", 1, transcribe, audio=speech_chunk(0, seconds=2)) == SENTENCE[:4]
+    assert manager.get_stats()["restarts"] == 1
+
+
+def test_transcript_of_another_recording_is_not_reused():
+    manager, transcribe = make_manager()
+    record(manager, transcribe, 3, recording_id="r1", final=True)
+    assert manager.take_transcript("iv", 1, transcribe, recording_id="r2") is None
+    # 会话已丢弃，调用方识别提交的录音
+    assert manager.take_transcript("iv", 1, transcribe, recording_id="r1") is None
+    assert manager.get_stats()["stale_transcripts"] == 1
+
+
+def test_reuse_without_recording_id_checks_the_duration():
+    manager, transcribe = make_manager()
+    record(manager, transcribe, 3, final=True)
+    assert manager.take_transcript("iv", 1, transcribe, audio=speech_chunk(0, seconds=5)) is None
+
+    record(manager, transcribe, 3, final=True)
+    assert manager.take_transcript("iv", 1, transcribe, audio=b"webm data") is None
+
+    record(manager, transcribe, 3, final=True)
+    assert manager.take_transcript("iv", 1, transcribe, audio=speech_chunk(0, seconds=3.5)) == SENTENCE[:6]
+    stats = manager.get_stats()
+    assert stats["stale_transcripts"] == 2
+    assert stats["reused_transcripts"] == 1
@@ -0,0 +1,100 @@
+"""
+服务端音频解码的单元测试：检查重采样的长度和抗混叠、WAV归一化，以及用PyAV解码webm/opus
+"""
+import io
+import wave
+
+import numpy as np
+import pytest
+
+from app.utils.audio_decode import AudioDecoder, resample
+from app.utils.audio_vad import decode_wav, encode_wav
+
+CONFIG = {"enabled": True, "sample_rate": 16000, "ffmpeg_path": "ffmpeg", "timeout": 30}
+
+
+def tone(frequency, rate, seconds=1.0, amplitude=0.5):
+    t = np.arange(int(rate * seconds)) / rate
+    return (amplitude * np.sin(2 * np.pi * frequency * t)).astype(np.float32)
+
+
+def rms(samples):
+    # 去掉两端滤波器的边缘效应
+    middle = samples[len(samples) // 10:-len(samples) // 10]
+    return float(np.sqrt(np.mean(np.square(middle, dtype=np.float64))))
+
+
+def stereo_wav(samples, rate):
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav_file:
+        wav_file.setnchannels(2)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(rate)
+        wav_file.writeframes((np.repeat(samples[:, None], 2, axis=1) * 32767).astype("<i2").tobytes())
+    return buffer.getvalue()
+
+
+def test_resample_length():
+    samples = tone(440, 48000)
+    assert len(resample(samples, 48000, 16000)) == 16000
+    assert len(resample(tone(440, 44100), 44100, 16000)) == 16000
+    assert len(resample(tone(440, 8000), 8000, 16000)) == 16000
+    assert resample(samples, 16000, 16000) is samples
+
+
+def test_resample_keeps_passband_and_removes_aliases():
+    # 4kHz在语音频带内，电平基本不变；12kHz高于16kHz的奈奎斯特频率，应被低通滤掉而不是混叠到4kHz
+    assert rms(resample(tone(4000, 48000), 48000, 16000)) == pytest.approx(0.5 / np.sqrt(2), rel=0.05)
+    assert rms(resample(tone(12000, 48000), 48000, 16000)) < 0.01
+
+
+def test_normalize_downmixes_and_resamples_wav():
+    decoder = AudioDecoder(CONFIG)
+    output = decoder.normalize(stereo_wav(tone(440, 48000), 48000))
+    samples, rate = decode_wav(output)
+    assert rate == 16000
+    assert len(samples) == 16000
+    with wave.open(io.BytesIO(output), "rb") as wav_file:
+        assert wav_file.getnchannels() == 1
+    stats = decoder.get_stats()
+    assert stats["wav"] == 1
+    assert stats["size_ratio"] < 0.2
+
+
+def test_normalize_passes_through_target_format_and_junk():
+    decoder = AudioDecoder(CONFIG)
+    data = encode_wav(tone(440, 16000), 16000)
+    assert decoder.normalize(data) is data
+    assert decoder.normalize(b"") == b""
+    assert AudioDecoder(dict(CONFIG, enabled=False)).normalize(b"junk") == b"junk"
+    assert decoder.get_stats()["passthrough"] == 1
+
+
+def test_undecodable_audio_passes_through():
+    decoder = AudioDecoder(CONFIG)
+    assert decoder.normalize(b"not audio at all") == b"not audio at all"
+    assert decoder.decode(b"not audio at all") is None
+    assert decoder.get_stats()["failed"] == 2
+
+
+def test_webm_opus_is_decoded_in_memory():
+    av = pytest.importorskip("av")
+    buffer = io.BytesIO()
+    with av.open(buffer, mode="w", format="webm") as container:
+        stream = container.add_stream("libopus", rate=48000)
+        stream.layout = "mono"
+        samples = tone(440, 48000)
+        for start in range(0, len(samples), 960):
+            frame = av.AudioFrame.from_ndarray(samples[None, start:start + 960], format="flt", layout="mono")
+            frame.sample_rate = 48000
+            for packet in stream.encode(frame):
+                container.mux(packet)
+        for packet in stream.encode(None):
+            container.mux(packet)
+
+    decoder = AudioDecoder(CONFIG)
+    decoded, rate = decode_wav(decoder.normalize(buffer.getvalue()))
+    assert rate == 16000
+    assert abs(len(decoded) - 16000) < 800
+    assert rms(decoded) == pytest.approx(0.5 / np.sqrt(2), rel=0.15)
+    assert decoder.get_stats()["pyav"] == 1
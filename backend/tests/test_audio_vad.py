@@ -0,0 +1,103 @@
+"""
+语音活动检测的单元测试：用合成的静音、纯音和噪声检查分帧判定、首尾裁剪和WAV编解码
+"""
+import io
+import wave
+
+import numpy as np
+
+from app.utils.audio_vad import VoiceActivityFilter, decode_wav, detect_speech, encode_wav
+
+RATE = 16000
+CONFIG = {
+    "enabled": True,
+    "frame_ms": 30,
+    "energy_threshold_db": -40,
+    "fricative_margin_db": 10,
+    "fricative_zcr": 0.25,
+    "min_speech_ms": 90,
+    "padding_ms": 200
+}
+
+
+def tone(seconds, frequency=220, db=-20):
+    t = np.arange(int(RATE * seconds)) / RATE
+    return (10 ** (db / 20) * np.sqrt(2) * np.sin(2 * np.pi * frequency * t)).astype(np.float32)
+
+
+def silence(seconds):
+    return np.zeros(int(RATE * seconds), dtype=np.float32)
+
+
+def noise(seconds, db):
+    rng = np.random.default_rng(0)
+    return (10 ** (db / 20) * rng.standard_normal(int(RATE * seconds))).astype(np.float32)
+
+
+def test_silence_is_not_speech():
+    result = detect_speech(silence(2), RATE, CONFIG)
+    assert not result.has_speech
+    assert result.total_ms == 2000
+    audio, result = VoiceActivityFilter(CONFIG).process(encode_wav(silence(2), RATE))
+    assert audio == b""
+    assert not result.has_speech
+
+
+def test_short_click_is_below_min_speech():
+    # 30毫秒的短促声音最多落在两帧中，累计不足min_speech_ms
+    samples = np.concatenate([silence(1), tone(0.03), silence(1)])
+    assert not detect_speech(samples, RATE, CONFIG).has_speech
+
+
+def test_tone_is_trimmed_with_padding():
+    samples = np.concatenate([silence(1.5), tone(1), silence(1.5)])
+    result = detect_speech(samples, RATE, CONFIG)
+    assert result.has_speech
+    assert 960 <= result.speech_ms <= 1050
+    # 两端各保留约200毫秒静音（以30毫秒分帧对齐）
+    assert abs(result.start - int(1.3 * RATE)) <= int(0.03 * RATE)
+    assert abs(result.end - int(2.7 * RATE)) <= int(0.03 * RATE)
+
+    vad = VoiceActivityFilter(CONFIG)
+    audio, _ = vad.process(encode_wav(samples, RATE))
+    trimmed, rate = decode_wav(audio)
+    assert rate == RATE
+    assert len(trimmed) == result.end - result.start
+    stats = vad.get_stats()
+    assert stats["checked"] == 1
+    assert 2500 <= stats["trimmed_ms"] <= 2700
+
+
+def test_low_energy_fricative_needs_high_zero_crossing_rate():
+    # -45dBFS低于能量阈值但在清辅音容差内：白噪声过零率高算语音，低频纯音不算
+    assert detect_speech(noise(1, -45), RATE, CONFIG).has_speech
+    assert not detect_speech(tone(1, frequency=200, db=-45), RATE, CONFIG).has_speech
+    assert not detect_speech(noise(1, -55), RATE, CONFIG).has_speech
+
+
+def test_undecodable_audio_passes_through():
+    vad = VoiceActivityFilter(CONFIG)
+    assert vad.process(b"webm data") == (b"webm data", None)
+    assert vad.get_stats()["undecodable"] == 1
+    disabled = VoiceActivityFilter(dict(CONFIG, enabled=False))
+    data = encode_wav(silence(1), RATE)
+    assert disabled.process(data) == (data, None)
+
+
+def test_wav_round_trip_and_stereo_downmix():
+    samples = tone(0.5)
+    decoded, rate = decode_wav(encode_wav(samples, RATE))
+    assert rate == RATE
+    assert np.max(np.abs(decoded - samples)) < 1e-3
+
+    stereo = np.stack([samples, np.zeros_like(samples)], axis=1)
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav_file:
+        wav_file.setnchannels(2)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(RATE)
+        wav_file.writeframes((stereo * 32767).astype("<i2").tobytes())
+    mono, _ = decode_wav(buffer.getvalue())
+    assert len(mono) == len(samples)
+    assert np.max(np.abs(mono - samples / 2)) < 1e-3
+    assert decode_wav(b"not a wav") is None
@@ -0,0 +1,144 @@
+"""
+对话压缩的单元测试：token估算和截断、按预算渲染历史，以及后台摘要（以假网关代替大模型）
+"""
+import time
+from concurrent.futures import Future
+
+from app.services.conversation_compactor import (
+    ConversationCompactor, TRUNCATED_MARKER, estimate_tokens, truncate_to_tokens
+)
+from app.services.session_store import MemorySessionStore
+
+CONFIG = {
+    "keep_turns": 2,
+    "summary_max_tokens": 100,
+    "prompt_token_budget": 400,
+    "resume_token_budget": 100
+}
+
+
+class FakeGateway:
+    """submit立即返回预设结果的假网关，记录收到的调用"""
+
+    def __init__(self, result="摘要"):
+        self.result = result
+        self.calls = []
+
+    def submit(self, call):
+        self.calls.append(call)
+        future = Future()
+        if isinstance(self.result, Exception):
+            future.set_exception(self.result)
+        else:
+            future.set_result(self.result)
+        return future
+
+
+def new_session(turns, resume="简历" * 10):
+    return {
+        "resume_content": resume,
+        "question_answers": [{"question": f"问题{i}", "answer": f"回答{i}"} for i in range(turns)]
+    }
+
+
+def test_estimate_tokens():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("你好，世界") == 5
+    assert estimate_tokens("abcdefgh") == 2
+    assert estimate_tokens("面试abcd") == 3
+
+
+def test_truncate_to_tokens():
+    assert truncate_to_tokens("短文本", 10) == "短文本"
+    text = truncate_to_tokens("很长的回答" * 20, 20)
+    assert text.endswith(TRUNCATED_MARKER)
+    assert estimate_tokens(text) <= 20
+    assert truncate_to_tokens("很长的回答" * 20, 3) == ""
+
+
+def contents(messages):
+    return [message["content"] for message in messages]
+
+
+def test_history_messages_keep_recent_turns_within_budget():
+    compactor = ConversationCompactor(CONFIG, gateway=FakeGateway())
+    session = new_session(6)
+    messages = compactor.history_messages(session)
+    assert [message["role"] for message in messages[:2]] == ["assistant", "user"]
+    assert contents(messages)[-2:] == ["问题5", "回答5"]
+
+    messages = compactor.history_messages(session, budget=18)
+    assert contents(messages) == ["（更早的3轮问答已省略）", "问题3", "回答3", "问题4", "回答4", "问题5", "回答5"]
+    assert compactor.history_messages(new_session(0)) == []
+
+
+def test_history_messages_start_with_summary():
+    compactor = ConversationCompactor(CONFIG, gateway=FakeGateway())
+    session = dict(new_session(6), summary="候选人做过订单系统", summarized_turns=3)
+    messages = compactor.history_messages(session)
+    assert messages[0] == {"role": "system", "content": "之前3轮问答的摘要：候选人做过订单系统"}
+    assert contents(messages)[1:3] == ["问题3", "回答3"]
+
+
+def test_history_is_append_only_between_compactions():
+    # 两次合并之间，新一轮只在末尾追加消息，已发送的消息保持不变（上游前缀缓存可以命中）
+    compactor = ConversationCompactor(CONFIG, gateway=FakeGateway())
+    session = dict(new_session(4), summary="摘要", summarized_turns=2)
+    before = compactor.history_messages(session)
+    session["question_answers"].append({"question": "问题4", "answer": "回答4"})
+    after = compactor.history_messages(session)
+    assert after[:len(before)] == before
+
+
+def test_resume_and_transcript_respect_budget():
+    compactor = ConversationCompactor(CONFIG, gateway=FakeGateway())
+    resume = compactor.fit_resume("很长的简历" * 100)
+    assert estimate_tokens(resume) <= CONFIG["resume_token_budget"]
+    assert resume == compactor.fit_resume("很长的简历" * 100)
+
+    session = new_session(8, resume="很长的简历" * 100)
+    session["question_answers"][0]["answer"] = "很长的回答" * 100
+    messages = compactor.transcript_messages(session, budget=120)
+    assert len(messages) == 16
+    assert sum(estimate_tokens(text) for text in contents(messages)) <= 120
+    assert messages[0] == {"role": "assistant", "content": "问题0"}
+
+
+def stored_session(store, turns, **meta):
+    session = dict(new_session(turns), interview_id="iv", **meta)
+    store.create("iv", session)
+    return store.get("iv")
+
+
+def test_maybe_compact_merges_older_turns():
+    store = MemorySessionStore({"backend": "memory", "ttl": 60})
+    gateway = FakeGateway("新摘要")
+    compactor = ConversationCompactor(CONFIG, gateway=gateway, store=store)
+    compactor.maybe_compact(stored_session(store, 5))
+    session = store.get("iv")
+    assert session["summary"] == "新摘要"
+    assert session["summarized_turns"] == 3
+    assert session["summary_pending_since"] is None
+    # 最近keep_turns轮不参与合并
+    prompt = gateway.calls[0].messages[-1]["content"]
+    assert "问题2" in prompt and "问题3" not in prompt
+
+    compactor.maybe_compact(session)
+    assert len(gateway.calls) == 1
+
+
+def test_maybe_compact_skips_pending_and_keeps_summary_on_failure():
+    store = MemorySessionStore({"backend": "memory", "ttl": 60})
+    compactor = ConversationCompactor(CONFIG, gateway=FakeGateway(RuntimeError("上游超时")), store=store)
+    # 其他进程正在更新摘要时不重复发起
+    compactor.maybe_compact(stored_session(store, 5, summary="旧摘要", summarized_turns=1,
+                                           summary_pending_since=time.time()))
+    assert compactor.gateway.calls == []
+
+    store.update("iv", lambda meta: meta.update(summary_pending_since=None))
+    compactor.maybe_compact(store.get("iv"))
+    session = store.get("iv")
+    assert len(compactor.gateway.calls) == 1
+    assert session["summary"] == "旧摘要"
+    assert session["summarized_turns"] == 1
+    assert session["summary_pending_since"] is None
@@ -0,0 +1,61 @@
+"""
+大模型响应缓存的单元测试：LRU淘汰、TTL过期和磁盘层
+"""
+import time
+
+from app.services.llm_cache import LLMCache
+
+
+def make_cache(max_entries=2, disk_path=""):
+    return LLMCache({"max_entries": max_entries, "disk_path": disk_path})
+
+
+def test_make_key_depends_on_request_parameters():
+    messages = [{"role": "user", "content": "你好"}]
+    key = LLMCache.make_key("deepseek-chat", messages, 0.7, 100)
+    assert key == LLMCache.make_key("deepseek-chat", [dict(messages[0])], 0.7, 100)
+    assert key != LLMCache.make_key("deepseek-chat", messages, 0.3, 100)
+    assert key != LLMCache.make_key("deepseek-chat", messages, 0.7, 200)
+
+
+def test_lru_evicts_least_recently_used():
+    cache = make_cache(max_entries=2)
+    cache.set("a", "A", ttl=60)
+    cache.set("b", "B", ttl=60)
+    assert cache.get("a") == "A"  # a变为最近使用
+    cache.set("c", "C", ttl=60)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "A"
+    assert cache.get("c") == "C"
+    stats = cache.get_stats()
+    assert stats["evictions"] == 1
+    assert stats["entries"] == 2
+
+
+def test_expired_entry_is_a_miss():
+    cache = make_cache()
+    cache.set("a", "A", ttl=0.05)
+    assert cache.get("a") == "A"
+    time.sleep(0.1)
+    assert cache.get("a") is None
+    stats = cache.get_stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+
+
+def test_disk_layer_survives_a_new_instance(tmp_path):
+    make_cache(disk_path=str(tmp_path)).set("a", "磁盘内容", ttl=60)
+
+    cache = make_cache(disk_path=str(tmp_path))
+    assert cache.get("a") == "磁盘内容"
+    assert cache.get_stats()["disk_hits"] == 1
+    # 磁盘命中后回填进程内缓存
+    assert cache.get("a") == "磁盘内容"
+    assert cache.get_stats()["hits"] == 1
+
+
+def test_expired_disk_entry_is_ignored(tmp_path):
+    make_cache(disk_path=str(tmp_path)).set("a", "A", ttl=0.05)
+    time.sleep(0.1)
+    assert make_cache(disk_path=str(tmp_path)).get("a") is None
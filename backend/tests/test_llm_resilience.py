@@ -0,0 +1,164 @@
+"""
+大模型调用容错的单元测试：熔断器状态机、探测令牌、重试和对冲（上游以抛出openai异常的函数代替）
+"""
+import time
+
+import httpx
+import openai
+import pytest
+
+from app.services.llm_resilience import CircuitBreaker, CircuitOpenError, LLMResilience, upstream_outcome
+from app.services.llm_gateway import LLMGatewayBusyError
+
+REQUEST = httpx.Request("POST", "https://api.example.com/v1/chat/completions")
+
+CONFIG = {
+    "max_attempts": 3,
+    "backoff_base": 0.001,
+    "backoff_max": 0.001,
+    "hedge_enabled": False,
+    "hedge_percentile": 0.95,
+    "hedge_min_samples": 3,
+    "hedge_min_delay": 0.02,
+    "hedge_sample_size": 10,
+    "hedge_workers": 4,
+    "breaker_window": 10,
+    "breaker_min_requests": 2,
+    "breaker_error_rate": 0.5,
+    "breaker_open_seconds": 0.05
+}
+
+
+def connection_error():
+    return openai.APIConnectionError(request=REQUEST)
+
+
+def status_error(cls, status):
+    return cls("error", response=httpx.Response(status, request=REQUEST), body=None)
+
+
+@pytest.fixture
+def breaker():
+    breaker = CircuitBreaker(CONFIG)
+    breaker.record(True)
+    breaker.record(True)
+    assert breaker.get_stats()["state"] == "open"
+    return breaker
+
+
+def test_upstream_outcome_classification():
+    assert upstream_outcome(connection_error()) is True
+    assert upstream_outcome(status_error(openai.InternalServerError, 500)) is True
+    assert upstream_outcome(status_error(openai.RateLimitError, 429)) is True
+    # 上游正常返回的错误响应说明上游可用
+    assert upstream_outcome(status_error(openai.BadRequestError, 400)) is False
+    # 没有到达上游的本地异常不计入
+    assert upstream_outcome(LLMGatewayBusyError("busy")) is None
+    assert upstream_outcome(ValueError("parse")) is None
+
+
+def test_breaker_opens_on_error_rate_and_rejects():
+    breaker = CircuitBreaker(dict(CONFIG, breaker_open_seconds=60))
+    assert breaker.allow() is None
+    breaker.record(False)
+    breaker.record(True)
+    assert breaker.get_stats()["state"] == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+    assert breaker.get_stats()["rejected"] == 1
+
+
+def test_half_open_allows_a_single_probe(breaker):
+    time.sleep(0.06)
+    token = breaker.allow()
+    assert token is not None
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+
+    breaker.record(False, token)
+    assert breaker.get_stats()["state"] == "closed"
+    assert breaker.allow() is None
+
+
+def test_failed_probe_reopens(breaker):
+    time.sleep(0.06)
+    breaker.record(True, breaker.allow())
+    assert breaker.get_stats()["state"] == "open"
+
+
+def test_results_without_the_probe_token_are_ignored(breaker):
+    time.sleep(0.06)
+    token = breaker.allow()
+
+    # 打开前已发出的请求、本地异常都不能改变状态或占用探测名额
+    breaker.record(False)
+    breaker.record_error(LLMGatewayBusyError("busy"))
+    assert breaker.get_stats()["state"] == "half_open"
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+
+    breaker.record(False, token)
+    assert breaker.get_stats()["state"] == "closed"
+
+
+def test_local_error_releases_the_probe(breaker):
+    time.sleep(0.06)
+    breaker.record_error(LLMGatewayBusyError("busy"), breaker.allow())
+    assert breaker.get_stats()["state"] == "half_open"
+    # 探测令牌已交还，下一个请求可以继续探测
+    assert breaker.allow() is not None
+
+
+def test_local_errors_are_not_recorded_while_closed():
+    breaker = CircuitBreaker(CONFIG)
+    for _ in range(5):
+        breaker.record_error(LLMGatewayBusyError("busy"))
+    assert breaker.get_stats()["window_requests"] == 0
+
+
+def test_call_retries_upstream_errors():
+    resilience = LLMResilience(dict(CONFIG, breaker_min_requests=100))
+    attempts = []
+
+    def func():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise connection_error()
+        return "ok"
+
+    assert resilience.call(func, "test.route") == "ok"
+    assert len(attempts) == 3
+    assert resilience.get_stats()["retries"] == 2
+
+
+def test_call_does_not_retry_client_errors():
+    resilience = LLMResilience(dict(CONFIG, breaker_min_requests=100))
+    attempts = []
+
+    def func():
+        attempts.append(1)
+        raise status_error(openai.BadRequestError, 400)
+
+    with pytest.raises(openai.BadRequestError):
+        resilience.call(func, "test.route")
+    assert len(attempts) == 1
+    assert resilience.get_stats()["circuit_breaker"]["window_error_rate"] == 0.0
+
+
+def test_slow_call_is_hedged():
+    resilience = LLMResilience(dict(CONFIG, hedge_enabled=True, breaker_min_requests=100))
+    for _ in range(3):
+        resilience.latency.add("test.route", 0.01)
+    calls = []
+
+    def func():
+        calls.append(1)
+        if len(calls) == 1:
+            time.sleep(0.5)
+            return "primary"
+        return "hedge"
+
+    assert resilience.call(func, "test.route") == "hedge"
+    stats = resilience.get_stats()
+    assert stats["hedges"] == 1
+    assert stats["hedge_wins"] == 1
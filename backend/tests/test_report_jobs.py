@@ -0,0 +1,115 @@
+"""
+面试报告任务队列的单元测试：任务执行和失败、用户隔离、排队上限，以及长轮询（本进程事件和跨进程读取存储）
+"""
+import threading
+import time
+
+import pytest
+
+from config import REPORT_JOB_CONFIG
+from app.services.report_jobs import ReportJobQueue, ReportQueueFullError
+from app.services.session_store import MemorySessionStore, session_store
+
+CONFIG = {"workers": 2, "max_pending": 8, "max_wait": 2, "poll_interval": 0.01}
+
+
+@pytest.fixture
+def store():
+    return MemorySessionStore({"backend": "memory", "ttl": 60})
+
+
+def test_long_poll_returns_the_finished_report(store):
+    queue = ReportJobQueue(CONFIG, store=store)
+    release = threading.Event()
+
+    def generate(score):
+        release.wait(1)
+        return {"overallScore": score}
+
+    job_id = queue.submit("u1", generate, 80)
+    assert queue.get(job_id, "u1")["status"] == "pending"
+
+    threading.Timer(0.05, release.set).start()
+    job = queue.get(job_id, "u1", wait=1)
+    assert job == {"jobId": job_id, "status": "done", "report": {"overallScore": 80}}
+    stats = queue.get_stats()
+    assert stats["completed"] == 1
+    assert stats["live_jobs"] == 1
+
+
+def test_failed_job_and_other_users(store):
+    queue = ReportJobQueue(CONFIG, store=store)
+
+    def generate():
+        raise RuntimeError("上游超时")
+
+    job_id = queue.submit(1, generate)
+    job = queue.get(job_id, 1, wait=1)
+    assert job["status"] == "failed"
+    assert job["report"] is None
+    # 其他用户查询不到任务，用户ID按字符串比较
+    assert queue.get(job_id, 2) is None
+    assert queue.get(job_id, "1")["status"] == "failed"
+    assert queue.get("missing", 1) is None
+    assert queue.get_stats()["failed"] == 1
+
+
+def test_rejects_when_too_many_jobs_are_queued(store):
+    queue = ReportJobQueue(dict(CONFIG, workers=1, max_pending=1), store=store)
+    release = threading.Event()
+    running = queue.submit("u1", release.wait, 1)
+    time.sleep(0.05)
+    queued = queue.submit("u1", dict)
+    with pytest.raises(ReportQueueFullError):
+        queue.submit("u1", dict)
+    assert queue.get_stats()["rejected"] == 1
+
+    release.set()
+    assert queue.get(running, "u1", wait=1)["status"] == "done"
+    assert queue.get(queued, "u1", wait=1)["report"] == {}
+
+
+def test_wait_is_capped_at_max_wait(store):
+    queue = ReportJobQueue(dict(CONFIG, max_wait=0.1), store=store)
+    release = threading.Event()
+    job_id = queue.submit("u1", release.wait, 5)
+    started = time.time()
+    assert queue.get(job_id, "u1", wait=30)["status"] == "pending"
+    assert time.time() - started < 1
+    release.set()
+
+
+@pytest.mark.parametrize("wait", [float("nan"), float("inf"), -1])
+def test_invalid_wait_does_not_block(store, wait):
+    queue = ReportJobQueue(CONFIG, store=store)
+    release = threading.Event()
+    job_id = queue.submit("u1", release.wait, 5)
+    started = time.time()
+    assert queue.get(job_id, "u1", wait=wait)["status"] == "pending"
+    assert time.time() - started < 0.5
+    release.set()
+
+
+def test_job_from_another_process_is_polled_from_the_store(store):
+    # 两个队列共用存储，模拟任务由其他进程执行
+    worker = ReportJobQueue(CONFIG, store=store)
+    web = ReportJobQueue(CONFIG, store=store)
+    release = threading.Event()
+
+    def generate():
+        release.wait(1)
+        return {"overallScore": 90}
+
+    job_id = worker.submit("u1", generate)
+    threading.Timer(0.05, release.set).start()
+    assert web.get(job_id, "u1", wait=1)["report"] == {"overallScore": 90}
+
+
+def test_jobs_are_not_counted_as_sessions():
+    # 未指定存储时使用独立命名空间的任务存储，不占用会话存储
+    queue = ReportJobQueue(dict(REPORT_JOB_CONFIG, poll_interval=0.01))
+    live_sessions, _ = session_store.gauge()
+    job_id = queue.submit("u1", dict)
+    assert queue.get(job_id, "u1", wait=1)["status"] == "done"
+    assert session_store.gauge()[0] == live_sessions
+    assert queue.get_stats()["live_jobs"] == 1
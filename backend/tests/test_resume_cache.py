@@ -0,0 +1,90 @@
+"""
+共享简历缓存的单元测试：按内容摘要命中、LRU淘汰，以及未命中时按简历ID重新读取（包括简历已修改或已删除）（以假的读取函数代替文件）
+"""
+import pytest
+
+from app.services import resume_cache as resume_cache_module
+from app.services.resume_cache import ResumeCache
+
+
+class FakeResumeFiles:
+    """代替get_resume_content读取的简历文件，记录读取次数"""
+
+    def __init__(self):
+        self.contents = {}
+        self.reads = []
+
+    def get_resume_content(self, resume_id, resume_type):
+        self.reads.append((resume_id, resume_type))
+        return self.contents.get(resume_id)
+
+
+@pytest.fixture
+def resumes(monkeypatch):
+    files = FakeResumeFiles()
+    monkeypatch.setattr(resume_cache_module, "get_resume_content", files.get_resume_content)
+    return files
+
+
+def test_same_content_shares_one_entry(resumes):
+    cache = ResumeCache(max_entries=4)
+    key = cache.put("张三的简历")
+    assert cache.put("张三的简历") == key
+    assert key == ResumeCache.make_key("张三的简历")
+    assert cache.get(key, "r1") == "张三的简历"
+    stats = cache.get_stats()
+    assert stats["entries"] == 1
+    assert stats["hits"] == 1
+    assert resumes.reads == []
+
+
+def test_least_recently_used_resume_is_evicted(resumes):
+    cache = ResumeCache(max_entries=2)
+    first = cache.put("简历一")
+    second = cache.put("简历二")
+    cache.get(first, "r1")  # 简历一变为最近使用
+    cache.put("简历三")
+    assert cache.get_stats()["entries"] == 2
+
+    resumes.contents["r2"] = "简历二"
+    assert cache.get(second, "r2") == "简历二"
+    assert resumes.reads == [("r2", "optimized")]
+
+
+def test_miss_reloads_by_resume_id(resumes):
+    # 会话由其他进程创建时，本进程的缓存中没有这份简历
+    resumes.contents["r1"] = "张三的简历"
+    cache = ResumeCache(max_entries=4)
+    key = ResumeCache.make_key("张三的简历")
+    assert cache.get(key, "r1") == "张三的简历"
+    assert cache.get(key, "r1") == "张三的简历"
+    stats = cache.get_stats()
+    assert stats["misses"] == 1
+    assert stats["hits"] == 1
+    assert stats["reloads_changed"] == 0
+
+
+def test_changed_resume_is_cached_under_its_own_key(resumes):
+    resumes.contents["r1"] = "修改后的简历"
+    cache = ResumeCache(max_entries=4)
+    old_key = ResumeCache.make_key("原来的简历")
+    assert cache.get(old_key, "r1") == "修改后的简历"
+    assert cache.get_stats()["reloads_changed"] == 1
+    # 原摘要下没有写入新内容，新内容可以按自身的摘要命中
+    assert cache.get(ResumeCache.make_key("修改后的简历"), "r1") == "修改后的简历"
+    assert cache.get_stats()["hits"] == 1
+    resumes.contents["r2"] = "原来的简历"
+    assert cache.get(old_key, "r2") == "原来的简历"
+
+
+@pytest.mark.parametrize("missing", [None, ""])
+def test_deleted_resume_is_not_cached(resumes, missing):
+    resumes.contents["r1"] = missing
+    cache = ResumeCache(max_entries=4)
+    key = ResumeCache.make_key("张三的简历")
+    assert cache.get(key, "r1") == ""
+    assert cache.get(key, "r1") == ""
+    stats = cache.get_stats()
+    assert stats["entries"] == 0
+    assert stats["misses"] == 2
+    assert stats["reloads_missing"] == 2
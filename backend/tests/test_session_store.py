@@ -0,0 +1,143 @@
+"""
+面试会话存储的单元测试：memory、sqlite和redis（以fakeredis代替Redis服务）三种后端的读写语义和并发原子性
+"""
+import threading
+
+import pytest
+
+from app.services.session_store import SESSION_STORE_BACKENDS, SessionNotFoundError
+
+
+def make_config(backend, tmp_path, ttl=60):
+    return {
+        "backend": backend,
+        "ttl": ttl,
+        "sqlite_path": str(tmp_path / "sessions.db"),
+        "redis_url": "redis://localhost:6379/0",
+        "key_prefix": "test:session:",
+        "sweep_interval": 0
+    }
+
+
+def create_store(backend, tmp_path, ttl=60):
+    store = SESSION_STORE_BACKENDS[backend](make_config(backend, tmp_path, ttl))
+    if backend == "redis":
+        fakeredis = pytest.importorskip("fakeredis")
+        store._redis = fakeredis.FakeRedis(decode_responses=True)
+    return store
+
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+def store(request, tmp_path):
+    if request.param == "redis":
+        pytest.importorskip("redis")
+    return create_store(request.param, tmp_path)
+
+
+def new_session(turns=None):
+    return {"interview_id": "iv", "current_question_id": 1, "conversation_history": ["问题1"],
+            "question_answers": turns or []}
+
+
+def run_threads(count, target):
+    threads = [threading.Thread(target=target, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def test_create_and_get_round_trip(store):
+    store.create("iv", new_session([{"question": "问题1", "answer": "回答1"}]))
+    session = store.get("iv")
+    assert session["current_question_id"] == 1
+    assert session["conversation_history"] == ["问题1"]
+    assert session["question_answers"][0]["answer"] == "回答1"
+    assert store.get("missing") is None
+
+
+def test_snapshot_is_isolated_from_the_store(store):
+    store.create("iv", new_session())
+    session = store.get("iv")
+    session["conversation_history"].append("本地修改")
+    assert store.get("iv")["conversation_history"] == ["问题1"]
+
+
+def test_update_and_update_turn(store):
+    store.create("iv", new_session())
+    index = store.append_turn("iv", {"question": "问题1", "answer": "回答1", "feedback": None})
+    assert index == 0
+
+    def advance(meta):
+        meta["current_question_id"] += 1
+        return meta["current_question_id"]
+
+    assert store.update("iv", advance) == 2
+    assert store.update_turn("iv", index, lambda turn: turn.update(feedback="反馈")) is None
+    session = store.get("iv")
+    assert session["current_question_id"] == 2
+    assert session["question_answers"][0]["feedback"] == "反馈"
+
+
+def test_missing_session_or_turn_raises(store):
+    with pytest.raises(SessionNotFoundError):
+        store.update("missing", lambda meta: None)
+    with pytest.raises(SessionNotFoundError):
+        store.append_turn("missing", {})
+    store.create("iv", new_session())
+    with pytest.raises(SessionNotFoundError):
+        store.update_turn("iv", 3, lambda turn: None)
+
+
+def test_concurrent_append_turn_gets_distinct_indexes(store):
+    store.create("iv", new_session())
+    indexes = []
+    lock = threading.Lock()
+
+    def append(i):
+        index = store.append_turn("iv", {"question": f"问题{i}", "answer": f"回答{i}"})
+        with lock:
+            indexes.append(index)
+
+    run_threads(16, append)
+    assert sorted(indexes) == list(range(16))
+    turns = store.get("iv")["question_answers"]
+    assert len(turns) == 16
+    # 每个序号对应的记录就是追加时写入的那一条
+    assert {turn["answer"] for turn in turns} == {f"回答{i}" for i in range(16)}
+
+
+def test_concurrent_updates_are_atomic(store):
+    store.create("iv", new_session())
+    index = store.append_turn("iv", {"question": "问题1", "answer": "回答1", "extra_count": 0})
+
+    def bump(i):
+        store.update("iv", lambda meta: meta.update(current_question_id=meta["current_question_id"] + 1))
+        store.update_turn("iv", index, lambda turn: turn.update(extra_count=turn["extra_count"] + 1))
+
+    run_threads(16, bump)
+    session = store.get("iv")
+    assert session["current_question_id"] == 17
+    assert session["question_answers"][0]["extra_count"] == 16
+
+
+def test_delete_and_gauge(store):
+    store.create("a", new_session())
+    store.create("b", new_session())
+    count, size = store.gauge()
+    assert count == 2
+    assert size > 0
+    assert store.delete("a") is True
+    assert store.delete("a") is False
+    assert store.gauge()[0] == 1
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_expired_sessions_are_purged(backend, tmp_path):
+    store = create_store(backend, tmp_path, ttl=0)
+    store.create("iv", new_session())
+    assert store.get("iv") is None
+    with pytest.raises(SessionNotFoundError):
+        store.update("iv", lambda meta: None)
+    assert store.purge_expired() in (0, 1)
+    assert store.gauge()[0] == 0
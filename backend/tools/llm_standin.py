@@ -0,0 +1,473 @@
+#!/usr/bin/env python3
+"""
+本地DeepSeek替身服务
+
+实现OpenAI兼容的 POST /v1/chat/completions 接口（含stream=True的SSE流式输出），
+按请求内容识别调用来源，返回与各路由解析逻辑相匹配的预置结果，用于离线压测和基准测试，不消耗真实额度。
+
+- 延迟：首token延迟按指定分布采样，之后按token速率输出
+- 错误注入：按比例返回429/500/503等状态码，或挂起请求直到客户端超时
+- 前缀缓存：模拟DeepSeek的上下文硬盘缓存，与之前请求相同的消息前缀计入prompt_cache_hit_tokens
+
+只依赖标准库。使用方法：
+    python tools/llm_standin.py --port 18000 --latency 0.8 --latency-dist lognormal --tokens-per-second 40 --error-rate 0.02
+    DEEPSEEK_BASE_URL=http://127.0.0.1:18000/v1 python run.py
+
+GET /stats 返回替身服务自身的请求统计，POST /reset 清空统计和前缀缓存。
+"""
+import re
+import sys
+import json
+import math
+import time
+import uuid
+import random
+import hashlib
+import argparse
+import threading
+from collections import OrderedDict
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# 中日韩文字及全角标点
+_CJK_PATTERN = re.compile(r'[\u3000-\u303f\u4e00-\u9fff\uff00-\uffef]')
+
+# DeepSeek按64个token为单位缓存前缀
+CACHE_BLOCK_TOKENS = 64
+
+
+def estimate_tokens(text):
+    """粗略估算文本的token数：中文字符按1个token计，其余字符按4个字符1个token计"""
+    if not text:
+        return 0
+    cjk = len(_CJK_PATTERN.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+# ---------------------------------------------------------------------------
+# 预置结果：按prompt中的特征识别路由，返回该路由解析逻辑期望的格式
+# ---------------------------------------------------------------------------
+
+QUESTION_POOL = [
+    ("请介绍一个你最有成就感的项目，以及你在其中承担的角色", "简历深挖题"),
+    ("你在项目中是如何做性能优化的？请举一个具体的例子", "专业技能题"),
+    ("当需求频繁变更时，你是如何保证交付质量的？", "行为/情景题"),
+    ("请谈谈你对前端工程化的理解", "专业技能题"),
+    ("你为什么选择应聘这个岗位？", "高频必问题"),
+    ("遇到和同事意见不一致的情况，你通常怎么处理？", "行为/情景题")
+]
+
+
+def _resume_analysis():
+    return {
+        "score": random.randint(60, 95),
+        "diagnosis": [
+            {"type": "警告", "title": "缺乏量化结果", "description": "工作经历中缺乏具体的数据支撑"},
+            {"type": "建议", "title": "突出核心技能", "description": "建议把与目标岗位最相关的技能放在前面"}
+        ],
+        "keywords": ["JavaScript", "TypeScript", "Vue", "React", "Webpack", "Node.js", "性能优化", "工程化", "组件化", "Git"],
+        "starRewrite": [
+            {"situation": "在电商项目中", "task": "负责前端开发", "action": "使用Vue框架重构核心页面", "result": "首屏加载时间缩短40%"}
+        ],
+        "optimizedResume": "# 张三\n\n## 个人信息\n- 职位：前端开发工程师\n\n## 工作经历\n### 某互联网公司 前端开发工程师\n- 负责核心产品的前端开发，首屏加载时间缩短40%\n\n## 技能栈\n- **前端框架**：Vue、React\n"
+    }
+
+
+def _question_bank():
+    questions = [
+        {"id": index + 1, "content": content, "type": question_type, "answer": "建议使用STAR法则回答", "analysis": "考察候选人的项目经验和表达能力"}
+        for index, (content, question_type) in enumerate(QUESTION_POOL)
+    ]
+    return {"questions": questions, "total": len(questions)}
+
+
+def _interview_plan():
+    return {"questions": [{"content": content, "type": question_type} for content, question_type in QUESTION_POOL]}
+
+
+def _first_question():
+    return {"id": 1, "content": "请先做一个简单的自我介绍", "type": "高频必问题"}
+
+
+def _next_question():
+    content, question_type = random.choice(QUESTION_POOL)
+    return {"content": content, "type": question_type}
+
+
+def _interview_report():
+    return {
+        "professionalScore": random.randint(60, 95),
+        "logicScore": random.randint(60, 95),
+        "confidenceScore": random.randint(60, 95),
+        "matchScore": random.randint(60, 95),
+        "questionAnalysis": [
+            {"question": "请先做一个简单的自我介绍", "answer": "（略）", "feedback": "结构清晰，重点突出", "suggestion": "可以补充与岗位相关的量化成果"}
+        ],
+        "optimizationSuggestions": ["回答时多使用具体数据", "注意控制回答时长", "提前准备项目难点的展开说明", "反问环节准备2-3个有深度的问题"]
+    }
+
+
+def _answer_evaluation():
+    return {
+        "professionalScore": random.randint(60, 95),
+        "logicScore": random.randint(60, 95),
+        "confidenceScore": random.randint(60, 95),
+        "matchScore": random.randint(60, 95),
+        "feedback": random.choice(FEEDBACK_TEXTS),
+        "suggestion": "可以补充与岗位相关的量化成果",
+        "improvement": random.choice(["回答时多使用具体数据", "注意控制回答时长", "提前准备项目难点的展开说明", "先给结论再展开细节"])
+    }
+
+
+def _strategy_analysis():
+    return {"sections": [
+        {"title": "个人优势分析", "content": "候选人具备扎实的前端基础和完整的项目经验", "tips": ["突出项目中的量化成果", "准备技术选型的思考过程"]},
+        {"title": "面试应对策略", "content": "围绕岗位要求组织回答，体现与团队的匹配度", "tips": ["使用STAR法则", "主动引导到擅长的话题"]}
+    ]}
+
+
+def _strategy_questions():
+    return {"questions": [
+        {"content": "团队目前最大的技术挑战是什么？", "type": "团队文化", "explanation": "了解团队现状和岗位价值"},
+        {"content": "这个岗位在入职后三个月内的主要目标是什么？", "type": "岗位发展", "explanation": "明确期望，展示积极性"}
+    ]}
+
+
+FEEDBACK_TEXTS = [
+    "回答结构清晰，能结合具体项目说明自己的工作。不足之处是缺少量化结果，建议补充数据来支撑结论。",
+    "整体表达流畅，但对技术细节的阐述不够深入，可以进一步说明方案选择的原因和取舍。",
+    "回答切题，体现了一定的思考深度。建议在结尾总结收获，让回答更完整。"
+]
+
+SELF_INTRO_TEXT = "面试官您好，我叫张三，有四年前端开发经验，熟悉Vue和React技术栈。在上一家公司我主导了核心产品的前端重构，首屏加载时间缩短了40%。我希望能在贵公司继续深耕前端工程化方向，谢谢。"
+
+# (名称, 匹配关键字, 生成函数, 是否为JSON)，按顺序匹配，越具体的规则越靠前
+ROUTE_RULES = [
+    ("resume.analyze", "optimizedResume", _resume_analysis, True),
+    ("mock_interview.evaluate", '"improvement"', _answer_evaluation, True),
+    ("mock_interview.end", "professionalScore", _interview_report, True),
+    ("strategy.analysis", '"sections"', _strategy_analysis, True),
+    ("strategy.questions", '"explanation"', _strategy_questions, True),
+    ("question_bank.generate", '"analysis"', _question_bank, True),
+    ("mock_interview.plan", "规划本场面试", _interview_plan, True),
+    ("mock_interview.start", "第一个面试问题", _first_question, True),
+    ("mock_interview.next_question", "下一个问题内容", _next_question, True),
+    ("mock_interview.summary", "对话摘要", lambda: "候选人介绍了前端项目经验，回答结构清晰，但量化结果较少。", False),
+    ("mock_interview.follow_up", "改写为", lambda: random.choice(QUESTION_POOL)[0], False),
+    ("mock_interview.feedback", "给出反馈", lambda: random.choice(FEEDBACK_TEXTS), False),
+    ("self_intro.generate", "自我介绍", lambda: SELF_INTRO_TEXT, False)
+]
+
+
+def classify(messages):
+    """
+    根据消息内容识别调用来源路由
+
+    Returns:
+        tuple: (路由名称, 回复内容)
+    """
+    text = "\n".join(str(message.get("content", "")) for message in messages)
+    for name, keyword, build, is_json in ROUTE_RULES:
+        if keyword in text:
+            content = build()
+            return name, json.dumps(content, ensure_ascii=False) if is_json else content
+    return "unknown", random.choice(FEEDBACK_TEXTS)
+
+
+# ---------------------------------------------------------------------------
+# 延迟、错误注入和前缀缓存
+# ---------------------------------------------------------------------------
+
+class LatencyModel:
+    """首token延迟的分布采样"""
+
+    def __init__(self, mean, dist, jitter):
+        self.mean = mean
+        self.dist = dist
+        self.jitter = jitter
+
+    def sample(self):
+        """采样一次首token延迟（秒）"""
+        if self.mean <= 0:
+            return 0.0
+        if self.dist == "fixed":
+            value = self.mean
+        elif self.dist == "uniform":
+            value = random.uniform(self.mean * (1 - self.jitter), self.mean * (1 + self.jitter))
+        elif self.dist == "normal":
+            value = random.gauss(self.mean, self.mean * self.jitter)
+        elif self.dist == "exponential":
+            value = random.expovariate(1 / self.mean)
+        else:
+            # 对数正态分布的均值为mean，长尾更接近真实的大模型延迟
+            sigma = max(self.jitter, 1e-6)
+            value = random.lognormvariate(0, sigma) * self.mean / math.exp(sigma * sigma / 2)
+        return max(value, 0.0)
+
+
+class PrefixCache:
+    """
+    模拟上游的前缀缓存：记录每个请求在各消息边界处的前缀哈希，
+    新请求与之前请求相同的最长消息前缀按64个token取整后计为命中
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._prefixes = OrderedDict()
+
+    def lookup_and_store(self, messages):
+        """
+        Returns:
+            tuple: (prompt token数, 命中缓存的token数)
+        """
+        digest = hashlib.sha256()
+        boundaries = []
+        total = 0
+        for message in messages:
+            content = str(message.get("content", ""))
+            digest.update(json.dumps([message.get("role"), content], ensure_ascii=False).encode("utf-8"))
+            total += estimate_tokens(content) + 4  # 每条消息的角色和分隔符约占4个token
+            boundaries.append((digest.hexdigest(), total))
+
+        cached = 0
+        with self._lock:
+            for key, tokens in boundaries:
+                if key in self._prefixes:
+                    self._prefixes.move_to_end(key)
+                    cached = tokens
+            for key, _ in boundaries:
+                self._prefixes[key] = True
+            while len(self._prefixes) > self.max_entries:
+                self._prefixes.popitem(last=False)
+        return total, cached // CACHE_BLOCK_TOKENS * CACHE_BLOCK_TOKENS
+
+    def clear(self):
+        with self._lock:
+            self._prefixes.clear()
+
+
+class StandinState:
+    """替身服务的配置、前缀缓存和统计"""
+
+    def __init__(self, args):
+        self.args = args
+        self.latency = LatencyModel(args.latency, args.latency_dist, args.latency_jitter)
+        self.cache = PrefixCache(args.cache_entries)
+        self.error_codes = [int(code) for code in args.error_codes.split(",") if code]
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        with self._lock:
+            self.stats = {"requests": 0, "streams": 0, "errors": 0, "hangs": 0,
+                          "prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0, "routes": {}}
+
+    def count(self, route, stream=False, error=False, hang=False, prompt_tokens=0, cached_tokens=0, completion_tokens=0):
+        with self._lock:
+            self.stats["requests"] += 1
+            self.stats["streams"] += int(stream)
+            self.stats["errors"] += int(error)
+            self.stats["hangs"] += int(hang)
+            self.stats["prompt_tokens"] += prompt_tokens
+            self.stats["cached_tokens"] += cached_tokens
+            self.stats["completion_tokens"] += completion_tokens
+            self.stats["routes"][route] = self.stats["routes"].get(route, 0) + 1
+
+    def snapshot(self):
+        with self._lock:
+            stats = json.loads(json.dumps(self.stats))
+        stats["cache_hit_rate"] = stats["cached_tokens"] / stats["prompt_tokens"] if stats["prompt_tokens"] else 0.0
+        return stats
+
+
+# ---------------------------------------------------------------------------
+# HTTP处理
+# ---------------------------------------------------------------------------
+
+class StandinHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    state = None
+
+    def log_message(self, format, *args):
+        if self.state.args.verbose:
+            super().log_message(format, *args)
+
+    def _send_json(self, status, payload, headers=None):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/stats":
+            self._send_json(200, self.state.snapshot())
+        elif self.path.rstrip("/") in ("/v1/models", "/models"):
+            self._send_json(200, {"object": "list", "data": [{"id": self.state.args.model, "object": "model", "owned_by": "standin"}]})
+        else:
+            self._send_json(404, {"error": {"message": "not found"}})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+
+        if self.path.rstrip("/") == "/reset":
+            self.state.reset_stats()
+            self.state.cache.clear()
+            self._send_json(200, {"ok": True})
+            return
+        if self.path.rstrip("/") not in ("/v1/chat/completions", "/chat/completions"):
+            self._send_json(404, {"error": {"message": "not found"}})
+            return
+
+        try:
+            body = json.loads(raw or b"{}")
+            messages = body["messages"]
+        except (ValueError, KeyError):
+            self._send_json(400, {"error": {"message": "invalid request body", "type": "invalid_request_error"}})
+            return
+
+        args = self.state.args
+        route, content = classify(messages)
+        stream = bool(body.get("stream"))
+
+        # 错误注入：挂起直到客户端超时，或返回错误状态码
+        roll = random.random()
+        if roll < args.hang_rate:
+            self.state.count(route, stream=stream, hang=True)
+            time.sleep(args.hang_seconds)
+            self.close_connection = True
+            return
+        if roll < args.hang_rate + args.error_rate and self.state.error_codes:
+            status = random.choice(self.state.error_codes)
+            self.state.count(route, stream=stream, error=True)
+            time.sleep(self.state.latency.sample() * random.random())
+            headers = {"Retry-After": "1"} if status == 429 else None
+            self._send_json(status, {"error": {"message": f"injected error {status}", "type": "standin_error"}}, headers)
+            return
+
+        max_tokens = body.get("max_tokens") or 4096
+        prompt_tokens, cached_tokens = self.state.cache.lookup_and_store(messages)
+        completion_tokens = min(estimate_tokens(content), max_tokens)
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "prompt_cache_hit_tokens": cached_tokens,
+            "prompt_cache_miss_tokens": prompt_tokens - cached_tokens
+        }
+        self.state.count(route, stream=stream, prompt_tokens=prompt_tokens, cached_tokens=cached_tokens,
+                         completion_tokens=completion_tokens)
+
+        # 首token延迟：未命中缓存的部分按prefill速率额外计时
+        first_token_delay = self.state.latency.sample()
+        if args.prefill_tokens_per_second > 0:
+            first_token_delay += (prompt_tokens - cached_tokens) / args.prefill_tokens_per_second
+        model = body.get("model") or args.model
+        completion_id = "chatcmpl-" + uuid.uuid4().hex
+
+        if stream:
+            include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+            self._stream(completion_id, model, content, usage, first_token_delay, include_usage)
+            return
+
+        if args.tokens_per_second > 0:
+            first_token_delay += completion_tokens / args.tokens_per_second
+        time.sleep(first_token_delay)
+        self._send_json(200, {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": usage
+        })
+
+    def _stream(self, completion_id, model, content, usage, first_token_delay, include_usage):
+        """按token速率以SSE分块输出"""
+        args = self.state.args
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        def chunk(delta, finish_reason=None, chunk_usage=None):
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}] if delta is not None else [],
+            }
+            if chunk_usage is not None:
+                payload["usage"] = chunk_usage
+            self.wfile.write(("data: " + json.dumps(payload, ensure_ascii=False) + "\n\n").encode("utf-8"))
+            self.wfile.flush()
+
+        try:
+            time.sleep(first_token_delay)
+            chunk({"role": "assistant", "content": ""})
+            size = max(args.chunk_chars, 1)
+            for start in range(0, len(content), size):
+                piece = content[start:start + size]
+                chunk({"content": piece})
+                if args.tokens_per_second > 0:
+                    time.sleep(estimate_tokens(piece) / args.tokens_per_second)
+            chunk({}, finish_reason="stop")
+            if include_usage:
+                chunk(None, chunk_usage=usage)
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # 客户端提前断开（如对冲请求落后被取消）
+            pass
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="本地DeepSeek替身服务（OpenAI兼容chat completions接口）")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=18000)
+    parser.add_argument("--model", default="deepseek-chat")
+    parser.add_argument("--latency", type=float, default=0.5, help="首token延迟均值（秒）")
+    parser.add_argument("--latency-dist", default="lognormal", choices=["fixed", "uniform", "normal", "exponential", "lognormal"])
+    parser.add_argument("--latency-jitter", type=float, default=0.5, help="uniform/normal的相对波动，lognormal的sigma")
+    parser.add_argument("--tokens-per-second", type=float, default=50, help="输出token速率，0表示立即输出全部内容")
+    parser.add_argument("--prefill-tokens-per-second", type=float, default=0, help="未命中缓存的prompt token处理速率，0表示不计")
+    parser.add_argument("--chunk-chars", type=int, default=4, help="流式输出时每块的字符数")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="返回错误状态码的请求比例")
+    parser.add_argument("--error-codes", default="429,500,503", help="注入的错误状态码，逗号分隔")
+    parser.add_argument("--hang-rate", type=float, default=0.0, help="挂起不响应的请求比例，用于验证客户端超时")
+    parser.add_argument("--hang-seconds", type=float, default=300)
+    parser.add_argument("--cache-entries", type=int, default=100000, help="前缀缓存保存的前缀数上限")
+    parser.add_argument("--seed", type=int, default=None, help="随机种子，便于复现")
+    parser.add_argument("--verbose", action="store_true", help="打印每个请求的访问日志")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    StandinHandler.state = StandinState(args)
+    ThreadingHTTPServer.daemon_threads = True
+    ThreadingHTTPServer.request_queue_size = 1024
+    server = ThreadingHTTPServer((args.host, args.port), StandinHandler)
+    print(f"DeepSeek替身服务已启动: http://{args.host}:{args.port}/v1 "
+          f"(latency={args.latency}s/{args.latency_dist}, tokens_per_second={args.tokens_per_second}, error_rate={args.error_rate})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(json.dumps(StandinHandler.state.snapshot(), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
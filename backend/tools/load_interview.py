@@ -0,0 +1,429 @@
+#!/usr/bin/env python3
+"""
+模拟面试全流程压测工具
+
+启动N个并发的虚拟候选人，每人按脚本走完整场面试：
+    /api/auth/login → /api/mock-interview/start → k次/answer（可按比例改为/voice-answer，上传合成的WAV）
+    → /api/mock-interview/end → 长轮询/report/<jobId>直到报告生成
+结束后以JSON输出各步骤的延迟分位数、吞吐量和错误率。
+
+配合本地DeepSeek替身服务（tools/llm_standin.py）使用，不消耗真实额度。只依赖标准库，使用方法：
+    python tools/llm_standin.py --port 18000 --latency 0.8 --tokens-per-second 40
+    DEEPSEEK_BASE_URL=http://127.0.0.1:18000/v1 python run.py
+    python tools/load_interview.py --base-url http://127.0.0.1:5000 --candidates 20 --answers 5 \\
+        --seed-users --standin-url http://127.0.0.1:18000 --output load.json
+
+--seed-users 直接在后端数据库中创建（或重置）压测账号，需要在backend目录下、使用与服务相同的配置运行。
+"""
+import io
+import os
+import sys
+import json
+import math
+import time
+import uuid
+import wave
+import random
+import struct
+import argparse
+import threading
+import http.client
+from collections import Counter
+from urllib.parse import urlsplit
+
+# 统计的步骤，按面试流程排列
+STEPS = ("login", "start", "answer", "voice_answer", "end", "report_ready")
+
+# 脚本化回答，按题目序号轮流使用
+SCRIPTED_ANSWERS = [
+    "我在上一家公司负责前端性能优化，通过代码分割和懒加载把首屏时间从3.2秒降到了1.4秒。",
+    "这个项目中我主要负责技术方案设计，和后端一起定义接口规范，并推动了组件库的落地。",
+    "遇到需求变更时，我会先评估影响范围，和产品确认优先级，再调整排期并同步给相关同事。",
+    "我对工程化的理解是通过规范、工具和自动化流程提升团队的协作效率和交付质量。",
+    "我选择这个岗位是因为它和我的技术方向高度匹配，也希望在更大的业务场景中成长。",
+    "如果和同事意见不一致，我会先理解对方的出发点，用数据和事实讨论，必要时请负责人决策。"
+]
+
+
+def synthetic_wav(seconds, sample_rate=16000, seed=None):
+    """生成一段16位单声道WAV：几个频率叠加并带包络的合成“语音”，用于语音回答接口"""
+    rng = random.Random(seed)
+    tones = [rng.uniform(120, 300), rng.uniform(600, 1200), rng.uniform(1800, 2600)]
+    frames = bytearray()
+    total = int(seconds * sample_rate)
+    for n in range(total):
+        t = n / sample_rate
+        envelope = 0.5 + 0.5 * math.sin(2 * math.pi * 3 * t)  # 约每秒3个音节
+        value = sum(math.sin(2 * math.pi * f * t) for f in tones) / len(tones)
+        frames += struct.pack("<h", int(value * envelope * 12000))
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(bytes(frames))
+    return buffer.getvalue()
+
+
+def encode_multipart(fields, files):
+    """编码multipart/form-data请求体，files为{字段名: (文件名, 内容, Content-Type)}"""
+    boundary = uuid.uuid4().hex
+    body = bytearray()
+    for name, value in fields.items():
+        body += f"--{boundary}\r\nContent-Disposition: form-data; name=\"{name}\"\r\n\r\n{value}\r\n".encode("utf-8")
+    for name, (filename, content, content_type) in files.items():
+        body += (f"--{boundary}\r\nContent-Disposition: form-data; name=\"{name}\"; filename=\"{filename}\"\r\n"
+                 f"Content-Type: {content_type}\r\n\r\n").encode("utf-8")
+        body += content + b"\r\n"
+    body += f"--{boundary}--\r\n".encode("utf-8")
+    return bytes(body), f"multipart/form-data; boundary={boundary}"
+
+
+def percentile(sorted_values, q):
+    """线性插值的分位数，sorted_values需已排序"""
+    if not sorted_values:
+        return None
+    position = (len(sorted_values) - 1) * q
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+class StepError(Exception):
+    """一个步骤失败，key用于错误分类统计"""
+
+    def __init__(self, key, message=""):
+        super().__init__(message or key)
+        self.key = key
+
+
+class LoadStats:
+    """线程安全的压测统计：各步骤的延迟样本、错误数和错误分类"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = {step: [] for step in STEPS}
+        self.errors = Counter()
+        self.error_kinds = Counter()
+        self.requests = 0
+        self.interviews_completed = 0
+        self.interviews_failed = 0
+
+    def record(self, step, seconds, error=None):
+        with self._lock:
+            self.requests += 1
+            if error is None:
+                self.latencies[step].append(seconds)
+            else:
+                self.errors[step] += 1
+                self.error_kinds[f"{step}:{error}"] += 1
+
+    def finish_interview(self, ok):
+        with self._lock:
+            if ok:
+                self.interviews_completed += 1
+            else:
+                self.interviews_failed += 1
+
+    def summary(self, duration):
+        """汇总为JSON可序列化的结果，延迟单位为毫秒"""
+        steps = {}
+        for step in STEPS:
+            values = sorted(self.latencies[step])
+            errors = self.errors[step]
+            count = len(values) + errors
+            if not count:
+                continue
+
+            def ms(value):
+                return round(value * 1000, 1) if value is not None else None
+
+            steps[step] = {
+                "count": count,
+                "errors": errors,
+                "error_rate": round(errors / count, 4),
+                "p50_ms": ms(percentile(values, 0.5)),
+                "p90_ms": ms(percentile(values, 0.9)),
+                "p95_ms": ms(percentile(values, 0.95)),
+                "p99_ms": ms(percentile(values, 0.99)),
+                "max_ms": ms(values[-1] if values else None),
+                "mean_ms": ms(sum(values) / len(values) if values else None)
+            }
+        total_errors = sum(self.errors.values())
+        return {
+            "duration_seconds": round(duration, 2),
+            "interviews_completed": self.interviews_completed,
+            "interviews_failed": self.interviews_failed,
+            "throughput": {
+                "interviews_per_minute": round(self.interviews_completed / duration * 60, 2) if duration else 0,
+                "requests_per_second": round(self.requests / duration, 2) if duration else 0
+            },
+            "requests": self.requests,
+            "errors": total_errors,
+            "error_rate": round(total_errors / self.requests, 4) if self.requests else 0,
+            "steps": steps,
+            "error_breakdown": dict(self.error_kinds.most_common())
+        }
+
+
+class ApiClient:
+    """一个虚拟候选人使用的HTTP客户端，复用keep-alive连接，出错后重新建立"""
+
+    def __init__(self, base_url, timeout):
+        parts = urlsplit(base_url)
+        self.scheme = parts.scheme
+        self.host = parts.hostname
+        self.port = parts.port
+        self.timeout = timeout
+        self.token = None
+        self._conn = None
+
+    def _connection(self):
+        if self._conn is None:
+            cls = http.client.HTTPSConnection if self.scheme == "https" else http.client.HTTPConnection
+            self._conn = cls(self.host, self.port, timeout=self.timeout)
+        return self._conn
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def request(self, method, path, body=None, content_type="application/json"):
+        """
+        发送请求并解析JSON响应
+
+        Returns:
+            tuple: (状态码, 响应数据)
+
+        Raises:
+            StepError: 超时、连接失败或响应不是JSON
+        """
+        headers = {}
+        if body is not None:
+            if content_type == "application/json":
+                body = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            headers["Content-Type"] = content_type
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        try:
+            conn = self._connection()
+            conn.request(method, path, body=body, headers=headers)
+            response = conn.getresponse()
+            raw = response.read()
+        except TimeoutError:
+            self.close()
+            raise StepError("timeout")
+        except (OSError, http.client.HTTPException) as e:
+            self.close()
+            raise StepError("connection", str(e))
+        try:
+            return response.status, json.loads(raw or b"{}")
+        except ValueError:
+            raise StepError(f"http_{response.status}_non_json")
+
+
+class Candidate:
+    """按脚本走完面试流程的虚拟候选人"""
+
+    def __init__(self, index, args, stats, stop_at, wav):
+        self.index = index
+        self.args = args
+        self.stats = stats
+        self.stop_at = stop_at
+        self.wav = wav
+        self.rng = random.Random(args.seed * 1000 + index if args.seed is not None else None)
+        self.client = ApiClient(args.base_url, args.timeout)
+        self.email = args.email_pattern.format(i=index)
+
+    def _step(self, step, method, path, body=None, content_type="application/json", expect=(200,)):
+        """执行一个步骤并计时，状态码不符合预期时记为错误"""
+        started = time.perf_counter()
+        try:
+            status, data = self.client.request(method, path, body, content_type)
+            if status not in expect:
+                raise StepError(f"http_{status}", data.get("error", "") if isinstance(data, dict) else "")
+        except StepError as e:
+            self.stats.record(step, time.perf_counter() - started, e.key)
+            raise
+        self.stats.record(step, time.perf_counter() - started)
+        return data
+
+    def _think(self):
+        if self.args.think_time > 0:
+            time.sleep(self.rng.uniform(0.5, 1.5) * self.args.think_time)
+
+    def login(self):
+        data = self._step("login", "POST", "/api/auth/login", {"email": self.email, "password": self.args.password})
+        self.client.token = data["token"]
+
+    def interview(self):
+        """走完一场面试，返回是否成功生成报告"""
+        data = self._step("start", "POST", "/api/mock-interview/start",
+                          {"style": "严肃", "mode": "文字模式", "duration": 15})
+        interview_id = data["interviewId"]
+        question_id = (data.get("currentQuestion") or {}).get("id", 1)
+
+        for turn in range(self.args.answers):
+            self._think()
+            if self.rng.random() < self.args.voice_ratio:
+                body, content_type = encode_multipart(
+                    {"interviewId": interview_id, "questionId": question_id, "engine": self.args.engine},
+                    {"audio": ("answer.wav", self.wav, "audio/wav")}
+                )
+                data = self._step("voice_answer", "POST", "/api/mock-interview/voice-answer", body, content_type)
+            else:
+                answer = SCRIPTED_ANSWERS[(self.index + turn) % len(SCRIPTED_ANSWERS)]
+                data = self._step("answer", "POST", "/api/mock-interview/answer",
+                                  {"interviewId": interview_id, "questionId": question_id, "answer": answer})
+            question_id = (data.get("nextQuestion") or {}).get("id", question_id + 1)
+
+        data = self._step("end", "POST", "/api/mock-interview/end", {"interviewId": interview_id}, expect=(200, 202))
+        return self._wait_report(data["jobId"])
+
+    def _wait_report(self, job_id):
+        """长轮询报告任务，report_ready记录从结束面试到报告生成的时间（不含end请求本身）"""
+        started = time.perf_counter()
+        deadline = started + self.args.report_timeout
+        while True:
+            try:
+                status, data = self.client.request("GET", f"/api/mock-interview/report/{job_id}?wait={self.args.report_wait}")
+            except StepError as e:
+                self.stats.record("report_ready", time.perf_counter() - started, e.key)
+                raise
+            if status != 200:
+                self.stats.record("report_ready", time.perf_counter() - started, f"http_{status}")
+                raise StepError(f"http_{status}")
+            if data.get("status") == "done":
+                self.stats.record("report_ready", time.perf_counter() - started)
+                return True
+            if data.get("status") == "failed":
+                self.stats.record("report_ready", time.perf_counter() - started, "job_failed")
+                raise StepError("job_failed")
+            if time.perf_counter() >= deadline:
+                self.stats.record("report_ready", time.perf_counter() - started, "timeout")
+                raise StepError("timeout")
+
+    def run(self):
+        try:
+            self.login()
+        except (StepError, KeyError):
+            self.stats.finish_interview(False)
+            return
+        done = 0
+        while done < self.args.interviews_per_candidate and time.time() < self.stop_at:
+            try:
+                self.stats.finish_interview(self.interview())
+            except (StepError, KeyError, TypeError, AttributeError):
+                self.stats.finish_interview(False)
+            done += 1
+        self.client.close()
+
+
+def seed_users(args):
+    """在后端数据库中创建压测账号，已存在的账号重置密码和锁定状态"""
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    sys.path.insert(0, backend_dir)
+    import bcrypt
+    from app import app
+    from app.models import db, User
+
+    hashed = bcrypt.hashpw(args.password.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
+    with app.app_context():
+        for index in range(args.candidates):
+            email = args.email_pattern.format(i=index)
+            user = User.query.filter_by(email=email).first()
+            if user is None:
+                user = User(email=email)
+                db.session.add(user)
+            user.password = hashed
+            user.email_verified = True
+            user.login_attempts = 0
+            user.locked_until = None
+        db.session.commit()
+    print(f"已准备{args.candidates}个压测账号: {args.email_pattern.format(i=0)} ...", file=sys.stderr)
+
+
+def fetch_json(url, method="GET", timeout=5, headers=None):
+    """请求替身服务或指标接口，失败时返回None"""
+    parts = urlsplit(url)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=timeout)
+    try:
+        conn.request(method, parts.path or "/", headers=headers or {})
+        return json.loads(conn.getresponse().read() or b"{}")
+    except (OSError, ValueError, http.client.HTTPException):
+        return None
+    finally:
+        conn.close()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="模拟面试全流程压测工具")
+    parser.add_argument("--base-url", default="http://127.0.0.1:5000", help="后端服务地址")
+    parser.add_argument("--candidates", type=int, default=10, help="并发的虚拟候选人数")
+    parser.add_argument("--interviews-per-candidate", type=int, default=1, help="每个候选人依次进行的面试场数")
+    parser.add_argument("--answers", type=int, default=5, help="每场面试回答的问题数")
+    parser.add_argument("--voice-ratio", type=float, default=0.0, help="使用/voice-answer语音回答的比例（0-1）")
+    parser.add_argument("--voice-seconds", type=float, default=3.0, help="合成语音的时长（秒）")
+    parser.add_argument("--engine", default="aliyun", help="语音回答使用的识别引擎")
+    parser.add_argument("--think-time", type=float, default=0.0, help="每次回答前的平均思考时间（秒）")
+    parser.add_argument("--ramp-up", type=float, default=0.0, help="在多少秒内逐步启动全部候选人")
+    parser.add_argument("--duration", type=float, default=0.0, help="最长运行时间（秒），到时后不再开始新的面试，0为不限制")
+    parser.add_argument("--email-pattern", default="loadtest{i}@qq.com", help="压测账号邮箱，{i}为候选人序号（登录接口会校验域名，需使用真实存在的邮箱域名）")
+    parser.add_argument("--password", default="LoadTest@123456", help="压测账号密码")
+    parser.add_argument("--seed-users", action="store_true", help="运行前在后端数据库中创建压测账号")
+    parser.add_argument("--report-wait", type=float, default=5, help="轮询报告时每次长轮询等待的秒数")
+    parser.add_argument("--report-timeout", type=float, default=180, help="等待报告生成的最长时间（秒）")
+    parser.add_argument("--timeout", type=float, default=120, help="单个请求的超时时间（秒）")
+    parser.add_argument("--standin-url", default=None, help="替身服务地址，指定时压测前重置统计、压测后附带其统计")
+    parser.add_argument("--metrics-token", default=None,
+                        help="管理员账号的JWT，指定时压测后附带/api/metrics的服务端指标")
+    parser.add_argument("--seed", type=int, default=None, help="随机种子")
+    parser.add_argument("--output", default=None, help="结果JSON的输出文件，默认输出到标准输出")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.seed_users:
+        seed_users(args)
+    if args.standin_url:
+        fetch_json(args.standin_url.rstrip("/") + "/reset", method="POST")
+
+    wav = synthetic_wav(args.voice_seconds, seed=args.seed) if args.voice_ratio > 0 else b""
+    stats = LoadStats()
+    started = time.time()
+    stop_at = started + args.duration if args.duration > 0 else float("inf")
+    print(f"开始压测: {args.base_url} candidates={args.candidates} answers={args.answers} voice_ratio={args.voice_ratio}",
+          file=sys.stderr)
+
+    threads = []
+    for index in range(args.candidates):
+        thread = threading.Thread(target=Candidate(index, args, stats, stop_at, wav).run, daemon=True)
+        thread.start()
+        threads.append(thread)
+        if args.ramp_up > 0 and index < args.candidates - 1:
+            time.sleep(args.ramp_up / args.candidates)
+    for thread in threads:
+        thread.join()
+
+    result = {"config": {key: value for key, value in vars(args).items() if key not in ("password", "metrics_token")}}
+    result.update(stats.summary(time.time() - started))
+    if args.standin_url:
+        result["standin"] = fetch_json(args.standin_url.rstrip("/") + "/stats")
+    if args.metrics_token:
+        result["server_metrics"] = fetch_json(args.base_url.rstrip("/") + "/api/metrics",
+                                              headers={"Authorization": f"Bearer {args.metrics_token}"})
+
+    output = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+        print(f"压测结果已写入{args.output}", file=sys.stderr)
+    else:
+        print(output)
+    return 0 if stats.interviews_failed == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -37,4 +37,109 @@ apiClient.interceptors.response.use(
   }
 )
 
-export default apiClient
\ No newline at end of file
+export default apiClient
+
+// 以POST方式调用Server-Sent Events接口，每收到一条事件回调一次onEvent(event, data)
+export const postEventStream = async (url, body, onEvent) => {
+  const token = localStorage.getItem('token')
+  const headers = { 'Content-Type': 'application/json' }
+  if (token) {
+    headers.Authorization = `Bearer ${token}`
+  }
+
+  const response = await fetch(`${apiClient.defaults.baseURL}${url}`, {
+    method: 'POST',
+    headers,
+    body: JSON.stringify(body)
+  })
+  if (!response.ok) {
+    const error = new Error(`请求失败: ${response.status}`)
+    // 与axios拦截器保持一致，为401错误添加特殊标志
+    if (response.status === 401) {
+      error.isUnauthorized = true
+      error.message = '请先登录'
+    }
+    throw error
+  }
+
+  const reader = response.body.getReader()
+  const decoder = new TextDecoder()
+  let buffer = ''
+  while (true) {
+    const { done, value } = await reader.read()
+    if (done) break
+    buffer += decoder.decode(value, { stream: true })
+
+    // 事件之间以空行分隔
+    let index
+    while ((index = buffer.indexOf('\n\n')) !== -1) {
+      const rawEvent = buffer.slice(0, index)
+      buffer = buffer.slice(index + 2)
+
+      let event = 'message'
+      let data = ''
+      for (const line of rawEvent.split('\n')) {
+        if (line.startsWith('event:')) {
+          event = line.slice(6).trim()
+        } else if (line.startsWith('data:')) {
+          data += line.slice(5).trim()
+        }
+      }
+      if (data) {
+        onEvent(event, JSON.parse(data))
+      }
+    }
+  }
+}
+
+// 打开模拟面试的WebSocket通道（需要后端以ASGI方式启动），连接就绪后返回发送接口
+// 服务端推送的事件与postEventStream一致，通过onEvent(event, data)回调
+export const openInterviewSocket = (interviewId, onEvent) => {
+  const token = localStorage.getItem('token') || ''
+  const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:'
+  const url = `${protocol}//${window.location.host}${apiClient.defaults.baseURL}/mock-interview/ws/${interviewId}?token=${encodeURIComponent(token)}`
+
+  return new Promise((resolve, reject) => {
+    const socket = new WebSocket(url)
+    socket.binaryType = 'arraybuffer'
+    let ready = false
+
+    const sendJson = (message) => {
+      if (socket.readyState === WebSocket.OPEN) {
+        socket.send(JSON.stringify(message))
+      }
+    }
+
+    const handle = {
+      isOpen: () => socket.readyState === WebSocket.OPEN,
+      // 开始录制一个回答，之后通过sendAudio发送16位单声道PCM
+      startAnswer: (questionId, sampleRate, engine = 'aliyun') => sendJson({ type: 'start', questionId, sampleRate, engine }),
+      sendAudio: (pcm) => {
+        if (socket.readyState === WebSocket.OPEN) {
+          socket.send(pcm)
+        }
+      },
+      // 结束录制，submit为true时直接以识别文本提交回答
+      stopAnswer: (submit = false) => sendJson({ type: 'stop', submit }),
+      answer: (questionId, answer) => sendJson({ type: 'answer', questionId, answer }),
+      close: () => socket.close()
+    }
+
+    socket.onmessage = (message) => {
+      const { event, data } = JSON.parse(message.data)
+      if (event === 'ready' && !ready) {
+        ready = true
+        resolve(handle)
+        return
+      }
+      onEvent(event, data)
+    }
+    socket.onclose = (event) => {
+      if (!ready) {
+        reject(new Error(`WebSocket连接失败: ${event.code}`))
+      } else {
+        onEvent('close', { code: event.code })
+      }
+    }
+  })
+}
@@ -20,7 +20,9 @@ export default defineConfig({
       '/api': {
         target: 'http://localhost:5000',
         changeOrigin: true,
-        secure: false
+        secure: false,
+        // 模拟面试WebSocket通道
+        ws: true
       }
     }
   },